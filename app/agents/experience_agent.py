@@ -1,16 +1,21 @@
+import asyncio
 import os
 
 from dotenv import load_dotenv
 from pydantic_ai import Agent
 
+from app.agents.tool_output import compact_results
 from app.datastore import search_experiences_with_score
 from app.prompts import EXPERIENCE_AGENT_PROMPT
 from app.schemas import ExperienceRecommendation
+from app.services.deadline import DeadlineExceeded, run_stage
+from app.services.http_client import openai_model
+from app.services.llm_scheduler import ScheduledModel
 
 load_dotenv()
 
 experience_agent = Agent(
-    os.getenv("GPT_MODEL"),
+    ScheduledModel(openai_model(os.getenv("GPT_MODEL")), label="experience_agent"),
     deps_type=str,
     output_type=ExperienceRecommendation,
     instructions=(EXPERIENCE_AGENT_PROMPT),
@@ -26,7 +31,13 @@ async def experience_search(
     if location:
         search_query += f" in {location}"
 
-    results = search_experiences_with_score(search_query)
+    # Run the blocking vector search off the event loop, within its budget
+    try:
+        results = await run_stage(
+            "search", asyncio.to_thread(search_experiences_with_score, search_query)
+        )
+    except DeadlineExceeded:
+        return []
 
     if not results:
         return []
@@ -45,8 +56,8 @@ async def experience_search(
                 "city": metadata.get("city"),
                 "price": metadata.get("price"),
                 "duration": metadata.get("duration"),
-                "similarity_score": score,
+                "score": score,
             }
         )
 
-    return formatted_results
+    return compact_results(formatted_results, group_by="city")
@@ -1,16 +1,27 @@
+import asyncio
 import os
+from datetime import date
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic_ai import Agent
 
-from app.datastore import search_flights_with_score
+from app.agents.tool_output import compact_results
+from app.datastore import (
+    search_flights_by_date,
+    search_flights_with_score,
+    search_itineraries,
+)
 from app.prompts import FLIGHT_AGENT_PROMPT
 from app.schemas import FlightRecommendation
+from app.services.deadline import DeadlineExceeded, run_stage
+from app.services.http_client import openai_model
+from app.services.llm_scheduler import ScheduledModel
 
 load_dotenv()
 
 flight_agent = Agent(
-    os.getenv("GPT_MODEL"),
+    ScheduledModel(openai_model(os.getenv("GPT_MODEL")), label="flight_agent"),
     deps_type=str,
     output_type=FlightRecommendation,
     instructions=(FLIGHT_AGENT_PROMPT),
@@ -24,8 +35,36 @@ async def flight_search(
     to_city: str = None,
     max_price: float = None,
     month: str = None,
+    start_date: date = None,
+    end_date: date = None,
 ) -> str:
-    """Search for flights based on user travel requirements."""
+    """Search for flights based on user travel requirements.
+
+    For specific or flexible travel dates pass start_date and end_date
+    (YYYY-MM-DD, inclusive); for a single day pass the same date for both.
+    """
+    if start_date or end_date:
+        start, end = sorted([start_date or end_date, end_date or start_date])
+        # Date windows are answered from the sorted date index, not embeddings
+        try:
+            documents = await run_stage(
+                "search",
+                asyncio.to_thread(
+                    search_flights_by_date,
+                    start,
+                    end,
+                    from_city,
+                    to_city,
+                    max_price=max_price,
+                ),
+            )
+        except DeadlineExceeded:
+            return []
+        if documents is not None:
+            return _format_results(
+                [(doc, None) for doc in documents], max_price, scored=False
+            )
+
     search_components = [query]
     if from_city:
         search_components.append(f"from {from_city}")
@@ -36,8 +75,74 @@ async def flight_search(
 
     search_query = " ".join(search_components)
 
-    results = search_flights_with_score(search_query)
+    # Run the blocking vector search off the event loop, within its budget
+    try:
+        results = await run_stage(
+            "search", asyncio.to_thread(search_flights_with_score, search_query)
+        )
+    except DeadlineExceeded:
+        return []
+
+    if start_date or end_date:
+        results = [
+            (doc, score)
+            for doc, score in results
+            if start.isoformat() <= (doc.metadata.get("date") or "") <= end.isoformat()
+        ]
+
+    return _format_results(results, max_price)
+
+
+@flight_agent.tool_plain
+async def itinerary_search(
+    from_city: str,
+    to_city: str,
+    start_date: date = None,
+    end_date: date = None,
+    sort_by: Literal["price", "duration"] = "price",
+) -> str:
+    """Find the cheapest or fastest itineraries, including connecting flights.
 
+    Use for cheapest-fare questions or routes with no direct flight. The
+    first flight departs between start_date and end_date (YYYY-MM-DD).
+    """
+    if start_date and end_date and start_date > end_date:
+        start_date, end_date = end_date, start_date
+    try:
+        itineraries = await run_stage(
+            "search",
+            asyncio.to_thread(
+                search_itineraries,
+                from_city,
+                to_city,
+                start_date,
+                end_date,
+                sort_by=sort_by,
+            ),
+        )
+    except DeadlineExceeded:
+        return []
+    if not itineraries:
+        return []
+
+    rows = [
+        {
+            "airline": itinerary["airline"],
+            "from_airport": itinerary["from_airport"],
+            "to_airport": itinerary["to_airport"],
+            "price": itinerary["price"],
+            "duration": itinerary["duration"],
+            "date": itinerary["date"],
+            "stops": itinerary["stops"],
+            "flights": itinerary["flights"],
+        }
+        for itinerary in itineraries
+    ]
+    return compact_results(rows, group_by="airline")
+
+
+def _format_results(results, max_price: float = None, scored: bool = True):
+    """Compact tool rows for search results, dropping flights over max_price."""
     if not results:
         return []
 
@@ -49,16 +154,16 @@ async def flight_search(
         if max_price and metadata.get("price", 0) > max_price:
             continue
 
-        formatted_results.append(
-            {
-                "airline": metadata.get("airline"),
-                "from_airport": metadata.get("from_airport"),
-                "to_airport": metadata.get("to_airport"),
-                "price": metadata.get("price"),
-                "duration": metadata.get("duration"),
-                "date": metadata.get("date"),
-                "similarity_score": score,
-            }
-        )
+        row = {
+            "airline": metadata.get("airline"),
+            "from_airport": metadata.get("from_airport"),
+            "to_airport": metadata.get("to_airport"),
+            "price": metadata.get("price"),
+            "duration": metadata.get("duration"),
+            "date": metadata.get("date"),
+        }
+        if scored:
+            row["score"] = score
+        formatted_results.append(row)
 
-    return formatted_results
+    return compact_results(formatted_results, group_by="airline")
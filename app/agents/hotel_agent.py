@@ -2,20 +2,25 @@
 Hotel Agent for finding hotels based on user requirements.
 """
 
+import asyncio
 import os
 
 from dotenv import load_dotenv
 from pydantic_ai import Agent
 
+from app.agents.tool_output import compact_results
 from app.datastore import search_hotels_with_score
 from app.prompts import HOTEL_AGENT_PROMPT
 from app.schemas import HotelRecommendation
+from app.services.deadline import DeadlineExceeded, run_stage
+from app.services.http_client import openai_model
+from app.services.llm_scheduler import ScheduledModel
 
 load_dotenv()
 
 
 hotel_agent = Agent(
-    os.getenv("GPT_MODEL"),
+    ScheduledModel(openai_model(os.getenv("GPT_MODEL")), label="hotel_agent"),
     deps_type=str,
     output_type=HotelRecommendation,
     instructions=(HOTEL_AGENT_PROMPT),
@@ -34,7 +39,13 @@ async def hotel_search(
     if location:
         search_query += f" in {location}"
 
-    results = search_hotels_with_score(search_query)
+    # Run the blocking vector search off the event loop, within its budget
+    try:
+        results = await run_stage(
+            "search", asyncio.to_thread(search_hotels_with_score, search_query)
+        )
+    except DeadlineExceeded:
+        return []
 
     if not results:
         return []
@@ -55,8 +66,8 @@ async def hotel_search(
                 "city": metadata.get("city"),
                 "price_per_night": metadata.get("price_per_night"),
                 "rating": metadata.get("rating"),
-                "similarity_score": score,
+                "score": score,
             }
         )
 
-    return formatted_results
+    return compact_results(formatted_results, group_by="city")
@@ -3,6 +3,7 @@ Manager Agent for coordinating multiple specialised agents.
 """
 
 import os
+from typing import Optional
 
 from dotenv import load_dotenv
 from pydantic_ai import Agent, RunContext
@@ -15,12 +16,19 @@ from app.schemas import (
     HotelRecommendation,
     TravelAdvice,
 )
-
+from app.services.deadline import (
+    COMPOSE_RESERVE_SECONDS,
+    DeadlineExceeded,
+    run_stage,
+)
+from app.services.http_client import openai_model
+from app.services.llm_scheduler import ScheduledModel
+from app.services.progress import publish
 
 load_dotenv()
 
 manager_agent = Agent(
-    os.getenv("GPT_MODEL"),
+    ScheduledModel(openai_model(os.getenv("GPT_MODEL")), label="manager_agent"),
     deps_type=dict,
     output_type=TravelAdvice,
     model_settings=ModelSettings(temperature=0.5, max_tokens=500),
@@ -31,28 +39,55 @@ manager_agent = Agent(
 @manager_agent.tool
 async def get_hotel_recommendations(
     ctx: RunContext[dict], query: str
-) -> HotelRecommendation:
+) -> Optional[HotelRecommendation]:
     """Get hotel recommendations from the hotel specialist agent."""
     hotel_agent = ctx.deps["hotel_agent"]
-    result = await hotel_agent.run(query, deps=query)
+    try:
+        result = await run_stage(
+            "hotel_agent",
+            hotel_agent.run(query, deps=query),
+            reserve=COMPOSE_RESERVE_SECONDS,
+        )
+    except DeadlineExceeded:
+        # Optional enrichment: let the manager answer without it
+        return None
+    publish("hotel", query=query, data=result.output.model_dump())
     return result.output
 
 
 @manager_agent.tool
 async def get_flight_recommendations(
     ctx: RunContext[dict], query: str
-) -> FlightRecommendation:
+) -> Optional[FlightRecommendation]:
     """Get flight recommendations from the flight specialist agent."""
     flights_agent = ctx.deps["flights_agent"]
-    result = await flights_agent.run(query, deps=query)
+    try:
+        result = await run_stage(
+            "flight_agent",
+            flights_agent.run(query, deps=query),
+            reserve=COMPOSE_RESERVE_SECONDS,
+        )
+    except DeadlineExceeded:
+        # Optional enrichment: let the manager answer without it
+        return None
+    publish("flight", query=query, data=result.output.model_dump())
     return result.output
 
 
 @manager_agent.tool
 async def get_experience_recommendations(
     ctx: RunContext[dict], query: str
-) -> ExperienceRecommendation:
+) -> Optional[ExperienceRecommendation]:
     """Get experience recommendations from the experience specialist agent."""
     experience_agent = ctx.deps["experience_agent"]
-    result = await experience_agent.run(query, deps=query)
+    try:
+        result = await run_stage(
+            "experience_agent",
+            experience_agent.run(query, deps=query),
+            reserve=COMPOSE_RESERVE_SECONDS,
+        )
+    except DeadlineExceeded:
+        # Optional enrichment: let the manager answer without it
+        return None
+    publish("experience", query=query, data=result.output.model_dump())
     return result.output
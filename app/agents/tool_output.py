@@ -0,0 +1,36 @@
+"""
+Compact encoding of search tool results sent back to the agents.
+
+Rows become a small table: field names are listed once, rows are value lists,
+rows are grouped under a shared value (e.g. city) so it is not repeated, scores
+are rounded and only the best few matches are kept.
+"""
+
+import os
+from typing import Any, Dict, List, Union
+
+TOOL_TOP_N = int(os.getenv("TOOL_TOP_N", "3"))
+SCORE_DECIMALS = 2
+
+
+def compact_results(
+    rows: List[Dict[str, Any]], group_by: str, top_n: int = TOOL_TOP_N
+) -> Union[Dict[str, Any], List]:
+    """Encode ranked result rows as {"fields": [...], group_by: {value: [[...]]}}.
+
+    Rows must already be ordered best match first, as the stores return them.
+    """
+    if not rows:
+        return []
+
+    rows = rows[:top_n]
+    fields = [field for field in rows[0] if field != group_by]
+    grouped: Dict[str, List[List[Any]]] = {}
+    for row in rows:
+        values = [
+            round(row[field], SCORE_DECIMALS) if field == "score" else row[field]
+            for field in fields
+        ]
+        grouped.setdefault(str(row[group_by]), []).append(values)
+
+    return {"fields": fields, group_by: grouped}
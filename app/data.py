@@ -1,14 +1,86 @@
 import json
 import os
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List
 
 SEED_DATA_DIR = os.path.join(os.path.dirname(__file__), "seed_data")
 
+# Characters read per step when streaming a JSON array
+STREAM_CHUNK_SIZE = 1 << 16
+
 
 def load_json(filename):
     with open(os.path.join(SEED_DATA_DIR, filename), "r") as f:
         return json.load(f)
 
 
-hotels = load_json("hotel_catalogue.json")
-flights = load_json("flight_catalogue.json")
-experiences = load_json("experiences_catalogue.json")
+def catalogue_path(path: str) -> str:
+    """Resolve a catalogue path, looking relative ones up in the seed data."""
+    return path if os.path.isabs(path) else os.path.join(SEED_DATA_DIR, path)
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a JSON array or JSON Lines file one at a time.
+
+    Only the record being decoded is held in memory, so files larger than RAM
+    can be read. Relative paths are looked up in the seed data directory.
+    """
+    path = catalogue_path(path)
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer, started = "", False
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            buffer += chunk
+            position = 0
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position == len(buffer):
+                    break
+                if not started:
+                    if buffer[position] != "[":
+                        raise ValueError(f"{path} is not a JSON array")
+                    started, position = True, position + 1
+                    continue
+                if buffer[position] == "]":
+                    return
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The record continues in the next chunk
+                    if not chunk:
+                        raise
+                    break
+                yield record
+            buffer = buffer[position:]
+            if not chunk:
+                raise ValueError(f"{path} ends before its JSON array is closed")
+
+
+# Seed catalogue file of each module-level catalogue
+CATALOGUE_FILES = {
+    "hotels": "hotel_catalogue.json",
+    "flights": "flight_catalogue.json",
+    "experiences": "experiences_catalogue.json",
+}
+
+
+@lru_cache(maxsize=None)
+def load_catalogue(name: str) -> List[Dict[str, Any]]:
+    """A seed catalogue, read on first use and kept for the process."""
+    return load_json(CATALOGUE_FILES[name])
+
+
+def __getattr__(name: str) -> List[Dict[str, Any]]:
+    # hotels, flights and experiences are only loaded when first used, so
+    # processes that stream catalogues (ingestion) never hold them in memory
+    if name in CATALOGUE_FILES:
+        return load_catalogue(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,69 +1,277 @@
+import json
 import os
 import random
-import re
-from typing import Any, Dict, List, Optional
+import threading
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
-from app.data import experiences, flights, hotels
+from app.data import CATALOGUE_FILES, catalogue_path, iter_records, load_catalogue
+from app.services.cache import TTLCache, build_cache
+from app.services.chroma_client import (
+    CHROMA_MODE,
+    BatchingCollection,
+    ChromaCollectionAlias,
+    batch_queries,
+    shared_http_client,
+)
+from app.services.collection_alias import CollectionAlias, versioned_name
+from app.services.embedding_lookup import EmbeddingLookup, query_templates
+from app.services.flight_fields import cabin_price, convert_duration_to_string
+from app.services.flight_graph import FlightGraph
+from app.services.flight_index import FlightDateIndex
+from app.services.http_client import get_async_http_client, get_sync_http_client
+from app.services.ingest_jobs import (
+    IngestCheckpoint,
+    IngestJob,
+    checkpoint_path,
+    source_fingerprint,
+)
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.llm_scheduler import ScheduledEmbeddings
+from app.services.numpy_store import NumpyVectorStore
+from app.services.sharding import ShardedStore, build_router
+from app.services.vector_index import (
+    apply_search_params,
+    collection_configuration,
+    collection_metric,
+    index_params,
+    relevance_score,
+    upsert_embedded,
+)
 
 load_dotenv()
 
-embeddings = OpenAIEmbeddings(model=os.getenv("EMBEDDING_MODEL"))
-DB_PATH = os.getenv("DB_PATH")
 
-hotels_store = Chroma(
-    collection_name="va_hotels_collection",
-    embedding_function=embeddings,
-    persist_directory=f"{DB_PATH}/hotels",
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoises query vectors across requests.
+
+    Templated queries are answered from the precomputed lookup table first.
+    Cached vectors are keyed by the embedding schema as well as the query, so a
+    shared cache never serves vectors from a previous model or dimension.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: TTLCache,
+        lookup: Optional[EmbeddingLookup] = None,
+        schema: Tuple = (),
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.lookup = lookup
+        self.schema = schema
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.lookup.get(text) if self.lookup is not None else None
+        if vector is not None:
+            return vector
+        key = (*self.schema, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+
+# Query embeddings and search results are shared by every request and batch item
+query_embedding_cache = build_cache(
+    "query_embeddings",
+    max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400")),
+)
+search_cache = build_cache(
+    "search_results",
+    max_size=int(os.getenv("SEARCH_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600")),
 )
 
-experiences_store = Chroma(
-    collection_name="va_experiences_collection",
-    embedding_function=embeddings,
-    persist_directory=f"{DB_PATH}/experiences",
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+
+# Optional: shorter text-embedding-3 vectors (e.g. 256, 512, 1024); unset keeps
+# the model's native width. Stores are re-ingested when this changes
+EMBEDDING_DIMENSIONS = (
+    int(os.getenv("EMBEDDING_DIMENSIONS"))
+    if os.getenv("EMBEDDING_DIMENSIONS")
+    else None
 )
 
-flights_store = Chroma(
-    collection_name="va_flights_collection",
-    embedding_function=embeddings,
-    persist_directory=f"{DB_PATH}/flights",
+DB_PATH = os.getenv("DB_PATH")
+
+# Template x catalogue entity queries embedded in bulk at ingest time
+query_embedding_lookup = EmbeddingLookup(
+    f"{DB_PATH}/query_embeddings",
+    {"model": EMBEDDING_MODEL, "dimensions": EMBEDDING_DIMENSIONS},
 )
 
+embeddings = CachedEmbeddings(
+    ScheduledEmbeddings(
+        OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+            http_client=get_sync_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+    ),
+    query_embedding_cache,
+    query_embedding_lookup,
+    schema=(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS),
+)
 
-def get_random_room_price() -> float:
-    """Returns a random price for hotel room pricing."""
-    return float(random.randint(100, 1000))
+# Documents built and embedded per add_documents call during ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
 
+# Optional: one collection per destination region instead of one per catalogue
+SHARDING_ENABLED = os.getenv("VECTOR_SHARDING", "false").lower() == "true"
 
-def get_random_cabin_price() -> float:
-    """Returns a random price for cabin pricing."""
-    return float(random.randint(100, 1000))
+# Search engine per collection: "chroma" (HNSW) or "numpy" (exact, in-process)
+VECTOR_ENGINES = {
+    kind: os.getenv(f"{kind.upper()}_VECTOR_ENGINE", "chroma")
+    for kind in ("hotels", "experiences", "flights")
+}
+
+# Quantized resident vectors for numpy collections: "none", "int8" or "binary"
+VECTOR_QUANTIZATION = {
+    kind: os.getenv(f"{kind.upper()}_VECTOR_QUANTIZATION", "none")
+    for kind in ("hotels", "experiences", "flights")
+}
 
 
-def convert_duration_to_string(duration_pt: str) -> str:
-    """Convert PT duration format to readable string."""
-    if not duration_pt or not duration_pt.startswith("PT"):
-        raise ValueError(f"Invalid duration format: {duration_pt}")
+@lru_cache(maxsize=1)
+def shard_router():
+    """Region router over the seed catalogues' places, built on first use.
+
+    The catalogues are streamed; only place and airport regions are kept.
+    """
+    places, airports = set(), set()
+    for kind in ("hotels", "experiences"):
+        for record in iter_records(CATALOGUE_FILES[kind]):
+            places.add((record.get("city"), record.get("country")))
+    for flight in iter_records(CATALOGUE_FILES["flights"]):
+        for end in ("arrive", "depart"):
+            country = flight.get(f"country_{end}")
+            places.add((flight.get(f"city_{end}"), country))
+            airports.add((flight.get(f"airport_{end}"), country))
+    return build_router(places, airports)
+
+
+def build_store(kind: str, collection_name: str, region_field: str, version: int = 0):
+    """Build the vector store for a catalogue with its configured engine."""
+    collection_name = versioned_name(collection_name, version)
+    if VECTOR_ENGINES[kind] == "numpy":
+        return NumpyVectorStore(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=f"{DB_PATH}/{kind}/{versioned_name('numpy', version)}",
+            quantization=VECTOR_QUANTIZATION[kind],
+        )
+    if VECTOR_ENGINES[kind] != "chroma":
+        raise ValueError(f"Unknown vector engine for {kind}: {VECTOR_ENGINES[kind]}")
+    if VECTOR_QUANTIZATION[kind] != "none":
+        raise ValueError(f"Quantizing {kind} vectors needs the numpy engine")
+
+    # A Chroma server in http mode; otherwise the persist directory is opened
+    client = shared_http_client() if CHROMA_MODE == "http" else None
+    if SHARDING_ENABLED:
+        return ShardedStore(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=f"{DB_PATH}/{kind}",
+            collection_configuration=collection_configuration(kind),
+            region_field=region_field,
+            router=shard_router(),
+            client=client,
+        )
 
-    hours_match = re.search(r"(\d+)H", duration_pt)
-    minutes_match = re.search(r"(\d+)M", duration_pt)
+    store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=None if client else f"{DB_PATH}/{kind}",
+        client=client,
+        collection_configuration=collection_configuration(kind),
+    )
+    apply_search_params(store._collection, index_params(kind))
+    return batch_queries(store) if client else store
 
-    hours = int(hours_match.group(1)) if hours_match else 0
-    minutes = int(minutes_match.group(1)) if minutes_match else 0
 
-    if hours and minutes:
-        return f"{hours}h {minutes}m"
-    elif hours:
-        return f"{hours}h"
-    elif minutes:
-        return f"{minutes}m"
-    else:
-        raise ValueError(f"No valid duration found in: {duration_pt}")
+# Date-window, route and itinerary lookups answered without the vector store,
+# built on the first such search so ingestion never loads the catalogue
+@lru_cache(maxsize=1)
+def flight_date_index() -> FlightDateIndex:
+    return FlightDateIndex(load_catalogue("flights"))
+
+
+@lru_cache(maxsize=1)
+def flight_graph() -> FlightGraph:
+    return FlightGraph(load_catalogue("flights"))
+
+
+# Collection name and shard region field per catalogue
+COLLECTIONS = {
+    "hotels": ("va_hotels_collection", "country"),
+    "experiences": ("va_experiences_collection", "country"),
+    "flights": ("va_flights_collection", "to_country"),
+}
+
+_aliases: Dict[str, CollectionAlias] = {}
+
+
+def collection_alias(kind: str) -> CollectionAlias:
+    """Alias naming the collection version a catalogue is served from."""
+    if CHROMA_MODE == "http":
+        # Kept in the server, so replicas on other hosts see the same swaps
+        key = f"chroma:{kind}"
+        if key not in _aliases:
+            _aliases[key] = ChromaCollectionAlias(shared_http_client(), kind)
+        return _aliases[key]
+    path = f"{DB_PATH}/{kind}/alias.json"
+    if path not in _aliases:
+        _aliases[path] = CollectionAlias(path)
+    return _aliases[path]
+
+
+def _open_live_store(kind: str):
+    return build_store(kind, *COLLECTIONS[kind], version=collection_alias(kind).version)
+
+
+hotels_store = _open_live_store("hotels")
+experiences_store = _open_live_store("experiences")
+flights_store = _open_live_store("flights")
+
+_swap_lock = threading.Lock()
+
+
+def live_store(kind: str):
+    """The store searches use, reopened if another process swapped versions."""
+    if collection_alias(kind).poll():
+        with _swap_lock:
+            # Rebinding the module global is atomic for concurrent readers
+            globals()[f"{kind}_store"] = _open_live_store(kind)
+    return globals()[f"{kind}_store"]
+
+
+def collection_versions() -> Tuple[int, ...]:
+    """Live collection version of every catalogue, picking up swaps first."""
+    for kind in COLLECTIONS:
+        live_store(kind)
+    return tuple(collection_alias(kind).version for kind in COLLECTIONS)
+
+
+def get_random_room_price() -> float:
+    """Returns a random price for hotel room pricing."""
+    return float(random.randint(100, 1000))
 
 
 def create_hotel_document(hotel: Dict[str, Any]) -> Document:
@@ -91,6 +299,7 @@ def create_hotel_document(hotel: Dict[str, Any]) -> Document:
             "hotel_id": hotel.get("hotel_id"),
             "name": name,
             "city": city,
+            "country": hotel.get("country"),
             "price_per_night": price_per_night,
             "rating": rating,
             "pricing_tier": hotel.get("pricing_tier"),
@@ -123,6 +332,7 @@ def create_experience_document(experience: Dict[str, Any]) -> Document:
             "experience_id": experience.get("experience_id"),
             "name": name,
             "city": city,
+            "country": experience.get("country"),
             "price": price,
             "duration": duration,
             "tags": experience.get("tags"),
@@ -139,7 +349,7 @@ def create_flight_document(flight: Dict[str, Any]) -> Document:
     date = flight.get("depart_date")
     flight_duration_pt = flight.get("flight_duration")
     duration = convert_duration_to_string(flight_duration_pt)
-    price = get_random_cabin_price()
+    price = cabin_price(flight)
     depart_city = flight.get("city_depart")
     arrive_city = flight.get("city_arrive")
 
@@ -161,6 +371,7 @@ def create_flight_document(flight: Dict[str, Any]) -> Document:
             "airline": airline,
             "from_airport": from_airport,
             "to_airport": to_airport,
+            "to_country": flight.get("country_arrive"),
             "price": price,
             "duration": duration,
             "date": date,
@@ -170,114 +381,407 @@ def create_flight_document(flight: Dict[str, Any]) -> Document:
     )
 
 
-def populate_hotels_store():
-    """Populate the hotels vector store with all hotel data."""
-    if len(hotels_store.get()["documents"]) == 0:
-        documents = [create_hotel_document(hotel) for hotel in hotels]
-        uuids = [str(uuid4()) for _ in range(len(documents))]
-        batch_size = 100
-        total_added = 0
-
-        for i in range(0, len(documents), batch_size):
-            batch_documents = documents[i : i + batch_size]
-            batch_uuids = uuids[i : i + batch_size]
-            hotels_store.add_documents(documents=batch_documents, ids=batch_uuids)
-            total_added += len(batch_documents)
+def document_batches(
+    records: Iterable[Dict[str, Any]],
+    create_document: Callable[[Dict[str, Any]], Document],
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> Iterator[List[Document]]:
+    """Build documents lazily, yielding them batch_size at a time."""
+    batch = []
+    for record in records:
+        batch.append(create_document(record))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embedding_schema() -> Dict[str, Any]:
+    """Embedding model and dimension the stores are built with."""
+    return {"model": EMBEDDING_MODEL, "dimensions": EMBEDDING_DIMENSIONS}
+
+
+def _schema_path(kind: str) -> str:
+    return f"{DB_PATH}/{kind}/embedding_schema.json"
+
+
+def stored_embedding_schema(kind: str) -> Optional[Dict[str, Any]]:
+    """Embedding schema a store was ingested with, if recorded."""
+    alias = collection_alias(kind).read()
+    if alias:
+        return alias["schema"]
+    try:
+        with open(_schema_path(kind)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def needs_reindex(kind: str, store) -> bool:
+    """True if a populated store was embedded with a different schema."""
+    if not _count(store):
+        return False
+    # Stores ingested before the schema was recorded used native-width vectors
+    stored = stored_embedding_schema(kind) or {
+        "model": EMBEDDING_MODEL,
+        "dimensions": None,
+    }
+    return stored != embedding_schema()
 
-    else:
-        print(
-            f"Hotels store is already populated with {len(hotels_store.get()['ids'])} documents"
+
+def check_embedding_schemas() -> None:
+    """Fail fast if a live store was embedded with another model or dimension.
+
+    Its vectors cannot be compared with queries embedded under the current
+    settings, so searches would only fail once requests arrive.
+    """
+    stale = [kind for kind in COLLECTIONS if needs_reindex(kind, live_store(kind))]
+    if stale:
+        raise ValueError(
+            f"{', '.join(stale)} not embedded with {embedding_schema()}; run "
+            f"python -m app.services.ingest_data --reindex {' '.join(stale)}"
         )
 
 
-def populate_experiences_store():
-    """Populate the experiences vector store with all experience data."""
-    if len(experiences_store.get()["documents"]) == 0:
-        documents = [create_experience_document(exp) for exp in experiences]
-        uuids = [str(uuid4()) for _ in range(len(documents))]
-        batch_size = 100
-        total_added = 0
-
-        for i in range(0, len(documents), batch_size):
-            batch_documents = documents[i : i + batch_size]
-            batch_uuids = uuids[i : i + batch_size]
-            experiences_store.add_documents(documents=batch_documents, ids=batch_uuids)
-            total_added += len(batch_documents)
+def _embedding_function(store) -> Embeddings:
+    return store.embeddings if isinstance(store, Chroma) else store.embedding_function
 
+
+def _add_embedded(store, documents: List[Document], vectors: List[List[float]]):
+    """Write already-embedded documents to any of the store types."""
+    ids = [document.id or str(uuid4()) for document in documents]
+    if isinstance(store, Chroma):
+        return upsert_embedded(store._collection, documents, vectors, ids)
+    return store.add_embedded_documents(documents, vectors, ids)
+
+
+def _count(store) -> int:
+    if isinstance(store, Chroma):
+        return store._collection.count()
+    return len(store.get()["ids"])
+
+
+def _reset(store) -> None:
+    if isinstance(store, Chroma):
+        store.reset_collection()
     else:
-        print(
-            f"Experiences store is already populated with {len(experiences_store.get()['ids'])} documents"
-        )
+        store.delete_collection()
+    search_cache.clear()
+
+
+def _job_name(kind: str, version: int) -> str:
+    """Checkpoint key of a collection version's ingestion job."""
+    return f"{kind}@v{version}" if version else kind
+
+
+def _populate_store(
+    kind: str,
+    store,
+    records,
+    create_document,
+    label: str,
+    version: int = 0,
+    source: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Ingest records into a store, resuming an interrupted ingest.
+
+    Re-ingests from scratch if the embedding schema changed. An interrupted
+    ingest only resumes from the same source (see source_fingerprint).
+    """
+    checkpoint = IngestCheckpoint(checkpoint_path(DB_PATH))
+    job_name = _job_name(kind, version)
+    if not version and needs_reindex(kind, store):
+        print(f"{label} store embedding schema changed, re-ingesting")
+        _reset(store)
+        checkpoint.clear(job_name)
+
+    # Records stream through parse -> build -> embed -> upsert
+    job = IngestJob(
+        job_name,
+        checkpoint,
+        IngestPipeline(
+            embed=_embedding_function(store).embed_documents,
+            upsert=lambda documents, vectors: _add_embedded(store, documents, vectors),
+        ),
+        count=lambda: _count(store),
+        reset=lambda: _reset(store),
+        schema=embedding_schema(),
+        label=label,
+        source=source,
+    )
+    count = job.run(
+        lambda skip: document_batches(islice(records, skip, None), create_document)
+    )
+
+    # Versioned builds record their schema in the alias when swapped in
+    if not version:
+        os.makedirs(os.path.dirname(_schema_path(kind)), exist_ok=True)
+        with open(_schema_path(kind), "w") as f:
+            json.dump(embedding_schema(), f)
+    return count
+
+
+# Seed catalogue, document builder and label per catalogue
+CATALOGUES = {
+    "hotels": (CATALOGUE_FILES["hotels"], create_hotel_document, "Hotels"),
+    "experiences": (
+        CATALOGUE_FILES["experiences"],
+        create_experience_document,
+        "Experiences",
+    ),
+    "flights": (CATALOGUE_FILES["flights"], create_flight_document, "Flights"),
+}
+
+
+def _populate_live_store(kind: str, path: Optional[str] = None) -> int:
+    """Fill the live store, or rebuild it beside the live one on a schema change.
+
+    Records are streamed from path, the seed catalogue by default.
+    """
+    if needs_reindex(kind, live_store(kind)):
+        print(f"{CATALOGUES[kind][2]} store embedding schema changed, rebuilding")
+        return reindex_store(kind, path)
+    filename, create_document, label = CATALOGUES[kind]
+    path = catalogue_path(path or filename)
+    return _populate_store(
+        kind,
+        live_store(kind),
+        iter_records(path),
+        create_document,
+        label,
+        version=collection_alias(kind).version,
+        source=source_fingerprint(path),
+    )
+
+
+def _validate_store(store, count: int, label: str) -> None:
+    """Check a freshly built store holds every document and can be searched."""
+    if count == 0 or _count(store) != count:
+        raise ValueError(f"{label} build holds {_count(store)} of {count} documents")
+    if len(store.similarity_search(label, k=min(5, count))) != min(5, count):
+        raise ValueError(f"{label} build returned too few search results")
+
+
+def reindex_store(kind: str, path: Optional[str] = None) -> int:
+    """Build the next collection version, validate it and swap it in.
+
+    Records are streamed from path, the seed catalogue by default. The live
+    version keeps serving throughout; an interrupted build resumes on the
+    next call. Returns the new version's document count.
+    """
+    alias = collection_alias(kind)
+    version = alias.start_build()
+    filename, create_document, label = CATALOGUES[kind]
+    print(f"Building {label} collection version {version}")
+    store = build_store(kind, *COLLECTIONS[kind], version=version)
+    path = catalogue_path(path or filename)
+    count = _populate_store(
+        kind,
+        store,
+        iter_records(path),
+        create_document,
+        label,
+        version=version,
+        source=source_fingerprint(path),
+    )
+    _validate_store(store, count, label)
+
+    alias.point_to(
+        version,
+        collection=versioned_name(COLLECTIONS[kind][0], version),
+        schema=embedding_schema(),
+        count=count,
+    )
+    with _swap_lock:
+        globals()[f"{kind}_store"] = store
+    print(f"{label} now served from version {version}")
+
+    superseded = alias.superseded()
+    for old in superseded:
+        build_store(kind, *COLLECTIONS[kind], version=old).delete_collection()
+        IngestCheckpoint(checkpoint_path(DB_PATH)).clear(_job_name(kind, old))
+    alias.forget(superseded)
+    return count
+
+
+def populate_hotels_store():
+    """Populate the hotels vector store with all hotel data."""
+    _populate_live_store("hotels")
+
+
+def populate_experiences_store():
+    """Populate the experiences vector store with all experience data."""
+    _populate_live_store("experiences")
 
 
 def populate_flights_store():
     """Populate the flights vector store with all flight data."""
-    if len(flights_store.get()["documents"]) == 0:
-        documents = [create_flight_document(flight) for flight in flights]
-        uuids = [str(uuid4()) for _ in range(len(documents))]
-        batch_size = 100
-        total_added = 0
-
-        for i in range(0, len(documents), batch_size):
-            batch_documents = documents[i : i + batch_size]
-            batch_uuids = uuids[i : i + batch_size]
-            flights_store.add_documents(documents=batch_documents, ids=batch_uuids)
-            total_added += len(batch_documents)
-    else:
-        print(
-            f"Flights store is already populated with {len(flights_store.get()['ids'])} documents"
-        )
+    _populate_live_store("flights")
 
 
 def search_hotels(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[Document]:
     """Search hotels using semantic similarity."""
-    return hotels_store.similarity_search(query, k=k, filter=filter_dict)
+    return live_store("hotels").similarity_search(query, k=k, filter=filter_dict)
 
 
 def search_experiences(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[Document]:
     """Search experiences using semantic similarity."""
-    return experiences_store.similarity_search(query, k=k, filter=filter_dict)
+    return live_store("experiences").similarity_search(query, k=k, filter=filter_dict)
 
 
 def search_flights(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[Document]:
     """Search flights using semantic similarity."""
-    return flights_store.similarity_search(query, k=k, filter=filter_dict)
+    return live_store("flights").similarity_search(query, k=k, filter=filter_dict)
+
+
+def _cached_search_with_score(
+    store: Chroma, query: str, k: int, filter_dict: Optional[Dict[str, Any]]
+) -> List[tuple]:
+    """Run a scored similarity search, reusing results for repeated tool calls.
+
+    Scores are relevance (higher is better), not distances: each collection's
+    own distance metric, configured per collection, is normalised by
+    relevance_score so scores compare across stores.
+    """
+    if isinstance(store, Chroma):
+        store_name = store._collection.name
+        metric = collection_metric(store._collection)
+    else:
+        store_name, metric = store.collection_name, store.metric
+    key = (
+        store_name,
+        query,
+        k,
+        json.dumps(filter_dict, sort_keys=True, default=str),
+    )
+    results = search_cache.get(key)
+    if results is None:
+        results = [
+            (doc, relevance_score(distance, metric))
+            for doc, distance in store.similarity_search_with_score(
+                query, k=k, filter=filter_dict
+            )
+        ]
+        search_cache.set(key, results)
+    return results
 
 
 def search_hotels_with_score(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[tuple]:
     """Search hotels with similarity scores."""
-    return hotels_store.similarity_search_with_score(query, k=k, filter=filter_dict)
+    return _cached_search_with_score(live_store("hotels"), query, k, filter_dict)
 
 
 def search_experiences_with_score(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[tuple]:
     """Search experiences with similarity scores."""
-    return experiences_store.similarity_search_with_score(
-        query, k=k, filter=filter_dict
-    )
+    return _cached_search_with_score(live_store("experiences"), query, k, filter_dict)
 
 
 def search_flights_with_score(
     query: str, k: int = 5, filter_dict: Optional[Dict[str, Any]] = None
 ) -> List[tuple]:
     """Search flights with similarity scores."""
-    return flights_store.similarity_search_with_score(query, k=k, filter=filter_dict)
+    return _cached_search_with_score(live_store("flights"), query, k, filter_dict)
+
+
+def search_flights_by_date(
+    start_date: date,
+    end_date: date,
+    from_place: Optional[str] = None,
+    to_place: Optional[str] = None,
+    k: int = 5,
+    max_price: Optional[float] = None,
+) -> Optional[List[Document]]:
+    """Flights departing in a date window, earliest first, without embeddings.
+
+    Flights over max_price are skipped before the first k are taken. Returns
+    None if a place is not a known airport, city or country, so the caller
+    can fall back to semantic search.
+    """
+    origins = flight_date_index().airports(from_place) if from_place else None
+    destinations = flight_date_index().airports(to_place) if to_place else None
+    if (from_place and origins is None) or (to_place and destinations is None):
+        return None
+    matches = flight_date_index().search(start_date, end_date, origins, destinations)
+    if max_price:
+        matches = (flight for flight in matches if cabin_price(flight) <= max_price)
+    return [create_flight_document(flight) for flight in islice(matches, k)]
+
+
+def search_itineraries(
+    from_place: str,
+    to_place: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    sort_by: str = "price",
+    k: int = 5,
+) -> Optional[List[Dict[str, Any]]]:
+    """Ranked direct and connecting itineraries between two places.
+
+    Returns None if a place is not a known airport, city or country.
+    """
+    origins = flight_date_index().airports(from_place)
+    destinations = flight_date_index().airports(to_place)
+    if origins is None or destinations is None:
+        return None
+    return flight_graph().itineraries(
+        origins, destinations, start_date, end_date, sort_by=sort_by, k=k
+    )
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Return hit/miss counters for the shared embedding and search caches."""
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "query_embedding_lookup": query_embedding_lookup.stats(),
+        "search_results": search_cache.stats(),
+    }
+
 
+def store_stats() -> Dict[str, Dict[str, Any]]:
+    """Return shard sizes and routing counters, numpy store vector memory, or
+    query batching counters for a Chroma server."""
+    stats = {}
+    for kind in COLLECTIONS:
+        store = live_store(kind)
+        if isinstance(store, (ShardedStore, NumpyVectorStore)):
+            stats[kind] = store.stats()
+        elif isinstance(getattr(store, "_chroma_collection", None), BatchingCollection):
+            stats[kind] = {"query_batching": store._chroma_collection.stats()}
+    return stats
 
-def initialise_all_stores() -> Dict[str, int]:
-    """Initialize all vector stores with data."""
-    populate_hotels_store()
-    populate_experiences_store()
-    populate_flights_store()
+
+def initialise_all_stores(paths: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """Initialize all vector stores with data.
+
+    paths maps a catalogue kind to the file to ingest instead of its seed file.
+    """
+    paths = paths or {}
+    return {kind: _populate_live_store(kind, paths.get(kind)) for kind in CATALOGUES}
+
+
+def precompute_query_embeddings(paths: Optional[Dict[str, str]] = None) -> int:
+    """Embed the templated tool queries in bulk unless the table is current."""
+    paths = paths or {}
+    queries = query_templates(
+        *(
+            iter_records(paths.get(kind) or CATALOGUES[kind][0])
+            for kind in ("hotels", "experiences", "flights")
+        )
+    )
+    if query_embedding_lookup.holds(queries):
+        return 0
+    return query_embedding_lookup.build(queries, embeddings.embed_documents)
 
 
 def search_all_stores(query: str, k: int = 5) -> Dict[str, List[Document]]:
@@ -290,7 +794,17 @@ def search_all_stores(query: str, k: int = 5) -> Dict[str, List[Document]]:
 
 
 def delete_all_stores():
-    """Delete all vector stores."""
-    hotels_store.delete_collection()
-    experiences_store.delete_collection()
-    flights_store.delete_collection()
+    """Delete all vector stores, every version included.
+
+    This empties the live collections; use reindex_store to rebuild one
+    without a window of empty results.
+    """
+    checkpoint = IngestCheckpoint(checkpoint_path(DB_PATH))
+    for kind in COLLECTIONS:
+        alias = collection_alias(kind)
+        for version in alias.versions():
+            build_store(kind, *COLLECTIONS[kind], version=version).delete_collection()
+            checkpoint.clear(_job_name(kind, version))
+        alias.delete()
+        globals()[f"{kind}_store"] = _open_live_store(kind)
+    search_cache.clear()
@@ -6,12 +6,41 @@ and experiences to provide comprehensive travel recommendations using Virgin Atl
 seed data.
 """
 
+import asyncio
 import json
+from contextlib import asynccontextmanager
 
-from typing import Annotated
+from typing import Annotated, Dict, Optional
 
-from fastapi import FastAPI, HTTPException, Depends
-from app.services.logger import Logger, get_logger
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi.responses import StreamingResponse
+from app.datastore import (
+    cache_stats,
+    check_embedding_schemas,
+    collection_versions,
+    store_stats,
+)
+from app.services.advice_warmer import (
+    WARMER_ENABLED,
+    WARMER_MAX_IN_FLIGHT,
+    AdviceCache,
+    AdviceWarmer,
+    QueryTracker,
+)
+from app.services.batch_advice import BATCH_CONCURRENCY, iter_batch_advice
+from app.services.coalescer import SingleFlight, normalise_query
+from app.services.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    degraded_enrichments,
+    run_stage,
+)
+from app.services.http_client import pool_stats
+from app.services.llm_scheduler import scheduler_stats
+from app.services.progress import listen, publish, stream_progress
+from app.services.sessions import SPECIALISTS, ConversationSession, SessionStore
+from app.services.token_usage import token_usage
+from app.services.logger import Logger, get_logger, log_stats
 
 from app.validators.api.api_key_validator import check_api_key
 from app.validators.user_query.user_query_validator import validate_user_query
@@ -21,12 +50,24 @@ from app.agents.experience_agent import experience_agent
 from app.agents.flight_agent import flight_agent
 from app.agents.hotel_agent import hotel_agent
 from app.agents.manager_agent import manager_agent
-from app.schemas import TravelAdvice, TravelQuery
+from app.schemas import TravelAdvice, TravelBatchQuery, TravelQuery
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Check the stores match the embedding settings, then run the advice
+    warmer in the background when it is enabled."""
+    check_embedding_schemas()
+    task = asyncio.ensure_future(warmer.run()) if WARMER_ENABLED else None
+    yield
+    if task is not None:
+        task.cancel()
 
 
 app = FastAPI(
     title="Multi-Agent AI Travel Assistant",
     description="A travel assistant that uses multiple AI agents to plan a trip",
+    lifespan=lifespan,
 )
 
 agent_deps = {
@@ -35,51 +76,256 @@ agent_deps = {
     "experience_agent": experience_agent,
 }
 
+# Agent re-run for a follow-up about each kind of recommendation
+specialist_agents = {
+    "hotel": hotel_agent,
+    "flight": flight_agent,
+    "experience": experience_agent,
+}
 
-@app.post("/travel-assistant", response_model=TravelAdvice)
-async def travel_assistant(
-    query: TravelQuery, logger: Annotated[Logger, Depends(get_logger)]
-):
-    """Travel assistant endpoint."""
-    try:
-        # Check if API key is set
-        print("Checking API key")
-        has_api_key = check_api_key()
-        if not has_api_key:
-            logger.error("OpenAI API key is not set")
-            raise HTTPException(status_code=500, detail="OpenAI API key is not set")
-
-        # Validate user query
-        validation_result = await validate_user_query(query.query)
-        logger.info("User query validated")
-
-        if not validation_result["is_safe"]:
-            logger.error("User query is not safe")
-            raise HTTPException(status_code=400, detail=validation_result["message"])
-        logger.info("User query is safe")
+
+coalescer = SingleFlight()
+query_tracker = QueryTracker()
+advice_cache = AdviceCache(version=collection_versions)
+sessions = SessionStore()
+
+
+async def check_query(query: str, logger: Logger) -> None:
+    """Check the API key is set and the query is safe to answer."""
+    # Check if API key is set
+    logger.debug("Checking API key")
+    has_api_key = check_api_key()
+    if not has_api_key:
+        logger.error("OpenAI API key is not set")
+        raise HTTPException(status_code=500, detail="OpenAI API key is not set")
+
+    # Validate user query
+    validation_result = await validate_user_query(query)
+    logger.info("User query validated")
+
+    if not validation_result["is_safe"]:
+        logger.error("User query is not safe")
+        raise HTTPException(status_code=400, detail=validation_result["message"])
+    logger.info("User query is safe")
+
+
+async def run_travel_pipeline(query: str, logger: Logger) -> TravelAdvice:
+    """Run validation, the manager agent and recommendation checks for a query."""
+    with deadline_scope():
+        await check_query(query, logger)
+        publish("status", message="Asking our hotel, flight and experience experts")
 
         # Run the manager agent
-        result = await manager_agent.run(query.query, deps=agent_deps)
+        result = await run_stage("manager", manager_agent.run(query, deps=agent_deps))
 
-        # Validate the recommendations
-        has_all_recommendations = await get_all_recommendations(result.output)
+        # Validate the recommendations, accepting enrichments that timed out
+        missing = degraded_enrichments()
+        if missing:
+            logger.info(
+                f"Returning partial advice without: {', '.join(sorted(missing))}"
+            )
+        has_all_recommendations = await get_all_recommendations(
+            result.output, optional=missing
+        )
         if not has_all_recommendations:
             logger.error("Recommendations are not valid")
             raise HTTPException(status_code=400, detail="Recommendations are not valid")
         logger.info("Recommendations are valid")
+        publish("status", message="Putting your trip together")
+
+        # Serialised on the log writer thread, and only when DEBUG is enabled
+        logger.debug("Manager agent result", advice=result.output)
+
+        return result.output
+
+
+async def compute_advice(query: str, logger: Logger) -> TravelAdvice:
+    """Run the pipeline for a query, sharing the run with identical in-flight queries."""
+    return await coalescer.run(
+        normalise_query(query), lambda: run_travel_pipeline(query, logger)
+    )
 
-        print(
-            f"Manager Agent Result: {json.dumps(result.output.model_dump(), indent=2)}"
+
+async def advise(
+    query: str,
+    logger: Logger,
+    response: Optional[Response] = None,
+    track: bool = True,
+) -> TravelAdvice:
+    """Get advice for a query from the precomputed answers, or compute it.
+
+    Batch items pass track=False so bulk jobs don't decide which queries the
+    warmer treats as popular.
+    """
+    if track:
+        query_tracker.record(query)
+    cached = advice_cache.get(query)
+    if cached is not None:
+        logger.info("Returning precomputed advice")
+        if response is not None:
+            response.headers["Age"] = str(int(cached.age))
+        return cached.advice
+    return await compute_advice(query, logger)
+
+
+async def run_follow_up(
+    query: str, session: ConversationSession, kind: str, logger: Logger
+) -> TravelAdvice:
+    """Answer a follow-up by re-running one specialist and patching the advice."""
+    with deadline_scope():
+        await check_query(query, logger)
+        publish("status", message=f"Asking our {kind} expert again")
+
+        specialist_query = session.specialist_query(kind, query)
+        result = await run_stage(
+            f"{kind}_agent",
+            specialist_agents[kind].run(specialist_query, deps=specialist_query),
+        )
+        advice = TravelAdvice.model_validate(
+            session.patched_advice(kind, result.output.model_dump())
         )
+        # Only the new recommendation is checked; the others were checked already
+        others = set(SPECIALISTS) - {kind}
+        new_only = advice.model_copy(update={other: None for other in others})
+        if not await get_all_recommendations(new_only, optional=others):
+            logger.error("Recommendations are not valid")
+            raise HTTPException(status_code=400, detail="Recommendations are not valid")
+        publish(kind, query=specialist_query, data=result.output.model_dump())
+        session.record_follow_up(query, kind, advice.model_dump(), specialist_query)
+        return advice
+
+
+async def converse(
+    query: str,
+    session: ConversationSession,
+    logger: Logger,
+    response: Optional[Response] = None,
+) -> TravelAdvice:
+    """Answer a turn of a conversation, re-running one specialist for follow-ups."""
+    kind = session.affected_specialist(query)
+    if kind is not None:
+        logger.info(f"Follow-up about the {kind}, re-running only that agent")
+        advice = await run_follow_up(query, session, kind, logger)
+    else:
+        specialist_queries: Dict[str, str] = {}
+
+        def remember(event):
+            if event["type"] in SPECIALISTS and event.get("query"):
+                specialist_queries[event["type"]] = event["query"]
+
+        with listen(remember):
+            advice = await advise(query, logger, response)
+        session.record_trip(query, advice.model_dump(), specialist_queries)
+    sessions.save(session)
+    return advice
+
+
+warmer = AdviceWarmer(
+    lambda query: compute_advice(query, get_logger()),
+    query_tracker,
+    advice_cache,
+    busy=lambda: coalescer.stats()["in_flight"] > WARMER_MAX_IN_FLIGHT,
+)
+
+
+@app.post("/travel-assistant", response_model=TravelAdvice)
+async def travel_assistant(
+    query: TravelQuery,
+    response: Response,
+    logger: Annotated[Logger, Depends(get_logger)],
+):
+    """Travel assistant endpoint; the session id is returned in X-Session-Id."""
+    try:
+        session = sessions.open(query.session_id)
+        response.headers["X-Session-Id"] = session.id
+        advice = await converse(query.query, session, logger, response)
 
         # Return the result
         logger.info("Returning result")
-        return result.output
+        return advice
+    except DeadlineExceeded as e:
+        logger.error(f"Request deadline exceeded: {e}")
+        raise HTTPException(status_code=504, detail=f"Request timed out: {e}") from e
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Error: {e}")
         raise HTTPException(status_code=500, detail=f"API error: {str(e)}") from e
 
 
+@app.post("/travel-assistant/stream")
+async def travel_assistant_stream(
+    query: TravelQuery, logger: Annotated[Logger, Depends(get_logger)]
+):
+    """Travel assistant endpoint streaming NDJSON progress events, then the advice.
+
+    The first line carries the session id, each specialist recommendation is
+    sent as soon as it is ready, and the last line is the validated advice or
+    an error.
+    """
+
+    session = sessions.open(query.session_id)
+
+    async def stream_events():
+        yield json.dumps({"type": "session", "id": session.id}) + "\n"
+        try:
+            async for event in stream_progress(
+                lambda: converse(query.query, session, logger)
+            ):
+                if event["type"] == "result":
+                    logger.info("Returning result")
+                    event = {"type": "advice", "data": event["result"].model_dump()}
+                yield json.dumps(event) + "\n"
+        except DeadlineExceeded as e:
+            logger.error(f"Request deadline exceeded: {e}")
+            yield json.dumps(
+                {"type": "error", "status": 504, "detail": f"Request timed out: {e}"}
+            ) + "\n"
+        except HTTPException as e:
+            logger.error(f"Error: {e.detail}")
+            yield json.dumps(
+                {"type": "error", "status": e.status_code, "detail": e.detail}
+            ) + "\n"
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            yield json.dumps(
+                {"type": "error", "status": 500, "detail": f"API error: {str(e)}"}
+            ) + "\n"
+
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
+
+@app.post("/travel-assistant/batch")
+async def travel_assistant_batch(
+    batch: TravelBatchQuery, logger: Annotated[Logger, Depends(get_logger)]
+):
+    """Bulk travel assistant endpoint streaming one NDJSON line per query."""
+
+    async def stream_results():
+        async for result in iter_batch_advice(
+            [item.query for item in batch.queries],
+            lambda query: advise(query, logger, track=False),
+            batch.concurrency or BATCH_CONCURRENCY,
+        ):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+def metrics():
+    """Runtime counters for the request pipeline."""
+    return {
+        "coalescing": coalescer.stats(),
+        "advice_warmer": warmer.stats(),
+        "sessions": sessions.stats(),
+        "caches": cache_stats(),
+        "vector_stores": store_stats(),
+        "llm_scheduler": scheduler_stats(),
+        "token_usage": token_usage.stats(),
+        "http_pool": pool_stats(),
+        "logging": log_stats(),
+    }
+
+
 @app.get("/")
 def read_root():
     """API is running"""
@@ -12,6 +12,16 @@ class TravelQuery(BaseModel):
         ...,
         example="I am looking for a romantic beach getaway in USA during July from London",
     )
+    session_id: Optional[str] = Field(
+        None, description="Id of the conversation this query follows up on"
+    )
+
+
+class TravelBatchQuery(BaseModel):
+    """Request body schema for bulk travel queries."""
+
+    queries: List[TravelQuery] = Field(..., min_length=1, max_length=500)
+    concurrency: Optional[int] = Field(None, ge=1, le=32)
 
 
 class HotelRecommendation(BaseModel):
@@ -0,0 +1,294 @@
+"""
+Precomputed travel advice for the most popular queries.
+
+A handful of destinations (Orlando, New York, Las Vegas, Miami...) account for
+most traffic, and each of those queries runs the whole agent chain live. The
+API records every query in a QueryTracker, whose counts decay with a
+half-life so the ranking follows recent demand. During off-peak hours
+(WARMER_HOURS) and while this worker is quiet, AdviceWarmer runs the normal
+validated pipeline for the top WARMER_TOP_N queries at batch priority and
+stores the results in the advice cache, so the same queries at peak are
+answered from cache. Until enough traffic has been seen, the ranking is
+filled with one templated query per destination, ordered by its number of
+hotels.
+
+Entries carry the time they were computed. The API returns it as an Age
+header, and the warmer recomputes entries once they are half way through
+ADVICE_CACHE_TTL_SECONDS, so popular answers do not expire at peak. Only
+warmed queries are cached; other queries always run live. Entries are also
+keyed by the live collection versions, so once a catalogue is reindexed and
+swapped in, advice drawn from the old version is no longer served.
+
+With CACHE_BACKEND=sqlite the cache is shared by all server workers, and the
+warmer can also be run once from cron:
+
+    python -m app.services.advice_warmer --top 20
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from dotenv import load_dotenv
+
+from app.schemas import TravelAdvice
+from app.services.batch_advice import iter_batch_advice
+from app.services.cache import build_cache
+from app.services.coalescer import normalise_query
+
+load_dotenv()
+
+ADVICE_CACHE_SIZE = int(os.getenv("ADVICE_CACHE_SIZE", "512"))
+ADVICE_CACHE_TTL_SECONDS = float(os.getenv("ADVICE_CACHE_TTL_SECONDS", "86400"))
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "false").lower() == "true"
+WARMER_TOP_N = int(os.getenv("WARMER_TOP_N", "20"))
+# Local hours, start inclusive and end exclusive, during which warming may run
+WARMER_HOURS = os.getenv("WARMER_HOURS", "1-6")
+WARMER_INTERVAL_SECONDS = float(os.getenv("WARMER_INTERVAL_SECONDS", "600"))
+WARMER_CONCURRENCY = int(os.getenv("WARMER_CONCURRENCY", "2"))
+# Requests this worker may be serving for warming to go ahead
+WARMER_MAX_IN_FLIGHT = int(os.getenv("WARMER_MAX_IN_FLIGHT", "1"))
+QUERY_HALF_LIFE_SECONDS = float(os.getenv("QUERY_HALF_LIFE_SECONDS", "86400"))
+WARMER_SEED_TEMPLATE = os.getenv(
+    "WARMER_SEED_TEMPLATE",
+    "Plan a trip to {city} with a hotel, a flight and an experience",
+)
+
+
+class QueryTracker:
+    """Query frequencies that halve every half_life_seconds without traffic."""
+
+    def __init__(
+        self, max_keys: int = 10000, half_life_seconds: float = QUERY_HALF_LIFE_SECONDS
+    ):
+        self.max_keys = max_keys
+        self.half_life_seconds = half_life_seconds
+        self._lock = threading.Lock()
+        # key -> [score, scored at, latest query text]
+        self._queries: Dict[str, list] = {}
+
+    def _decayed(self, entry: list, now: float) -> float:
+        return entry[0] * math.pow(0.5, (now - entry[1]) / self.half_life_seconds)
+
+    def record(self, query: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        key = normalise_query(query)
+        with self._lock:
+            entry = self._queries.get(key)
+            score = self._decayed(entry, now) if entry else 0.0
+            self._queries[key] = [score + 1, now, query]
+            if len(self._queries) > self.max_keys:
+                # Forget the coldest half in one go rather than one per record
+                ranked = sorted(
+                    self._queries, key=lambda k: self._decayed(self._queries[k], now)
+                )
+                for cold in ranked[: len(ranked) // 2]:
+                    del self._queries[cold]
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The n most frequent queries with their decayed counts."""
+        now = time.time() if now is None else now
+        with self._lock:
+            scored = [
+                (entry[2], self._decayed(entry, now))
+                for entry in self._queries.values()
+            ]
+        return sorted(scored, key=lambda item: -item[1])[:n]
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+
+def seed_queries(n: int, template: str = WARMER_SEED_TEMPLATE) -> List[str]:
+    """One templated query for each of the n destinations with the most hotels."""
+    from app.data import flights, hotels
+
+    # Flight counts are dominated by the London hub; hotels mark destinations
+    served = {flight["city_arrive"] for flight in flights}
+    cities = Counter(hotel["city"] for hotel in hotels if hotel["city"] in served)
+    return [template.format(city=city) for city, _ in cities.most_common(n)]
+
+
+class CachedAdvice:
+    """Advice from the cache and when it was computed."""
+
+    __slots__ = ("advice", "computed_at")
+
+    def __init__(self, advice: TravelAdvice, computed_at: float):
+        self.advice = advice
+        self.computed_at = computed_at
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.computed_at)
+
+
+class AdviceCache:
+    """Validated TravelAdvice keyed by normalised query and catalogue version.
+
+    version returns the collection versions the advice is drawn from.
+    """
+
+    def __init__(
+        self,
+        max_size: int = ADVICE_CACHE_SIZE,
+        ttl_seconds: float = ADVICE_CACHE_TTL_SECONDS,
+        cache: Any = None,
+        version: Callable[[], Hashable] = lambda: None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.cache = cache or build_cache("travel_advice", max_size, ttl_seconds)
+        self.version = version
+
+    def _key(self, query: str) -> Tuple[Hashable, str]:
+        return (self.version(), normalise_query(query))
+
+    def get(self, query: str) -> Optional[CachedAdvice]:
+        entry = self.cache.get(self._key(query))
+        if entry is None or time.time() - entry["computed_at"] >= self.ttl_seconds:
+            return None
+        return CachedAdvice(
+            TravelAdvice.model_validate(entry["advice"]), entry["computed_at"]
+        )
+
+    def put(self, query: str, advice: Dict[str, Any]) -> None:
+        """Store a serialised TravelAdvice, validating it first."""
+        TravelAdvice.model_validate(advice)
+        self.cache.set(
+            self._key(query),
+            {"query": query, "advice": advice, "computed_at": time.time()},
+        )
+
+    def needs_refresh(self, query: str) -> bool:
+        """True when query is missing or past half its time-to-live."""
+        cached = self.get(query)
+        return cached is None or cached.age >= self.ttl_seconds / 2
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+
+def parse_hours(hours: str) -> Set[int]:
+    """Hours of the day in a "start-end" window, wrapping past midnight."""
+    if not hours.strip():
+        return set(range(24))
+    start, end = (int(part) % 24 for part in hours.split("-"))
+    if start == end:
+        return set(range(24))
+    return {hour % 24 for hour in range(start, end if end > start else end + 24)}
+
+
+class AdviceWarmer:
+    """Periodically precomputes advice for the most popular queries."""
+
+    def __init__(
+        self,
+        advise: Callable[[str], Awaitable[TravelAdvice]],
+        tracker: QueryTracker,
+        cache: AdviceCache,
+        top_n: int = WARMER_TOP_N,
+        hours: str = WARMER_HOURS,
+        interval_seconds: float = WARMER_INTERVAL_SECONDS,
+        concurrency: int = WARMER_CONCURRENCY,
+        busy: Callable[[], bool] = lambda: False,
+    ):
+        self.advise = advise
+        self.tracker = tracker
+        self.cache = cache
+        self.top_n = top_n
+        self.hours = parse_hours(hours)
+        self.interval_seconds = interval_seconds
+        self.concurrency = concurrency
+        self.busy = busy
+        self._stats = {"runs": 0, "warmed": 0, "failed": 0, "skipped_busy": 0}
+        self.last_run: Optional[str] = None
+
+    def intents(self) -> List[str]:
+        """Top queries by traffic, topped up with seeded destinations."""
+        queries = [query for query, _ in self.tracker.top(self.top_n)]
+        if len(queries) < self.top_n:
+            seen = {normalise_query(query) for query in queries}
+            for query in seed_queries(self.top_n):
+                if len(queries) == self.top_n:
+                    break
+                if normalise_query(query) not in seen:
+                    queries.append(query)
+        return queries
+
+    def off_peak(self, now: Optional[datetime] = None) -> bool:
+        return (now or datetime.now()).hour in self.hours
+
+    async def warm_once(self) -> Dict[str, int]:
+        """Compute and cache advice for every popular query that needs it."""
+        due = [query for query in self.intents() if self.cache.needs_refresh(query)]
+        warmed = failed = 0
+        async for result in iter_batch_advice(due, self.advise, self.concurrency):
+            try:
+                self.cache.put(result["query"], result["advice"])
+                warmed += 1
+            except Exception:
+                failed += 1
+        self._stats["runs"] += 1
+        self._stats["warmed"] += warmed
+        self._stats["failed"] += failed
+        self.last_run = datetime.now().isoformat(timespec="seconds")
+        return {"due": len(due), "warmed": warmed, "failed": failed}
+
+    async def run(self) -> None:
+        """Warm every interval while off-peak and idle, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not self.off_peak():
+                continue
+            if self.busy():
+                self._stats["skipped_busy"] += 1
+                continue
+            await self.warm_once()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "tracked_queries": len(self.tracker),
+            "last_run": self.last_run,
+            "cache": self.cache.stats(),
+        }
+
+
+async def warm_from_cli(top_n: int) -> Dict[str, int]:
+    """Warm the shared cache once from the seeded destinations."""
+    # Imported lazily so the API module is only loaded when the CLI runs
+    from app.main import advice_cache, compute_advice
+    from app.services.logger import get_logger
+
+    logger = get_logger()
+    warmer = AdviceWarmer(
+        lambda query: compute_advice(query, logger),
+        QueryTracker(),
+        advice_cache,
+        top_n=top_n,
+    )
+    return await warmer.warm_once()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute popular travel advice")
+    parser.add_argument("--top", type=int, default=WARMER_TOP_N)
+    args = parser.parse_args()
+
+    print(asyncio.run(warm_from_cli(args.top)))
@@ -0,0 +1,104 @@
+"""
+Batch travel-advice generation with bounded concurrency.
+
+Usage:
+    python -m app.services.batch_advice queries.txt --concurrency 4 --output advice.ndjson
+
+The input file holds one query per line, either as plain text or as a JSON object
+with a "query" field. Results are written as NDJSON in completion order.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+
+from app.services.llm_scheduler import BATCH, request_priority
+
+load_dotenv()
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def describe_error(error: Exception) -> str:
+    """Return the user-facing message for a failed batch item."""
+    return str(getattr(error, "detail", None) or error)
+
+
+async def iter_batch_advice(
+    queries: List[str],
+    advise: Callable[[str], Awaitable[Any]],
+    concurrency: int = BATCH_CONCURRENCY,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run advise over every query, at most `concurrency` at a time.
+
+    Yields one result dict per query as soon as it completes. A failing item
+    produces an "error" entry instead of aborting the rest of the batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index: int, query: str) -> Dict[str, Any]:
+        # Batch items queue behind interactive requests for LLM capacity
+        request_priority.set(BATCH)
+        async with semaphore:
+            try:
+                advice = await advise(query)
+                return {"index": index, "query": query, "advice": advice.model_dump()}
+            except Exception as e:
+                return {"index": index, "query": query, "error": describe_error(e)}
+
+    tasks = [asyncio.ensure_future(run_one(i, q)) for i, q in enumerate(queries)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # Stop outstanding items if the consumer goes away mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+def read_queries(path: str) -> List[str]:
+    """Read queries from a text or JSON Lines file."""
+    queries = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["query"]
+            queries.append(line)
+    return queries
+
+
+async def run_batch_file(path: str, concurrency: int, output) -> None:
+    """Generate advice for every query in path and write NDJSON to output."""
+    # Imported lazily so the API module is only loaded when the CLI runs
+    from app.main import advise
+    from app.services.logger import get_logger
+
+    logger = get_logger()
+    queries = read_queries(path)
+    async for result in iter_batch_advice(
+        queries, lambda query: advise(query, logger, track=False), concurrency
+    ):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate travel advice in bulk")
+    parser.add_argument("queries", help="file with one query per line")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w") as out:
+            asyncio.run(run_batch_file(args.queries, args.concurrency, out))
+    else:
+        asyncio.run(run_batch_file(args.queries, args.concurrency, sys.stdout))
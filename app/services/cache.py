@@ -0,0 +1,246 @@
+"""
+Caches shared by the API pipeline.
+
+TTLCache lives in one process. With several server workers (see
+app/services/server.py) each would warm its own copy and the hit rate would
+drop with the worker count, so CACHE_BACKEND=sqlite puts a SQLiteCache behind
+a short-lived TTLCache: every worker on the host reads and fills the same
+SQLite table, and the in-process tier absorbs repeated hits without a
+database round trip.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or os.path.join(
+    os.getenv("DB_PATH") or ".", "shared_cache.sqlite3"
+)
+# Longest an entry lives in a worker's own tier in front of the shared one
+LOCAL_CACHE_TTL_SECONDS = float(os.getenv("LOCAL_CACHE_TTL_SECONDS", "30"))
+
+# Sets between evictions of expired and least recently used shared entries
+_PRUNE_EVERY = 64
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and size counters."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._entries),
+            }
+
+
+class SQLiteCache:
+    """TTL cache in a SQLite table shared by every process on the host.
+
+    Keys must be JSON-serialisable (strings or tuples of scalars); values are
+    pickled. Least recently used entries are evicted beyond max_size.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600,
+    ):
+        if not name.isidentifier():
+            raise ValueError(f"Cache name must be an identifier: {name}")
+        self.path = path
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._sets = 0
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened in a forked child."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.name} "
+            "(key TEXT PRIMARY KEY, value BLOB, expires REAL, used REAL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_counters "
+            "(name TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)"
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO cache_counters VALUES (?, 0, 0)", (self.name,)
+        )
+        self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, default=str)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None when missing or expired."""
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            f"SELECT value, expires FROM {self.name} WHERE key = ?", (self._key(key),)
+        ).fetchone()
+        if row is None or row[1] < now:
+            connection.execute(
+                "UPDATE cache_counters SET misses = misses + 1 WHERE name = ?",
+                (self.name,),
+            )
+            return None
+        connection.execute(
+            f"UPDATE {self.name} SET used = ? WHERE key = ?", (now, self._key(key))
+        )
+        connection.execute(
+            "UPDATE cache_counters SET hits = hits + 1 WHERE name = ?", (self.name,)
+        )
+        return pickle.loads(row[0])
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting old entries every so often."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.name} VALUES (?, ?, ?, ?)",
+            (self._key(key), pickle.dumps(value), now + self.ttl_seconds, now),
+        )
+        self._sets += 1
+        if self._sets % _PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop expired entries, then the least recently used beyond max_size."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                f"DELETE FROM {self.name} WHERE expires < ?", (time.time(),)
+            )
+            connection.execute(
+                f"DELETE FROM {self.name} WHERE key IN (SELECT key FROM {self.name} "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+
+    def clear(self) -> None:
+        """Remove every entry, for all processes."""
+        self._connection().execute(f"DELETE FROM {self.name}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and size counters summed over every process."""
+        connection = self._connection()
+        hits, misses = connection.execute(
+            "SELECT hits, misses FROM cache_counters WHERE name = ?", (self.name,)
+        ).fetchone()
+        (size,) = connection.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+        return {"hits": hits, "misses": misses, "size": size}
+
+
+class TieredCache:
+    """An in-process TTLCache in front of a cache shared between processes."""
+
+    def __init__(self, local: TTLCache, shared: SQLiteCache):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.local.set(key, value)
+        self.shared.set(key, value)
+
+    def clear(self) -> None:
+        """Clear both tiers; other processes' local tiers expire on their own."""
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hits from either tier; misses are those of the shared tier."""
+        shared = self.shared.stats()
+        return {
+            "hits": self.local.stats()["hits"] + shared["hits"],
+            "misses": shared["misses"],
+            "size": shared["size"],
+        }
+
+
+def build_cache(name: str, max_size: int, ttl_seconds: float, local_tier: bool = True):
+    """A TTLCache, or a tiered cache shared by all workers if CACHE_BACKEND=sqlite.
+
+    Values that are updated in place should pass local_tier=False: a worker's
+    own tier may still hold a copy older than another worker's latest write.
+    """
+    if CACHE_BACKEND == "memory":
+        return TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+    if CACHE_BACKEND != "sqlite":
+        raise ValueError(f"Unknown cache backend: {CACHE_BACKEND}")
+    if not local_tier:
+        return SQLiteCache(SHARED_CACHE_PATH, name, max_size, ttl_seconds)
+    return TieredCache(
+        TTLCache(
+            max_size=max_size, ttl_seconds=min(ttl_seconds, LOCAL_CACHE_TTL_SECONDS)
+        ),
+        SQLiteCache(SHARED_CACHE_PATH, name, max_size, ttl_seconds),
+    )
@@ -0,0 +1,283 @@
+"""
+Synthetic hotel, flight and experience catalogues for scaling tests.
+
+Records have the same schema as the seed files in app/seed_data. Destinations,
+routes, ratings, tiers, departure hours and aircraft are drawn from the seed
+catalogues' own frequencies, and names, descriptions, tags, prices and
+durations are perturbed from seed records in the same city or on the same
+route, so a catalogue of any size keeps the seed data's shape. Output is
+deterministic for a given seed, and records are generated and written one at
+a time, so catalogues larger than memory can be produced.
+
+Usage:
+    python -m app.services.catalogue_generator --scale 100 --output-dir data/x100
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.data import CATALOGUE_FILES, experiences, flights, hotels
+
+SEED_SIZES = {
+    "hotels": len(hotels),
+    "flights": len(flights),
+    "experiences": len(experiences),
+}
+
+NAME_QUALIFIERS = [
+    "Downtown",
+    "Central",
+    "Harbour",
+    "Airport",
+    "Beachfront",
+    "Midtown",
+    "Riverside",
+    "Old Town",
+    "Uptown",
+    "Marina",
+    "Park",
+    "Gardens",
+]
+
+TITLE_VARIANTS = ["Morning", "Evening", "Private", "Small Group", "Family", "Premium"]
+
+# Seed catalogues keep prices as unrendered JS objects; generated data matches
+UNRENDERED_PRICE = "[object Object]"
+
+_DURATION_PATTERN = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def _weighted(counter: Counter) -> Tuple[List[Any], List[int]]:
+    values = list(counter)
+    return values, [counter[value] for value in values]
+
+
+def _duration_minutes(duration_pt: str) -> int:
+    hours, minutes = _DURATION_PATTERN.match(duration_pt).groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+class CatalogueProfile:
+    """Empirical field distributions measured from the seed catalogues."""
+
+    def __init__(
+        self,
+        seed_hotels: Sequence[Dict[str, Any]] = hotels,
+        seed_flights: Sequence[Dict[str, Any]] = flights,
+        seed_experiences: Sequence[Dict[str, Any]] = experiences,
+    ):
+        self.hotel_destinations = _weighted(
+            Counter((h["city"], h["country"]) for h in seed_hotels)
+        )
+        self.hotel_ratings = _weighted(Counter(h["rating"] for h in seed_hotels))
+        self.pricing_tiers = _weighted(Counter(h["pricing_tier"] for h in seed_hotels))
+        amenity_lists = [(h["amenities"] or "").split(",") for h in seed_hotels]
+        self.amenities = sorted(
+            {a for amenities in amenity_lists for a in amenities if a}
+        )
+        self.amenity_counts = [len([a for a in l if a]) for l in amenity_lists]
+        self.hotels_by_city = defaultdict(list)
+        for hotel in seed_hotels:
+            self.hotels_by_city[hotel["city"]].append(hotel)
+
+        self.experience_destinations = _weighted(
+            Counter((e["city"], e["country"]) for e in seed_experiences)
+        )
+        self.experiences_by_city = defaultdict(list)
+        for experience in seed_experiences:
+            self.experiences_by_city[experience["city"]].append(experience)
+        self.tags = sorted({t for e in seed_experiences for t in e["tags"].split(",")})
+
+        route_fields = (
+            "airport_depart",
+            "city_depart",
+            "country_depart",
+            "airport_arrive",
+            "city_arrive",
+            "country_arrive",
+        )
+        self.routes = _weighted(
+            Counter(tuple(f[field] for field in route_fields) for f in seed_flights)
+        )
+        durations = defaultdict(list)
+        for flight in seed_flights:
+            durations[(flight["airport_depart"], flight["airport_arrive"])].append(
+                _duration_minutes(flight["flight_duration"])
+            )
+        self.route_minutes = {
+            route: (statistics.median(m), statistics.pstdev(m) or 10.0)
+            for route, m in durations.items()
+        }
+        self.depart_minutes = [
+            int(f["depart"][11:13]) * 60 + int(f["depart"][14:16]) for f in seed_flights
+        ]
+        self.plane_types = _weighted(Counter(f["plane_type"] for f in seed_flights))
+        self.airline = seed_flights[0]["operating_airline"]
+
+
+class CatalogueGenerator:
+    """Deterministic generator of seed-shaped catalogue records."""
+
+    def __init__(self, seed: int = 0, profile: Optional[CatalogueProfile] = None):
+        self.seed = seed
+        self.profile = profile or CatalogueProfile()
+
+    def _rng(self, kind: str) -> random.Random:
+        # One stream per catalogue so sizes of one never change another's records
+        return random.Random(f"{self.seed}:{kind}")
+
+    @staticmethod
+    def _uuid(rng: random.Random) -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def hotels(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yield count hotel records."""
+        rng = self._rng("hotels")
+        profile = self.profile
+        for index in range(count):
+            city, country = rng.choices(*profile.hotel_destinations)[0]
+            neighbours = profile.hotels_by_city[city]
+            template = rng.choice(neighbours)
+            clauses = [
+                c.strip()
+                for h in (template, rng.choice(neighbours))
+                for c in h["hotel_description"].split(";")
+                if c.strip()
+            ]
+            amenity_count = min(
+                rng.choice(profile.amenity_counts), len(profile.amenities)
+            )
+            yield {
+                "hotel_id": self._uuid(rng),
+                "base_hotel_id": f"{rng.getrandbits(64):016x}",
+                "hotel_name": f"{template['hotel_name']} {rng.choice(NAME_QUALIFIERS)}"
+                f" {index // len(NAME_QUALIFIERS) + 1}",
+                "hotel_description": "; ".join(
+                    dict.fromkeys(rng.sample(clauses, min(3, len(clauses))))
+                ),
+                "city": city,
+                "country": country,
+                "rating": rng.choices(*profile.hotel_ratings)[0],
+                "pricing_tier": rng.choices(*profile.pricing_tiers)[0],
+                "room_pricing": ",".join([UNRENDERED_PRICE] * rng.randint(1, 4)),
+                "amenities": ",".join(rng.sample(profile.amenities, amenity_count)),
+            }
+
+    def experiences(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yield count experience records."""
+        rng = self._rng("experiences")
+        profile = self.profile
+        for _ in range(count):
+            city, country = rng.choices(*profile.experience_destinations)[0]
+            template = rng.choice(profile.experiences_by_city[city])
+            tags = template["tags"].split(",")
+            if rng.random() < 0.3:
+                tags[rng.randrange(len(tags))] = rng.choice(profile.tags)
+            price = float(template["base_price"]) * rng.uniform(0.8, 1.2)
+            duration = template["duration_hours"] + rng.choice([-1, 0, 0, 1])
+            yield {
+                "experience_id": self._uuid(rng),
+                "title": f"{template['title']} ({rng.choice(TITLE_VARIANTS)})",
+                "description": template["description"],
+                "duration_hours": min(max(duration, 1), 8),
+                "city": city,
+                "country": country,
+                "base_price": round(price / 5) * 5.0,
+                "tags": ",".join(dict.fromkeys(tags)),
+                "source": "online",
+            }
+
+    def flights(
+        self, count: int, start: date = date(2025, 7, 1), days: int = 62
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield count flights spread evenly over days starting at start."""
+        rng = self._rng("flights")
+        profile = self.profile
+        per_day = max(1, math.ceil(count / days))
+        number_width = max(4, len(str(per_day)))
+        for index in range(count):
+            day, slot = divmod(index, per_day)
+            route = rng.choices(*profile.routes)[0]
+            depart_airport, depart_city, depart_country = route[:3]
+            arrive_airport, arrive_city, arrive_country = route[3:]
+            median, spread = profile.route_minutes[(depart_airport, arrive_airport)]
+            minutes = max(30, int(rng.gauss(median, spread) / 5) * 5)
+            depart_at = datetime.combine(
+                start + timedelta(days=day), datetime.min.time()
+            ) + timedelta(minutes=rng.choice(profile.depart_minutes))
+            arrive_at = depart_at + timedelta(minutes=minutes)
+            number = f"{slot:0{number_width}d}"
+            yield {
+                "flight_id": f"{depart_at:%Y-%m-%d}-{arrive_airport}-VS-{number}",
+                "flight_number": f"VS{number}",
+                "operating_airline": profile.airline,
+                "airport_depart": depart_airport,
+                "city_depart": depart_city,
+                "country_depart": depart_country,
+                "airport_arrive": arrive_airport,
+                "city_arrive": arrive_city,
+                "country_arrive": arrive_country,
+                "depart": f"{depart_at:%Y-%m-%d %H:%M:%S}+00",
+                "depart_date": f"{depart_at:%Y-%m-%d}",
+                "depart_month": f"{depart_at:%B}",
+                "arrive": f"{arrive_at:%Y-%m-%d %H:%M:%S}+00",
+                "arrive_date": f"{arrive_at:%Y-%m-%d}",
+                "arrive_month": f"{arrive_at:%B}",
+                "flight_duration": f"PT{minutes // 60}H{minutes % 60:02d}M",
+                "cabin_type_price": UNRENDERED_PRICE,
+                "plane_type": rng.choices(*profile.plane_types)[0],
+            }
+
+    def catalogue(self, scale: float) -> Dict[str, Iterator[Dict[str, Any]]]:
+        """Lazy record streams for all three catalogues at scale times the seed sizes."""
+        return {
+            "hotels": self.hotels(int(SEED_SIZES["hotels"] * scale)),
+            "flights": self.flights(int(SEED_SIZES["flights"] * scale)),
+            "experiences": self.experiences(int(SEED_SIZES["experiences"] * scale)),
+        }
+
+
+def _write_records(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """Write records as a JSON array one at a time and return how many."""
+    count = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for count, record in enumerate(records, 1):
+            if count > 1:
+                f.write(", ")
+            f.write(json.dumps(record))
+        f.write("]")
+    return count
+
+
+def write_catalogue(output_dir: str, scale: float, seed: int = 0) -> Dict[str, int]:
+    """Write seed-format catalogue files to output_dir and return record counts."""
+    os.makedirs(output_dir, exist_ok=True)
+    return {
+        kind: _write_records(os.path.join(output_dir, CATALOGUE_FILES[kind]), records)
+        for kind, records in CatalogueGenerator(seed).catalogue(scale).items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scale", type=float, default=10, help="Multiple of seed size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", required=True)
+    args = parser.parse_args()
+
+    counts = write_catalogue(args.output_dir, args.scale, args.seed)
+    print(f"Wrote {counts} to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
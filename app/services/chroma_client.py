@@ -0,0 +1,246 @@
+"""
+Embedded or client/server Chroma.
+
+By default every process opens the persist directory under DB_PATH itself
+(CHROMA_MODE=embedded). With CHROMA_MODE=http the stores talk to a Chroma
+server instead (`chroma run --path ... --port ...`), so any number of API
+replicas on any number of hosts can share one vector store and stay
+stateless:
+
+- one process-wide HttpClient whose httpx pool keeps CHROMA_HTTP_MAX_CONNECTIONS
+  connections alive, wrapped in a RetryingTransport that retries connection
+  failures and 502/503/504 responses CHROMA_RETRIES times with backoff;
+- BatchingCollection, which sends concurrent single-vector queries against
+  the same collection, k and filter as one multi-vector query, so a burst of
+  tool calls costs one round trip instead of one each;
+- ChromaCollectionAlias, keeping blue/green alias records in the server
+  rather than in a file under DB_PATH that other hosts cannot see.
+
+NumPy-engine collections stay local files and are not shared by this mode.
+local_server() starts a throwaway server for tests and benchmarks.
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import chromadb
+import httpx
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+from app.services.collection_alias import CollectionAlias
+from app.services.http_client import RetryingTransport
+
+load_dotenv()
+
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded")
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+CHROMA_SSL = os.getenv("CHROMA_SSL", "false").lower() == "true"
+CHROMA_HTTP_MAX_CONNECTIONS = int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "50"))
+CHROMA_RETRIES = int(os.getenv("CHROMA_RETRIES", "3"))
+CHROMA_RETRY_BACKOFF_SECONDS = float(os.getenv("CHROMA_RETRY_BACKOFF_SECONDS", "0.2"))
+CHROMA_QUERY_BATCH_SIZE = int(os.getenv("CHROMA_QUERY_BATCH_SIZE", "32"))
+
+ALIAS_COLLECTION = "va_collection_aliases"
+
+
+def http_client(
+    host: str = CHROMA_HOST,
+    port: int = CHROMA_PORT,
+    ssl: bool = CHROMA_SSL,
+    retries: int = CHROMA_RETRIES,
+) -> chromadb.ClientAPI:
+    """Chroma server client on a pooled, retrying HTTP transport."""
+    client = chromadb.HttpClient(
+        host=host,
+        port=port,
+        ssl=ssl,
+        settings=Settings(
+            anonymized_telemetry=False,
+            chroma_http_max_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+            chroma_http_max_keepalive_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+        ),
+    )
+    # chromadb builds its own httpx.Client; retry underneath it
+    session = client._server._session
+    session._transport = RetryingTransport(
+        httpx.HTTPTransport(limits=client._server.http_limits),
+        retries,
+        CHROMA_RETRY_BACKOFF_SECONDS,
+    )
+    return client
+
+
+@lru_cache(maxsize=1)
+def shared_http_client() -> chromadb.ClientAPI:
+    """The process-wide client used by every store in http mode."""
+    return http_client()
+
+
+class _Pending:
+    """One caller's query waiting to be sent in a batch."""
+
+    __slots__ = ("embedding", "done", "lead", "result", "error")
+
+    def __init__(self, embedding: Any):
+        self.embedding = embedding
+        self.done = threading.Event()
+        self.lead = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class BatchingCollection:
+    """Collection proxy that batches concurrent single-vector queries.
+
+    The first query for a (k, filter) goes out at once. Queries arriving while
+    it is in flight wait, and the first of them then sends all of them
+    together, so batching adds no latency when traffic is light.
+    """
+
+    def __init__(self, collection: Any, max_batch: int = CHROMA_QUERY_BATCH_SIZE):
+        self._collection = collection
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queues: Dict[str, List[_Pending]] = {}
+        self._busy: Set[str] = set()
+        self.queries = 0
+        self.requests = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._collection, name)
+
+    def query(self, query_embeddings: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        if query_embeddings is None or len(query_embeddings) != 1:
+            return self._collection.query(query_embeddings=query_embeddings, **kwargs)
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+        pending = _Pending(query_embeddings[0])
+        with self._lock:
+            self.queries += 1
+            self._queues.setdefault(key, []).append(pending)
+            if key not in self._busy:
+                self._busy.add(key)
+                pending.lead = True
+        if not pending.lead:
+            pending.done.wait()
+        if pending.lead and pending.result is None and pending.error is None:
+            self._send(key, kwargs)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _send(self, key: str, kwargs: Dict[str, Any]) -> None:
+        """Send queued queries for key in one request; hand off to a waiter."""
+        with self._lock:
+            queue = self._queues[key]
+            batch, self._queues[key] = queue[: self.max_batch], queue[self.max_batch :]
+            self.requests += 1
+        try:
+            results = self._collection.query(
+                query_embeddings=[pending.embedding for pending in batch], **kwargs
+            )
+            for i, pending in enumerate(batch):
+                pending.result = {
+                    field: (
+                        [values[i]]
+                        if field != "included" and values is not None
+                        else values
+                    )
+                    for field, values in results.items()
+                }
+        except BaseException as error:
+            for pending in batch:
+                pending.error = error
+        finally:
+            with self._lock:
+                waiting = self._queues.get(key)
+                if waiting:
+                    waiting[0].lead = True
+                    waiting[0].done.set()
+                else:
+                    self._queues.pop(key, None)
+                    self._busy.discard(key)
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queries": self.queries, "requests": self.requests}
+
+
+def batch_queries(store: Any) -> Any:
+    """Route a LangChain Chroma store's queries through a BatchingCollection."""
+    if not isinstance(store._chroma_collection, BatchingCollection):
+        store._chroma_collection = BatchingCollection(store._chroma_collection)
+    return store
+
+
+class ChromaCollectionAlias(CollectionAlias):
+    """CollectionAlias whose record lives in the Chroma server."""
+
+    def __init__(self, client: chromadb.ClientAPI, kind: str, **kwargs: Any):
+        self.client = client
+        self.kind = kind
+        super().__init__(f"chroma://{ALIAS_COLLECTION}/{kind}", **kwargs)
+
+    def _aliases(self) -> Any:
+        return self.client.get_or_create_collection(ALIAS_COLLECTION)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        documents = self._aliases().get(ids=[self.kind])["documents"]
+        return json.loads(documents[0]) if documents else None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        # Upserting one record is atomic, like the file alias's rename
+        self._aliases().upsert(
+            ids=[self.kind], documents=[json.dumps(record)], embeddings=[[0.0]]
+        )
+
+    def delete(self) -> None:
+        with self._lock:
+            self._aliases().delete(ids=[self.kind])
+            self.version = 0
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@contextmanager
+def local_server(path: str, port: Optional[int] = None) -> Iterator[int]:
+    """Run `chroma run` on path for the duration of the block; yields the port."""
+    executable = shutil.which("chroma")
+    if executable is None:
+        raise RuntimeError("The chroma CLI is not installed")
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [executable, "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(
+                    f"http://127.0.0.1:{port}/api/v2/heartbeat"
+                ).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"Chroma server on port {port} did not start")
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(10)
@@ -0,0 +1,65 @@
+"""
+Single-flight coalescing for identical in-flight requests.
+"""
+
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict
+
+
+def normalise_query(query: str) -> str:
+    """Normalise a query so that case and whitespace differences share a key."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SingleFlight:
+    """Run one coroutine per key and share its outcome with concurrent callers.
+
+    The first caller for a key starts the work, later callers await the same task.
+    Results and errors are shared by every waiter, but nothing is cached once the
+    task finishes. A waiter being cancelled does not cancel the shared task unless
+    it was the last one still waiting for it.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "errors": 0, "cancelled": 0}
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the shared result for key, starting func if nothing is in flight."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished task and record how it ended."""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            del self._waiters[key]
+
+        if task.cancelled():
+            self._stats["cancelled"] += 1
+        elif task.exception() is not None:
+            self._stats["errors"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters and the number of keys in flight."""
+        return {**self._stats, "in_flight": len(self._tasks)}
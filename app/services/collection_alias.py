@@ -0,0 +1,140 @@
+"""
+Versioned collections behind an on-disk alias, for blue/green reindexing.
+
+Each catalogue is served from one version of its collection. Version 0 is the
+original unversioned name (va_hotels_collection); later versions add a suffix
+(va_hotels_collection_v3), since Chroma names only allow letters, digits,
+dots, dashes and underscores. A reindex builds the next version beside the
+live one and, once it validates, rewrites the alias file to point at it:
+
+    {DB_PATH}/{kind}/alias.json
+    {"version": 3, "collection": "va_hotels_collection_v3", "count": 562,
+     "schema": {...}, "versions": [2, 3], "building": null, ...}
+
+The file is replaced atomically, so readers see the old version or the new
+one and never an empty or half-built collection. Processes that did not run
+the reindex notice the new version on their next poll() and reopen their
+store. Superseded versions are deleted once more than keep versions exist;
+keeping the previous one means other processes can finish their searches on
+it before they poll, and leaves a rollback target.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ALIAS_REFRESH_SECONDS = float(os.getenv("ALIAS_REFRESH_SECONDS", "5"))
+COLLECTION_VERSIONS_KEPT = int(os.getenv("COLLECTION_VERSIONS_KEPT", "2"))
+
+
+def versioned_name(collection_name: str, version: int) -> str:
+    """Collection name for a version; version 0 is the unversioned name."""
+    return f"{collection_name}_v{version}" if version else collection_name
+
+
+class CollectionAlias:
+    """Pointer from a catalogue to the collection version it is served from."""
+
+    def __init__(self, path: str, refresh_seconds: float = ALIAS_REFRESH_SECONDS):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self.version = self.live_version()
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """The alias record, or None before the first swap."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def live_version(self) -> int:
+        record = self.read()
+        return record["version"] if record else 0
+
+    def versions(self) -> List[int]:
+        """Versions on disk, oldest first, including an unfinished build."""
+        record = self.read() or {"versions": [0]}
+        versions = set(record["versions"])
+        if record.get("building") is not None:
+            versions.add(record["building"])
+        return sorted(versions)
+
+    def start_build(self) -> int:
+        """Version to build next; resumes an unfinished build."""
+        with self._lock:
+            record = self.read() or {"version": 0, "versions": [0]}
+            if record.get("building") is None:
+                record["building"] = max(record["versions"]) + 1
+                self._write(record)
+            return record["building"]
+
+    def point_to(self, version: int, **fields: Any) -> Dict[str, Any]:
+        """Atomically make version the live collection."""
+        with self._lock:
+            record = self.read() or {"version": 0, "versions": [0]}
+            record.update(
+                fields,
+                version=version,
+                versions=sorted(set(record["versions"]) | {version}),
+                building=None,
+                swapped_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            )
+            self._write(record)
+            self.version = version
+            return record
+
+    def superseded(self, keep: int = COLLECTION_VERSIONS_KEPT) -> List[int]:
+        """Versions beyond the newest keep, never the live one or a build."""
+        record = self.read()
+        if not record:
+            return []
+        finished = [v for v in record["versions"] if v <= record["version"]]
+        return [v for v in finished[: -max(1, keep)] if v != record["version"]]
+
+    def forget(self, versions: List[int]) -> None:
+        """Drop deleted versions from the record."""
+        with self._lock:
+            record = self.read()
+            if record:
+                record["versions"] = [
+                    v for v in record["versions"] if v not in versions
+                ]
+                self._write(record)
+
+    def poll(self) -> bool:
+        """True, at most once per refresh interval, if the live version moved."""
+        now = time.monotonic()
+        if now - self._checked < self.refresh_seconds:
+            return False
+        self._checked = now
+        version = self.live_version()
+        if version == self.version:
+            return False
+        self.version = version
+        return True
+
+    def delete(self) -> None:
+        """Remove the alias, so the unversioned collection is served again."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.version = 0
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(record, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
@@ -0,0 +1,116 @@
+"""
+Per-request deadlines and stage-level timeouts.
+
+A request opens a deadline scope; every stage (validation, manager, sub-agents,
+searches) then runs with the smaller of its own budget and the time left on the
+request. Stages that time out are recorded so optional enrichments can degrade
+to partial advice instead of failing the whole request.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, Set, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Stays below the UI's 120 s client timeout so the server answers first
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "110"))
+
+STAGE_BUDGETS: Dict[str, float] = {
+    "moderation": 5,
+    "manager": 100,
+    "hotel_agent": 45,
+    "flight_agent": 45,
+    "experience_agent": 45,
+    "search": 10,
+    "response_validation": 10,
+}
+for _stage in STAGE_BUDGETS:
+    STAGE_BUDGETS[_stage] = float(
+        os.getenv(f"STAGE_TIMEOUT_{_stage.upper()}", STAGE_BUDGETS[_stage])
+    )
+
+# Time kept back from sub-agents so the manager can still compose an answer
+COMPOSE_RESERVE_SECONDS = float(os.getenv("COMPOSE_RESERVE_SECONDS", "15"))
+
+# Enrichment each optional sub-agent stage produces
+ENRICHMENT_STAGES = {
+    "hotel_agent": "hotel",
+    "flight_agent": "flight",
+    "experience_agent": "experience",
+}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+_timed_out: ContextVar[Optional[Set[str]]] = ContextVar(
+    "timed_out_stages", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage runs out of time."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} timed out")
+        self.stage = stage
+
+
+@contextmanager
+def deadline_scope(seconds: float = REQUEST_TIMEOUT_SECONDS):
+    """Bound everything run in this context to finish within seconds."""
+    deadline_token = _deadline.set(time.monotonic() + seconds)
+    timed_out_token = _timed_out.set(set())
+    try:
+        yield
+    finally:
+        _deadline.reset(deadline_token)
+        _timed_out.reset(timed_out_token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the current request, or None outside a deadline scope."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timed_out_stages() -> Set[str]:
+    """Stages that have timed out in the current request."""
+    return set(_timed_out.get() or ())
+
+
+def degraded_enrichments() -> Set[str]:
+    """Optional enrichments missing because their sub-agent timed out."""
+    return {ENRICHMENT_STAGES[s] for s in timed_out_stages() if s in ENRICHMENT_STAGES}
+
+
+def stage_timeout(stage: str, reserve: float = 0) -> float:
+    """Timeout for stage: its budget, capped by the request's remaining time."""
+    timeout = STAGE_BUDGETS.get(stage, REQUEST_TIMEOUT_SECONDS)
+    time_left = remaining()
+    if time_left is not None:
+        timeout = min(timeout, time_left - reserve)
+    return timeout
+
+
+async def run_stage(stage: str, awaitable: Awaitable[T], reserve: float = 0) -> T:
+    """Await a stage within its budget, cancelling it and raising on expiry."""
+    timeout = stage_timeout(stage, reserve)
+    try:
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        timed_out = _timed_out.get()
+        if timed_out is not None:
+            timed_out.add(stage)
+        raise DeadlineExceeded(stage) from None
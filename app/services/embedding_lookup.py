@@ -0,0 +1,249 @@
+"""
+Precomputed embeddings for templated tool queries.
+
+The agents' search tools build their queries from a few fixed shapes around
+catalogue entities ("family hotel in Orlando", "flights from London to Miami
+in July"). At ingest time query_templates() enumerates template x entity
+combinations from the ingested catalogues and EmbeddingLookup.build() embeds
+them in bulk, a few large embedding requests instead of one online request
+per query, into a table next to the stores:
+
+    {DB_PATH}/query_embeddings/index.json       {"schema": {...}, "texts": [...],
+                                                 "vectors": "vectors-<stamp>.f32"}
+    {DB_PATH}/query_embeddings/vectors-<stamp>.f32   row-major float32 vectors
+
+The query embedding path (CachedEmbeddings in app/datastore.py) looks a query
+up here before calling the API. Keys are normalised for case and whitespace.
+The vector file is memory-mapped, so server workers share its pages, and a
+rebuilt table replaces index.json atomically and is picked up by running
+processes within refresh_seconds. A table embedded with a different model or
+dimension than the stores is ignored.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services.coalescer import normalise_query
+
+load_dotenv()
+
+LOOKUP_REFRESH_SECONDS = float(os.getenv("QUERY_EMBEDDINGS_REFRESH_SECONDS", "60"))
+# Texts per embedding request when building the table
+LOOKUP_BATCH_SIZE = int(os.getenv("QUERY_EMBEDDINGS_BATCH_SIZE", "500"))
+
+# Query shapes the hotel, experience and flight tools send to vector search
+HOTEL_TEMPLATES = [
+    "hotel in {city}",
+    "hotels in {city}",
+    "family hotel in {city}",
+    "luxury hotel in {city}",
+    "budget hotel in {city}",
+    "romantic hotel in {city}",
+    "beach hotel in {city}",
+]
+EXPERIENCE_TEMPLATES = [
+    "things to do in {city}",
+    "experiences in {city}",
+    "activities in {city}",
+    "{tag} experiences in {city}",
+    "{tag} activities in {city}",
+]
+FLIGHT_TEMPLATES = [
+    "flights from {origin} to {destination}",
+    "flights from {origin} to {destination} in {month}",
+    "flights to {destination}",
+    "flights to {destination} in {month}",
+]
+
+
+def _expand(templates: List[str], rows: Iterable[Dict[str, str]]) -> Iterator[str]:
+    """Fill each template from every row holding all of its fields."""
+    rows = list(rows)
+    for template in templates:
+        for row in rows:
+            try:
+                yield template.format(**row)
+            except KeyError:
+                continue
+
+
+def query_templates(
+    hotels: Iterable[Dict[str, Any]],
+    experiences: Iterable[Dict[str, Any]],
+    flights: Iterable[Dict[str, Any]],
+) -> List[str]:
+    """Distinct templated queries over the catalogues' cities, tags and routes.
+
+    Each catalogue is read once, so streamed records are accepted.
+    """
+    hotel_cities = sorted({hotel["city"] for hotel in hotels})
+    experience_cities, tags = set(), set()
+    for experience in experiences:
+        experience_cities.add(experience["city"])
+        tags.update(tag.strip() for tag in (experience.get("tags") or "").split(","))
+    experience_cities, tags = sorted(experience_cities), sorted(tags - {""})
+    routes, months = set(), set()
+    for f in flights:
+        routes.add((f["city_depart"], f["city_arrive"]))
+        if f.get("depart_month"):
+            months.add(f["depart_month"])
+    routes, months = sorted(routes), sorted(months)
+    destinations = sorted({destination for _, destination in routes})
+
+    queries = list(_expand(HOTEL_TEMPLATES, ({"city": c} for c in hotel_cities)))
+    queries += _expand(
+        EXPERIENCE_TEMPLATES,
+        [{"city": c} for c in experience_cities]
+        + [{"city": c, "tag": t} for c in experience_cities for t in tags],
+    )
+    queries += _expand(
+        FLIGHT_TEMPLATES,
+        [{"origin": o, "destination": d} for o, d in routes]
+        + [
+            {"origin": o, "destination": d, "month": m}
+            for o, d in routes
+            for m in months
+        ]
+        + [{"destination": d} for d in destinations]
+        + [{"destination": d, "month": m} for d in destinations for m in months],
+    )
+    # Rows carrying an unused field repeat a query; keep the first of each
+    return list(dict.fromkeys(queries))
+
+
+class EmbeddingLookup:
+    """Read-only table of precomputed query embeddings keyed by normalised text."""
+
+    def __init__(
+        self,
+        path: str,
+        schema: Dict[str, Any],
+        refresh_seconds: float = LOOKUP_REFRESH_SECONDS,
+    ):
+        self.path = path
+        self.schema = schema
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # (rows by text, vectors), replaced as a whole so readers never see
+        # the rows of one table with the vectors of another
+        self._table: Tuple[Dict[str, int], Optional[np.ndarray]] = ({}, None)
+        self._loaded: Optional[tuple] = None
+        self._checked = float("-inf")
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.path, "index.json")
+
+    def _refresh(self) -> None:
+        """Reload the table if index.json changed since the last check."""
+        now = time.monotonic()
+        if now - self._checked < self.refresh_seconds:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                stat = os.stat(self.index_path)
+            except FileNotFoundError:
+                self._table, self._loaded = ({}, None), None
+                return
+            # index.json is replaced, never rewritten, so a new inode means a rebuild
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if version == self._loaded:
+                return
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+                texts = index["texts"]
+                if index["schema"] != self.schema or not texts:
+                    self._table, self._loaded = ({}, None), version
+                    return
+                vectors = np.memmap(
+                    os.path.join(self.path, index["vectors"]),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(len(texts), index["dimensions"]),
+                )
+            except FileNotFoundError:
+                # A rebuild replaced the table mid-load; keep serving the
+                # current one and load the new one on the next lookup
+                self._checked = float("-inf")
+                return
+            self._loaded = version
+            self._table = ({text: row for row, text in enumerate(texts)}, vectors)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """The precomputed vector for text, or None."""
+        self._refresh()
+        rows, vectors = self._table
+        row = rows.get(normalise_query(text))
+        if row is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return vectors[row].tolist()
+
+    def holds(self, texts: List[str]) -> bool:
+        """True if the table holds exactly texts, embedded with this schema."""
+        self._checked = float("-inf")
+        self._refresh()
+        return self._table[0].keys() == {normalise_query(text) for text in texts}
+
+    def build(
+        self,
+        texts: List[str],
+        embed_documents: Callable[[List[str]], List[List[float]]],
+        batch_size: int = LOOKUP_BATCH_SIZE,
+    ) -> int:
+        """Embed texts in bulk and atomically replace the table; returns its size."""
+        # Embed each query as written; look it up by its normalised form
+        originals = {}
+        for text in texts:
+            originals.setdefault(normalise_query(text), text)
+        keys, texts = list(originals), list(originals.values())
+        os.makedirs(self.path, exist_ok=True)
+        name = f"vectors-{time.time_ns()}.f32"
+        dimensions = 0
+        with open(os.path.join(self.path, name), "wb") as f:
+            for start in range(0, len(keys), batch_size):
+                batch = np.asarray(
+                    embed_documents(texts[start : start + batch_size]), dtype=np.float32
+                )
+                dimensions = batch.shape[1]
+                f.write(batch.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        temporary = f"{self.index_path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(
+                {
+                    "schema": self.schema,
+                    "dimensions": dimensions,
+                    "vectors": name,
+                    "texts": keys,
+                },
+                f,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.index_path)
+
+        # Processes still mapping an old file keep it until they reload
+        for old in os.listdir(self.path):
+            if old.startswith("vectors-") and old != name:
+                os.remove(os.path.join(self.path, old))
+        self._checked = float("-inf")
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and size counters."""
+        self._refresh()
+        return {"hits": self._hits, "misses": self._misses, "size": len(self._table[0])}
@@ -0,0 +1,45 @@
+"""
+Flight fields derived from the catalogue the same way wherever a flight is shown.
+
+The seed catalogues carry no fares (cabin_type_price is an unrendered JS
+object), so cabin_price() gives each flight a mock fare seeded by its
+flight_id. Ingested flight documents, flights found through the date index
+and itinerary legs therefore all quote the same price for a flight, and
+max_price filters agree with what the vector store holds. Durations are
+shown in one format too, whether parsed from a flight's ISO 8601 duration or
+measured across the legs of an itinerary.
+"""
+
+import random
+import re
+from functools import lru_cache
+from typing import Any, Dict
+
+
+def cabin_price(flight: Dict[str, Any]) -> float:
+    """Stable per-flight price between $100 and $1000."""
+    return float(random.Random(flight.get("flight_id")).randint(100, 1000))
+
+
+_DURATION_PT = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+# A schedule repeats a few hundred distinct durations, so each is parsed once
+@lru_cache(maxsize=4096)
+def convert_duration_to_string(duration_pt: str) -> str:
+    """Convert PT duration format to readable string."""
+    if not duration_pt or not duration_pt.startswith("PT"):
+        raise ValueError(f"Invalid duration format: {duration_pt}")
+
+    hours, minutes = _DURATION_PT.match(duration_pt).groups()
+    hours = int(hours) if hours else 0
+    minutes = int(minutes) if minutes else 0
+
+    if hours and minutes:
+        return f"{hours}h {minutes}m"
+    elif hours:
+        return f"{hours}h"
+    elif minutes:
+        return f"{minutes}m"
+    else:
+        raise ValueError(f"No valid duration found in: {duration_pt}")
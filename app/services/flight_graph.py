@@ -0,0 +1,333 @@
+"""
+Cheapest-fare and multi-leg itinerary search over the flight schedule.
+
+Airports are nodes and timed flights are edges, kept per route sorted by
+departure. A search is a best-first label-setting search from every first leg
+departing in the travel window: labels are partial itineraries ordered by fare
+(or elapsed time), a connection must leave at least MIN_CONNECTION_MINUTES and
+at most MAX_CONNECTION_HOURS after the previous leg lands, and a label is
+dropped once k other itineraries have reached the same airport no later, no
+dearer, in no more legs, having set off no earlier and able to make every
+connection it can. An earlier arrival alone is not enough: its layover window
+closes sooner, so it can miss a later connection. Itineraries reach the
+destination in rank order, so the search stops after the first k.
+
+Two things keep a search from touching every connection in the window. Legs
+are only followed into airports that can still reach the destination in the
+legs left. And the flights on a route are not pushed one by one: the heap
+holds the departure window as an index range, a sparse-table range-minimum
+query picks its next-best leg (cheapest, shortest or earliest-arriving), and
+popping that leg splits the range around it. Only flights that could rank
+next are ever materialised.
+
+Fares are the mock per-flight prices of flight_fields.cabin_price(), so an
+itinerary leg costs what the same flight's document quotes.
+"""
+
+import heapq
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services.flight_fields import cabin_price, convert_duration_to_string
+from app.services.logger import get_logger
+
+load_dotenv()
+
+MIN_CONNECTION_MINUTES = int(os.getenv("MIN_CONNECTION_MINUTES", "60"))
+MAX_CONNECTION_HOURS = int(os.getenv("MAX_CONNECTION_HOURS", "24"))
+MAX_LEGS = int(os.getenv("ITINERARY_MAX_LEGS", "3"))
+
+SORT_KEYS = ("price", "duration")
+
+
+# Catalogue times carry hour-only offsets ("2023-05-25 03:27:00+00"), which
+# datetime.fromisoformat only accepts from Python 3.11
+_HOUR_OFFSET = re.compile(r"([+-]\d{2})$")
+
+
+def parse_schedule_time(value: str) -> datetime:
+    """A catalogue departure or arrival time as an aware datetime."""
+    value = _HOUR_OFFSET.sub(r"\1:00", value.strip().replace("Z", "+00:00"))
+    return datetime.fromisoformat(value)
+
+
+def _timestamp(value: str) -> float:
+    return parse_schedule_time(value).timestamp()
+
+
+def _utc_midnight(day: date) -> float:
+    return datetime.combine(day, time.min, timezone.utc).timestamp()
+
+
+class Leg:
+    """One flight as a timed, priced edge between two airports."""
+
+    __slots__ = ("flight", "origin", "destination", "depart", "arrive", "fare")
+
+    def __init__(self, flight: Dict[str, Any]):
+        self.flight = flight
+        self.origin = flight["airport_depart"]
+        self.destination = flight["airport_arrive"]
+        self.depart = _timestamp(flight["depart"])
+        self.arrive = _timestamp(flight["arrive"])
+        self.fare = cabin_price(flight)
+
+    @property
+    def duration(self) -> float:
+        return self.arrive - self.depart
+
+
+class Labels:
+    """Partial itineraries kept at one airport, for dominance counts."""
+
+    def __init__(self):
+        self.size = 0
+        self.rows = np.empty((16, 5), dtype=np.float64)
+
+    def dominating(
+        self, fare: float, arrive: float, first: float, legs: int, horizon: int
+    ) -> int:
+        """How many kept labels are no dearer, no later, as early and as short,
+        and can make every connection this one can.
+
+        horizon counts the departures from the airport up to the end of the
+        label's layover window; arriving no later, a kept label with the same
+        horizon can take every connection this one could.
+        """
+        rows = self.rows[: self.size]
+        return int(
+            np.count_nonzero(
+                (rows[:, 0] <= fare)
+                & (rows[:, 1] <= arrive)
+                & (rows[:, 2] >= first)
+                & (rows[:, 3] <= legs)
+                & (rows[:, 4] >= horizon)
+            )
+        )
+
+    def add(
+        self, fare: float, arrive: float, first: float, legs: int, horizon: int
+    ) -> None:
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.empty_like(self.rows)])
+        self.rows[self.size] = (fare, arrive, first, legs, horizon)
+        self.size += 1
+
+
+class RangeMin:
+    """Sparse table answering argmin over an index range in O(1)."""
+
+    def __init__(self, values: List[float]):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.levels = [np.arange(len(values))]
+        width = 1
+        while width * 2 <= len(values):
+            previous = self.levels[-1]
+            size = len(values) - width * 2 + 1
+            left, right = previous[:size], previous[width : width + size]
+            self.levels.append(
+                np.where(self.values[left] <= self.values[right], left, right)
+            )
+            width *= 2
+
+    def argmin(self, lo: int, hi: int) -> int:
+        """Index of the smallest value in [lo, hi]."""
+        level = (hi - lo + 1).bit_length() - 1
+        left = self.levels[level][lo]
+        right = self.levels[level][hi - (1 << level) + 1]
+        return int(left if self.values[left] <= self.values[right] else right)
+
+
+class Route:
+    """Legs on one airport pair, sorted by departure."""
+
+    def __init__(self, legs: List[Leg]):
+        self.legs = sorted(legs, key=lambda leg: leg.depart)
+        self.departs = [leg.depart for leg in self.legs]
+        self._minimums: Dict[str, RangeMin] = {}
+
+    def span(self, earliest: float, latest: float) -> Tuple[int, int]:
+        """Inclusive index range of legs departing within [earliest, latest]."""
+        return (
+            bisect_left(self.departs, earliest),
+            bisect_right(self.departs, latest) - 1,
+        )
+
+    def best(self, key: str, lo: int, hi: int) -> int:
+        """Index of the leg in [lo, hi] with the lowest fare or arrival."""
+        minimum = self._minimums.get(key)
+        if minimum is None:
+            minimum = self._minimums[key] = RangeMin(
+                [getattr(leg, key) for leg in self.legs]
+            )
+        return minimum.argmin(lo, hi)
+
+
+class FlightGraph:
+    """Routes between airports, searched for ranked itineraries."""
+
+    def __init__(
+        self,
+        flights: List[Dict[str, Any]],
+        min_connection_minutes: int = MIN_CONNECTION_MINUTES,
+        max_connection_hours: int = MAX_CONNECTION_HOURS,
+    ):
+        self.min_connection = min_connection_minutes * 60
+        self.max_connection = max_connection_hours * 3600
+        legs: Dict[Tuple[str, str], List[Leg]] = {}
+        # Flights without a usable schedule, by reason
+        self.skipped: Dict[str, int] = {}
+        for flight in flights:
+            try:
+                leg = Leg(flight)
+            except (KeyError, TypeError, ValueError) as error:
+                reason = type(error).__name__
+                self.skipped[reason] = self.skipped.get(reason, 0) + 1
+                continue
+            if leg.arrive <= leg.depart:
+                self.skipped["arrives_before_departure"] = (
+                    self.skipped.get("arrives_before_departure", 0) + 1
+                )
+                continue
+            legs.setdefault((leg.origin, leg.destination), []).append(leg)
+        if self.skipped:
+            get_logger().warning(
+                "Flights left out of the itinerary graph", skipped=self.skipped
+            )
+        self.routes = {pair: Route(route_legs) for pair, route_legs in legs.items()}
+        self.neighbours: Dict[str, Set[str]] = {}
+        # Every departure from each airport, sorted, for layover windows
+        self.departures: Dict[str, List[float]] = {}
+        for (origin, destination), route in self.routes.items():
+            self.neighbours.setdefault(origin, set()).add(destination)
+            self.departures.setdefault(origin, []).extend(route.departs)
+        for departs in self.departures.values():
+            departs.sort()
+
+    @property
+    def airports(self) -> List[str]:
+        return sorted(self.neighbours)
+
+    @property
+    def edges(self) -> int:
+        return sum(len(route.legs) for route in self.routes.values())
+
+    def _reach(self, destinations: Set[str], max_legs: int) -> List[Set[str]]:
+        """reach[n]: airports that can get to a destination in at most n legs."""
+        reach = [set(destinations)]
+        for _ in range(max_legs):
+            previous = reach[-1]
+            reach.append(
+                previous
+                | {
+                    airport
+                    for airport, neighbours in self.neighbours.items()
+                    if neighbours & previous
+                }
+            )
+        return reach
+
+    def itineraries(
+        self,
+        origins: Set[str],
+        destinations: Set[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        sort_by: str = "price",
+        max_legs: int = MAX_LEGS,
+        k: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """Best k itineraries whose first leg departs between start and end."""
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown itinerary sort: {sort_by}")
+        # Schedule times are UTC, so the window is whole UTC days
+        earliest = _utc_midnight(start) if start else float("-inf")
+        latest = _utc_midnight(end + timedelta(days=1)) - 1 if end else float("inf")
+        reach = self._reach(destinations, max_legs)
+
+        # Entries: (rank, tiebreak, prefix fare, prefix legs, route, lo, hi, best)
+        # where best is the top-ranked leg index of route.legs[lo : hi + 1]
+        heap: List[tuple] = []
+        counter = 0
+
+        def push(fare: float, prefix: List[Leg], route: Route, lo: int, hi: int):
+            nonlocal counter
+            if lo > hi:
+                return
+            # The fastest first leg is the shortest flight; after that the
+            # earliest arrival, since the itinerary's start is fixed
+            if sort_by == "price":
+                key = "fare"
+            else:
+                key = "arrive" if prefix else "duration"
+            best = route.best(key, lo, hi)
+            leg = route.legs[best]
+            total = fare + leg.fare
+            elapsed = leg.arrive - (prefix[0] if prefix else leg).depart
+            rank = (total, elapsed) if sort_by == "price" else (elapsed, total)
+            heapq.heappush(heap, (rank, counter, fare, prefix, route, lo, hi, best))
+            counter += 1
+
+        def expand(
+            airport: str, legs: List[Leg], fare: float, after: float, until: float
+        ):
+            visited = {leg.origin for leg in legs} | {airport}
+            remaining = reach[max_legs - len(legs) - 1]
+            for next_airport in self.neighbours.get(airport, ()):
+                if next_airport in visited or next_airport not in remaining:
+                    continue
+                route = self.routes[(airport, next_airport)]
+                push(fare, legs, route, *route.span(after, until))
+
+        for origin in origins:
+            expand(origin, [], 0.0, earliest, latest)
+
+        labels: Dict[str, Labels] = {}
+        results: List[Dict[str, Any]] = []
+        while heap and len(results) < k:
+            _, _, prefix_fare, prefix, route, lo, hi, best = heapq.heappop(heap)
+            push(prefix_fare, prefix, route, lo, best - 1)
+            push(prefix_fare, prefix, route, best + 1, hi)
+            last = route.legs[best]
+            legs = prefix + [last]
+            fare = prefix_fare + last.fare
+            if last.destination in destinations:
+                results.append(self._itinerary(legs, fare))
+                continue
+
+            after = last.arrive + self.min_connection
+            until = last.arrive + self.max_connection
+            horizon = bisect_right(self.departures.get(last.destination, []), until)
+            kept = labels.setdefault(last.destination, Labels())
+            label = (fare, last.arrive, legs[0].depart, len(legs), horizon)
+            if kept.dominating(*label) >= k:
+                continue
+            kept.add(*label)
+
+            if len(legs) < max_legs:
+                expand(last.destination, legs, fare, after, until)
+        return results
+
+    @staticmethod
+    def _itinerary(legs: List[Leg], fare: float) -> Dict[str, Any]:
+        minutes = int(legs[-1].arrive - legs[0].depart) // 60
+        return {
+            "airline": legs[0].flight.get("operating_airline"),
+            "from_airport": legs[0].origin,
+            "to_airport": legs[-1].destination,
+            "price": fare,
+            "duration": convert_duration_to_string(
+                f"PT{minutes // 60}H{minutes % 60}M"
+            ),
+            "date": legs[0].flight.get("depart_date"),
+            "stops": [leg.destination for leg in legs[:-1]],
+            "flights": [leg.flight.get("flight_number") for leg in legs],
+            "depart": legs[0].flight.get("depart"),
+            "arrive": legs[-1].flight.get("arrive"),
+        }
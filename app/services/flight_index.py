@@ -0,0 +1,106 @@
+"""
+Sorted date and route indexes over the flight catalogue.
+
+Date windows are the most common flight constraint and need no embeddings.
+Each index keeps its flights sorted by departure date as ordinal day numbers,
+so a window is two bisections and a slice: O(log n + k) for k matches. Route
+indexes hold the same sorted columns per (origin, destination) airport pair
+and per origin or destination airport, so route + date queries only touch
+matching flights.
+
+Places are resolved to airport codes from the catalogue itself: an IATA code,
+a city or a country ("JFK", "New York", "Barbados").
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+class DateColumn:
+    """Flights sorted by departure date with a parallel list of day ordinals."""
+
+    def __init__(self, rows: List[Tuple[int, str, int]]):
+        rows.sort()
+        self.ordinals = [ordinal for ordinal, _, _ in rows]
+        self.rows = rows
+
+    def window(self, start: int, end: int) -> List[Tuple[int, str, int]]:
+        """Rows departing from start to end inclusive, in departure order."""
+        return self.rows[
+            bisect_left(self.ordinals, start) : bisect_right(self.ordinals, end)
+        ]
+
+
+class FlightDateIndex:
+    """Date-window search over flights, optionally restricted to a route."""
+
+    def __init__(self, flights: List[Dict[str, Any]]):
+        self.flights = flights
+        self.places: Dict[str, Set[str]] = {}
+        rows: List[Tuple[int, str, int]] = []
+        by_route: Dict[Tuple[str, str], List[Tuple[int, str, int]]] = {}
+        by_origin: Dict[str, List[Tuple[int, str, int]]] = {}
+        by_destination: Dict[str, List[Tuple[int, str, int]]] = {}
+
+        for position, flight in enumerate(flights):
+            try:
+                ordinal = date.fromisoformat(flight["depart_date"]).toordinal()
+            except (KeyError, TypeError, ValueError):
+                continue
+            # Departure time breaks ties so each window lists flights in order
+            row = (ordinal, flight.get("depart") or "", position)
+            origin = flight.get("airport_depart")
+            destination = flight.get("airport_arrive")
+            rows.append(row)
+            by_route.setdefault((origin, destination), []).append(row)
+            by_origin.setdefault(origin, []).append(row)
+            by_destination.setdefault(destination, []).append(row)
+            for side in ("depart", "arrive"):
+                airport = flight.get(f"airport_{side}")
+                for place in (
+                    airport,
+                    flight.get(f"city_{side}"),
+                    flight.get(f"country_{side}"),
+                ):
+                    if place and airport:
+                        self.places.setdefault(place.lower(), set()).add(airport)
+
+        self.all = DateColumn(rows)
+        self.routes = {key: DateColumn(v) for key, v in by_route.items()}
+        self.origins = {key: DateColumn(v) for key, v in by_origin.items()}
+        self.destinations = {key: DateColumn(v) for key, v in by_destination.items()}
+
+    def airports(self, place: str) -> Optional[Set[str]]:
+        """Airport codes for a code, city or country, or None if unknown."""
+        return self.places.get(place.strip().lower())
+
+    def _columns(
+        self, origins: Optional[Set[str]], destinations: Optional[Set[str]]
+    ) -> List[DateColumn]:
+        if origins and destinations:
+            keys = [(o, d) for o in origins for d in destinations]
+            return [self.routes[key] for key in keys if key in self.routes]
+        if origins:
+            return [self.origins[o] for o in origins if o in self.origins]
+        if destinations:
+            return [
+                self.destinations[d] for d in destinations if d in self.destinations
+            ]
+        return [self.all]
+
+    def search(
+        self,
+        start: date,
+        end: date,
+        origins: Optional[Set[str]] = None,
+        destinations: Optional[Set[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Flights departing in [start, end] on the given airports, earliest first."""
+        windows = [
+            column.window(start.toordinal(), end.toordinal())
+            for column in self._columns(origins, destinations)
+        ]
+        for _, _, position in heapq.merge(*windows):
+            yield self.flights[position]
@@ -0,0 +1,231 @@
+"""
+Shared, pooled HTTP clients for all OpenAI traffic.
+
+The chat agents, the embeddings client and the moderation call all reuse the
+same keep-alive connection pools instead of opening their own, so TLS handshakes
+are paid once per connection rather than once per request or client.
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from pydantic_ai.models import Model, infer_model
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and (
+    importlib.util.find_spec("h2") is not None
+)
+
+
+class PoolMonitor:
+    """Counts requests per host for pool-utilisation metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "in_flight": 0, "peak_in_flight": 0}
+        )
+
+    def started(self, host: str) -> None:
+        with self._lock:
+            counters = self._hosts[host]
+            counters["requests"] += 1
+            counters["in_flight"] += 1
+            counters["peak_in_flight"] = max(
+                counters["peak_in_flight"], counters["in_flight"]
+            )
+
+    def finished(self, host: str) -> None:
+        with self._lock:
+            self._hosts[host]["in_flight"] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {host: dict(counters) for host, counters in self._hosts.items()}
+
+
+pool_monitor = PoolMonitor()
+
+
+class HostLimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async transport enforcing a per-host concurrency limit on a shared pool."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int):
+        self.transport = transport
+        self.per_host = per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            pool_monitor.started(host)
+            try:
+                return await self.transport.handle_async_request(request)
+            finally:
+                pool_monitor.finished(host)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class HostLimitedTransport(httpx.BaseTransport):
+    """Sync transport enforcing a per-host concurrency limit on a shared pool."""
+
+    def __init__(self, transport: httpx.BaseTransport, per_host: int):
+        self.transport = transport
+        self.per_host = per_host
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.per_host)
+            )
+        with semaphore:
+            pool_monitor.started(host)
+            try:
+                return self.transport.handle_request(request)
+            finally:
+                pool_monitor.finished(host)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class RetryingTransport(httpx.BaseTransport):
+    """Sync transport retrying connection failures and 502/503/504 responses.
+
+    Only for services whose requests are safe to repeat, such as Chroma
+    queries and id-keyed upserts.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(
+        self, transport: httpx.BaseTransport, retries: int, backoff_seconds: float
+    ):
+        self.transport = transport
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.retried = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ReadError, httpx.RemoteProtocolError):
+                if attempt == self.retries:
+                    raise
+            else:
+                if (
+                    attempt == self.retries
+                    or response.status_code not in self.RETRY_STATUSES
+                ):
+                    return response
+                response.close()
+            time.sleep(self.backoff_seconds * 2**attempt * (0.5 + random.random()))
+            attempt += 1
+            self.retried += 1
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide async client used by the agents, embeddings and moderation."""
+    transport = httpx.AsyncHTTPTransport(http2=HTTP2_ENABLED, limits=_limits())
+    return httpx.AsyncClient(
+        transport=HostLimitedAsyncTransport(transport, HTTP_MAX_CONNECTIONS_PER_HOST),
+        timeout=HTTP_TIMEOUT_SECONDS,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_sync_http_client() -> httpx.Client:
+    """Process-wide sync client used by the (synchronous) embeddings calls."""
+    transport = httpx.HTTPTransport(http2=HTTP2_ENABLED, limits=_limits())
+    return httpx.Client(
+        transport=HostLimitedTransport(transport, HTTP_MAX_CONNECTIONS_PER_HOST),
+        timeout=HTTP_TIMEOUT_SECONDS,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> openai.AsyncOpenAI:
+    """Shared async OpenAI client on the pooled transport."""
+    return openai.AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"), http_client=get_async_http_client()
+    )
+
+
+def openai_model(model_name: str) -> Model:
+    """Build a pydantic-ai model for model_name that uses the shared OpenAI client.
+
+    Names for other providers are resolved by pydantic-ai as before.
+    """
+    provider, _, name = model_name.rpartition(":")
+    if provider == "openai" or (not provider and name.startswith(("gpt", "o1", "o3"))):
+        return OpenAIModel(
+            name, provider=OpenAIProvider(openai_client=get_openai_client())
+        )
+    return infer_model(model_name)
+
+
+def _pool_connections(client: Any) -> Dict[str, int]:
+    """Count open and idle connections in a client's httpcore pool, if visible."""
+    pool = getattr(getattr(client._transport, "transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return pool configuration, connection counts and per-host request counters."""
+    clients = {}
+    if get_async_http_client.cache_info().currsize:
+        clients["async"] = _pool_connections(get_async_http_client())
+    if get_sync_http_client.cache_info().currsize:
+        clients["sync"] = _pool_connections(get_sync_http_client())
+
+    return {
+        "http2": HTTP2_ENABLED,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_connections_per_host": HTTP_MAX_CONNECTIONS_PER_HOST,
+        "connections": clients,
+        "hosts": pool_monitor.stats(),
+    }
@@ -1,23 +1,62 @@
 """
 Simple data ingestion script to populate vector stores.
+
+    python -m app.services.ingest_data                   # fill or resume stores
+    python -m app.services.ingest_data --reindex hotels  # rebuild and swap in
+    python -m app.services.ingest_data --flights data/x100/flight_catalogue.jsonl
+
+Catalogues are streamed record by record, from the seed files unless a path
+is given, so ingesting a catalogue larger than memory is constant-memory.
 """
 
+import argparse
+
 from dotenv import load_dotenv
 
-from app.datastore import initialise_all_stores
+from app.datastore import (
+    COLLECTIONS,
+    initialise_all_stores,
+    precompute_query_embeddings,
+    reindex_store,
+)
 from app.validators.api.api_key_validator import check_api_key
 
 load_dotenv()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the vector stores")
+    parser.add_argument(
+        "--reindex",
+        nargs="*",
+        choices=sorted(COLLECTIONS),
+        help="build new versions of these collections (default: all) and swap "
+        "them in while the current ones keep serving",
+    )
+    for kind in sorted(COLLECTIONS):
+        parser.add_argument(
+            f"--{kind}",
+            metavar="PATH",
+            help=f"JSON array or JSON Lines file of {kind} to ingest instead "
+            "of the seed catalogue",
+        )
+    args = parser.parse_args()
+    paths = {kind: getattr(args, kind) for kind in COLLECTIONS if getattr(args, kind)}
     print("---Starting data ingestion---")
 
     try:
         has_api_key = check_api_key()
         if not has_api_key:
             raise ValueError("OpenAI API key is not set")
-        initialise_all_stores()
+        if args.reindex is not None:
+            for kind in args.reindex or COLLECTIONS:
+                reindex_store(kind, paths.get(kind))
+        else:
+            initialise_all_stores(paths)
+        count = precompute_query_embeddings(paths)
+        if count:
+            print(f"Precomputed {count} templated query embeddings")
         print("---Data ingestion completed!---")
 
     except Exception as e:
         print(f"Error: {e}")
+        print("Re-run to resume from the last completed batch")
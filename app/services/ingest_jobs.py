@@ -0,0 +1,254 @@
+"""
+Checkpointed, resumable ingestion jobs.
+
+An ingestion job streams one collection's records through an IngestPipeline
+and records its progress in a checkpoint file under DB_PATH:
+
+    {"flights": {"status": "running", "records_done": 3000, ...}, ...}
+
+records_done only advances over a contiguous run of upserted batches, so every
+record before it is in the store. Documents get ids from their position in
+the catalogue ("flights-2999"), which makes re-upserting a batch idempotent: a
+job that failed on batch 30 resumes by skipping records_done records and
+re-running whatever was in flight. A job only resumes with the same embedding
+schema and the same source file (path, size and modification time), since
+positions in another catalogue name other records. When the last batch lands
+the store count is checked against the records ingested before the job is
+marked complete.
+
+A collection whose checkpoint is not complete is never treated as populated,
+so a crashed ingest resumes instead of serving a partial index.
+
+Usage:
+    python -m app.services.ingest_jobs        # show job status
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.services.ingest_pipeline import IngestPipeline
+
+load_dotenv()
+
+INGEST_CHECKPOINT_FILE = "ingest_checkpoint.json"
+
+
+def checkpoint_path(db_path: str) -> str:
+    """Location of the ingestion checkpoint for a database directory."""
+    return os.path.join(db_path, INGEST_CHECKPOINT_FILE)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def source_fingerprint(path: str) -> Dict[str, Any]:
+    """Identify the catalogue file a job reads, to tell if it changed."""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class IngestCheckpoint:
+    """Per-collection ingestion progress, persisted atomically as JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Every collection's recorded state."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, kind: str) -> Optional[Dict[str, Any]]:
+        return self.load().get(kind)
+
+    def update(self, kind: str, **fields: Any) -> Dict[str, Any]:
+        """Merge fields into a collection's state and write the file."""
+        with self._lock:
+            jobs = self.load()
+            state = jobs.setdefault(kind, {})
+            state.update(fields, updated_at=_now())
+            self._write(jobs)
+            return state
+
+    def clear(self, kind: str) -> None:
+        """Forget a collection's progress, e.g. after its store is reset."""
+        with self._lock:
+            jobs = self.load()
+            if jobs.pop(kind, None) is not None:
+                self._write(jobs)
+
+    def _write(self, jobs: Dict[str, Dict[str, Any]]) -> None:
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(jobs, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+
+class IngestJob:
+    """Ingest one collection, resuming from its last checkpointed batch."""
+
+    def __init__(
+        self,
+        kind: str,
+        checkpoint: IngestCheckpoint,
+        pipeline: IngestPipeline,
+        count: Callable[[], int],
+        reset: Callable[[], None],
+        schema: Optional[Dict[str, Any]] = None,
+        label: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ):
+        self.kind = kind
+        self.label = label or kind
+        self.checkpoint = checkpoint
+        self.pipeline = pipeline
+        self.count = count
+        self.reset = reset
+        self.schema = schema
+        self.source = source
+
+    def run(self, batches: Callable[[int], Iterable[List[Document]]]) -> int:
+        """Ingest batches(skip) after the first skip records; returns the count.
+
+        batches must yield the same documents, in the same order, on every run.
+        """
+        state = self.checkpoint.get(self.kind) or {}
+        count = self.count()
+        same_schema = state.get("schema") == self.schema
+        resumable = same_schema and state.get("source") == self.source
+        if (
+            state.get("status") == "complete"
+            and same_schema
+            and count == state["count"]
+        ):
+            print(f"{self.label} store is already populated with {count} documents")
+            return count
+        if not state and count:
+            # Populated before ingestion was checkpointed
+            self.checkpoint.update(
+                self.kind,
+                status="complete",
+                schema=self.schema,
+                source=self.source,
+                records_done=count,
+                count=count,
+            )
+            print(f"{self.label} store is already populated with {count} documents")
+            return count
+
+        if state.get("status") in ("running", "failed") and resumable:
+            skip = state.get("records_done", 0)
+            print(f"Resuming {self.label} ingestion after {skip} records")
+        else:
+            if count:
+                self.reset()
+            skip = 0
+            state = {}
+        self.checkpoint.update(
+            self.kind,
+            status="running",
+            schema=self.schema,
+            source=self.source,
+            records_done=skip,
+            batches_done=state.get("batches_done", 0),
+            started_at=state.get("started_at") or _now(),
+            error=None,
+        )
+
+        progress = _Progress(self, skip, state.get("batches_done", 0))
+        try:
+            self.pipeline.run(progress.number(batches(skip)), progress.upserted)
+        except BaseException as error:
+            self.checkpoint.update(
+                self.kind, status="failed", error=f"{type(error).__name__}: {error}"
+            )
+            raise
+
+        count = self.count()
+        if count != progress.records_done:
+            error = (
+                f"{self.kind} store holds {count} documents, "
+                f"expected {progress.records_done}"
+            )
+            self.checkpoint.update(self.kind, status="failed", error=error)
+            raise ValueError(error)
+        self.checkpoint.update(
+            self.kind, status="complete", count=count, finished_at=_now()
+        )
+        return count
+
+
+class _Progress:
+    """Tracks which batches have landed and advances the checkpoint."""
+
+    def __init__(self, job: IngestJob, skip: int, batches_done: int):
+        self.job = job
+        self.records_done = skip
+        self.batches_done = batches_done
+        self.sizes: Dict[int, int] = {}
+        self.landed: Set[int] = set()
+        self.next = 0
+
+    def number(self, batches: Iterable[List[Document]]) -> Iterator[List[Document]]:
+        """Give documents ids from their catalogue position."""
+        position = self.records_done
+        for index, batch in enumerate(batches):
+            for document in batch:
+                document.id = f"{self.job.kind}-{position}"
+                position += 1
+            self.sizes[index] = len(batch)
+            yield batch
+
+    def upserted(self, index: int, batch: List[Document]) -> None:
+        self.landed.add(index)
+        if self.next not in self.landed:
+            return
+        while self.next in self.landed:
+            self.landed.remove(self.next)
+            self.records_done += self.sizes.pop(self.next)
+            self.batches_done += 1
+            self.next += 1
+        self.job.checkpoint.update(
+            self.job.kind,
+            records_done=self.records_done,
+            batches_done=self.batches_done,
+        )
+
+
+def print_status(jobs: Dict[str, Dict[str, Any]]) -> None:
+    """Print one line per collection's ingestion job."""
+    if not jobs:
+        print("No ingestion jobs recorded")
+        return
+    print(f"{'collection':<13}{'status':<10}{'records':>9}{'batches':>9}  updated")
+    for kind, state in sorted(jobs.items()):
+        print(
+            f"{kind:<13}{state.get('status', '?'):<10}"
+            f"{state.get('records_done', 0):>9}{state.get('batches_done', 0):>9}"
+            f"  {state.get('updated_at', '')}"
+        )
+        if state.get("error"):
+            print(f"{'':<13}{state['error']}")
+
+
+if __name__ == "__main__":
+    print_status(IngestCheckpoint(checkpoint_path(os.getenv("DB_PATH", "."))).load())
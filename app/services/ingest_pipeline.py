@@ -0,0 +1,142 @@
+"""
+Staged ingestion with bounded queues.
+
+    parse -> build documents -> embed -> upsert
+
+Parsing and document building are a generator chain (see
+app.data.iter_records and app.datastore.document_batches) consumed by a
+feeder thread. Batches then pass through bounded queues to a pool of embedding
+workers and on to a single upsert worker. A full queue blocks the stage that
+feeds it, so a slow embedder or vector store holds back parsing instead of
+letting batches pile up: memory stays at roughly queue_size batches per queue
+however large the catalogue is. Embedding workers overlap their API calls
+with each other and with upserts.
+
+The first error in any stage stops the others and is re-raised by run().
+Batches already embedded are still upserted first, so paid-for embeddings
+are not thrown away.
+Embedding workers finish out of order, so on_upserted callbacks receive each
+batch's position in the source to let callers checkpoint progress.
+"""
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class IngestPipeline:
+    """Embed and upsert document batches on worker threads with backpressure."""
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        upsert: Callable[[List[Document], List[List[float]]], Any],
+        embed_workers: int = INGEST_EMBED_WORKERS,
+        queue_size: int = INGEST_QUEUE_SIZE,
+    ):
+        self.embed = embed
+        self.upsert = upsert
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = max(1, queue_size)
+
+    def run(
+        self,
+        batches: Iterable[List[Document]],
+        on_upserted: Optional[Callable[[int, List[Document]], Any]] = None,
+    ) -> int:
+        """Push every batch through the stages and return documents upserted."""
+        to_embed: queue.Queue = queue.Queue(self.queue_size)
+        to_upsert: queue.Queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        upserted = [0]
+
+        def put(target: queue.Queue, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source: queue.Queue, drain: bool = False) -> Optional[Any]:
+            while drain or not stop.is_set():
+                try:
+                    return source.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if stop.is_set():
+                        return None
+            return None
+
+        def stage(work: Callable[[], None]) -> Callable[[], None]:
+            def guarded() -> None:
+                try:
+                    work()
+                except BaseException as error:
+                    errors.append(error)
+                    stop.set()
+
+            return guarded
+
+        def feed() -> None:
+            for position, batch in enumerate(batches):
+                if not put(to_embed, (position, batch)):
+                    return
+            for _ in range(self.embed_workers):
+                put(to_embed, _DONE)
+
+        def embed() -> None:
+            while True:
+                batch = get(to_embed)
+                if batch is None:
+                    return
+                if batch is _DONE:
+                    put(to_upsert, _DONE)
+                    return
+                position, documents = batch
+                vectors = self.embed([document.page_content for document in documents])
+                if not put(to_upsert, (position, documents, vectors)):
+                    return
+
+        def upsert() -> None:
+            finished = 0
+            while finished < self.embed_workers:
+                item = get(to_upsert, drain=True)
+                if item is None:
+                    return
+                if item is _DONE:
+                    finished += 1
+                    continue
+                position, batch, vectors = item
+                self.upsert(batch, vectors)
+                upserted[0] += len(batch)
+                if on_upserted:
+                    on_upserted(position, batch)
+
+        threads = [threading.Thread(target=stage(feed), name="ingest-feed")]
+        threads += [
+            threading.Thread(target=stage(embed), name=f"ingest-embed-{i}")
+            for i in range(self.embed_workers)
+        ]
+        threads.append(threading.Thread(target=stage(upsert), name="ingest-upsert"))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return upserted[0]
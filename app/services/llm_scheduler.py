@@ -0,0 +1,316 @@
+"""
+Process-wide admission control for OpenAI calls.
+
+Every chat, embedding and moderation call takes a permit from a scheduler before
+it is sent. A scheduler enforces a concurrency cap plus requests-per-minute and
+tokens-per-minute token buckets, and admits waiting calls strictly in priority
+order so interactive requests are never stuck behind batch work.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models import ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from app.services.token_usage import token_usage
+
+load_dotenv()
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Priority of the calls made while handling the current request or batch item
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+POLL_INTERVAL_SECONDS = 0.05
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for admission."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken; requests above capacity wait for a full bucket."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Take (positive) or give back (negative) tokens without waiting."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Permit:
+    """Admission granted by a scheduler for one call."""
+
+    def __init__(self, scheduler: "LLMScheduler", estimated_tokens: int):
+        self.scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Correct the token budget once the real usage is known."""
+        if actual_tokens is not None:
+            self.scheduler.adjust_tokens(actual_tokens - self.estimated_tokens)
+            self.estimated_tokens = actual_tokens
+
+
+class LLMScheduler:
+    """Concurrency cap plus RPM/TPM budgets with a priority admission queue."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._stats = {"admitted": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    @classmethod
+    def from_env(
+        cls, name: str, rpm: int, tpm: int, concurrency: int
+    ) -> "LLMScheduler":
+        """Build a scheduler configured by LLM_<NAME>_RPM/_TPM/_CONCURRENCY."""
+        prefix = f"LLM_{name.upper()}"
+        return cls(
+            name,
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM", rpm)),
+            tokens_per_minute=float(os.getenv(f"{prefix}_TPM", tpm)),
+            max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        )
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _try_admit(self, ticket: Tuple[int, int], tokens: int) -> float:
+        """Admit ticket if it is at the head and budgets allow, else return a wait time."""
+        with self._lock:
+            if self._queue[0] != ticket or self._in_flight >= self.max_concurrency:
+                return POLL_INTERVAL_SECONDS
+
+            now = time.monotonic()
+            wait = max(
+                self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now)
+            )
+            if wait > 0:
+                return wait
+
+            heapq.heappop(self._queue)
+            self._requests.adjust(1)
+            self._tokens.adjust(tokens)
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            return 0.0
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _record_wait(self, waited: float) -> None:
+        with self._lock:
+            self._stats["throttled"] += 1
+            self._stats["wait_seconds"] += waited
+
+    def adjust_tokens(self, amount: int) -> None:
+        """Charge (or refund) the token budget after a call completes."""
+        with self._lock:
+            self._tokens.adjust(amount)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int, priority: Optional[int] = None):
+        """Wait asynchronously for a permit to make one call."""
+        ticket = self._enqueue(request_priority.get() if priority is None else priority)
+        started = time.monotonic()
+        throttled = False
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                throttled = True
+                await asyncio.sleep(min(wait, POLL_INTERVAL_SECONDS))
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        if throttled:
+            self._record_wait(time.monotonic() - started)
+
+        try:
+            yield Permit(self, tokens)
+        finally:
+            self._release()
+
+    @contextmanager
+    def acquire_sync(self, tokens: int, priority: Optional[int] = None):
+        """Blocking variant of acquire for synchronous clients (e.g. embeddings)."""
+        ticket = self._enqueue(request_priority.get() if priority is None else priority)
+        started = time.monotonic()
+        throttled = False
+        try:
+            while (wait := self._try_admit(ticket, tokens)) > 0:
+                throttled = True
+                time.sleep(min(wait, POLL_INTERVAL_SECONDS))
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        if throttled:
+            self._record_wait(time.monotonic() - started)
+
+        try:
+            yield Permit(self, tokens)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth per priority, in-flight calls and admission counters."""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.wait_time(0, now)
+            self._tokens.wait_time(0, now)
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                "queue_depth": depth,
+                "in_flight": self._in_flight,
+                "requests_available": int(self._requests.tokens),
+                "tokens_available": int(self._tokens.tokens),
+                **self._stats,
+            }
+
+
+chat_scheduler = LLMScheduler.from_env("chat", rpm=500, tpm=200_000, concurrency=16)
+embedding_scheduler = LLMScheduler.from_env(
+    "embeddings", rpm=3000, tpm=1_000_000, concurrency=8
+)
+moderation_scheduler = LLMScheduler.from_env(
+    "moderation", rpm=1000, tpm=150_000, concurrency=8
+)
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the stats of every scheduler by name."""
+    return {
+        scheduler.name: scheduler.stats()
+        for scheduler in (chat_scheduler, embedding_scheduler, moderation_scheduler)
+    }
+
+
+def estimate_message_tokens(
+    messages: List[ModelMessage], model_settings: Optional[ModelSettings]
+) -> int:
+    """Estimate prompt plus completion tokens for a chat request."""
+    text_length = 0
+    for message in messages:
+        text_length += len(getattr(message, "instructions", None) or "")
+        for part in message.parts:
+            text_length += len(str(getattr(part, "content", "")))
+    max_tokens = (model_settings or {}).get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+    return text_length // 4 + 1 + max_tokens
+
+
+class ScheduledModel(WrapperModel):
+    """pydantic-ai model that takes a chat permit before every request.
+
+    Token usage of every call is recorded under label (usually the agent name).
+    """
+
+    def __init__(self, wrapped: Any, label: str = "chat"):
+        super().__init__(wrapped)
+        self.label = label
+
+    async def request(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ):
+        estimate = estimate_message_tokens(messages, model_settings)
+        async with chat_scheduler.acquire(estimate) as permit:
+            response = await self.wrapped.request(
+                messages, model_settings, model_request_parameters
+            )
+            permit.settle(response.usage.total_tokens)
+            token_usage.record(
+                self.label,
+                response.usage.request_tokens,
+                response.usage.response_tokens,
+            )
+            return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters,
+    ):
+        estimate = estimate_message_tokens(messages, model_settings)
+        async with chat_scheduler.acquire(estimate) as permit:
+            async with self.wrapped.request_stream(
+                messages, model_settings, model_request_parameters
+            ) as response_stream:
+                yield response_stream
+            usage = response_stream.usage()
+            permit.settle(usage.total_tokens)
+            token_usage.record(self.label, usage.request_tokens, usage.response_tokens)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings wrapper that takes an embedding permit before every API call."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        with embedding_scheduler.acquire_sync(tokens):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with embedding_scheduler.acquire_sync(estimate_tokens(text)):
+            return self.embeddings.embed_query(text)
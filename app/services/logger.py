@@ -1,63 +1,223 @@
-""" Logger module for the application """
+"""Logger module for the application"""
 
+import atexit
+import json
 import os
+import queue
+import random
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
 
 
 class Logger(ABC):
     """Logger interface"""
 
     @abstractmethod
-    def info(self, message: str) -> None:
+    def debug(self, message: str, **fields: Any) -> None:
         pass
 
     @abstractmethod
-    def error(self, message: str) -> None:
+    def info(self, message: str, **fields: Any) -> None:
         pass
 
+    @abstractmethod
+    def warning(self, message: str, **fields: Any) -> None:
+        pass
 
-class ConsoleLogger(Logger):
-    """Console logger class"""
+    @abstractmethod
+    def error(self, message: str, **fields: Any) -> None:
+        pass
 
-    def info(self, message: str) -> None:
-        print(f"INFO: {message}")
 
-    def error(self, message: str) -> None:
-        print(f"ERROR: {message}")
+def _serialise(value: Any) -> Any:
+    """JSON fallback for structured fields such as pydantic models."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
 
 
-class LogfireLogger(Logger):
-    """Logfire logger class"""
+class LogSink(ABC):
+    """Destination for log records, called only from the writer thread."""
 
-    def __init__(self):
+    @abstractmethod
+    def write(self, record: Dict[str, Any]) -> None:
+        pass
 
-        try:
-            import logfire
+    def flush(self) -> None:
+        pass
+
+
+class ConsoleSink(LogSink):
+    """Console sink writing one line per record"""
 
-            logfire.configure()
-            logfire.instrument_pydantic_ai()
-            self.logfire = logfire
-            self.available = True
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = f"{record['level']}: {record['message']}"
+        if record["fields"]:
+            line += " " + json.dumps(record["fields"], default=_serialise)
+        self.stream.write(line + "\n")
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class LogfireSink(LogSink):
+    """Logfire sink; configures Logfire and pydantic-ai instrumentation once"""
+
+    def __init__(self):
+        import logfire
+
+        logfire.configure()
+        logfire.instrument_pydantic_ai()
+        self.logfire = logfire
+
+    def write(self, record: Dict[str, Any]) -> None:
+        fields = {
+            key: _serialise(value) if hasattr(value, "model_dump") else value
+            for key, value in record["fields"].items()
+        }
+        self.logfire.log(record["level"].lower(), record["message"], fields)
+
+
+class LogPipeline:
+    """Queue-backed log pipeline drained by a background writer thread.
+
+    Records below the configured level are dropped on the caller's thread, and
+    DEBUG/INFO records are sampled at sample_rate. Formatting and sink I/O only
+    happen on the writer thread. When the queue is full records are dropped
+    rather than blocking a request.
+    """
+
+    def __init__(
+        self,
+        sinks: List[LogSink],
+        level: str = "INFO",
+        sample_rate: float = 1.0,
+        max_queue_size: int = 10_000,
+    ):
+        self.sinks = sinks
+        self.level = LEVELS.get(level.upper(), LEVELS["INFO"])
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(
+            max_queue_size
+        )
+        self._writer = threading.Thread(
+            target=self._drain, name="log-writer", daemon=True
+        )
+        self._writer.start()
+
+    def emit(self, level: str, message: str, fields: Dict[str, Any]) -> None:
+        """Queue a record if it passes the level filter and sampling."""
+        level_number = LEVELS[level]
+        if level_number < self.level:
+            return
+        if level_number < LEVELS["WARNING"] and random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait(
+                {
+                    "time": time.time(),
+                    "level": level,
+                    "message": message,
+                    "fields": fields,
+                }
+            )
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                return
+            for sink in self.sinks:
+                try:
+                    sink.write(record)
+                except Exception:
+                    # A failing sink must never take the writer thread down
+                    pass
+            if self._queue.empty():
+                for sink in self.sinks:
+                    sink.flush()
+            self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, int]:
+        """Return queued and dropped record counts."""
+        return {"queued": self._queue.qsize(), "dropped": self.dropped}
+
+    def close(self) -> None:
+        """Flush and stop the writer thread."""
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+
+class StructuredLogger(Logger):
+    """Logger that hands records with structured fields to a LogPipeline"""
+
+    def __init__(self, pipeline: LogPipeline):
+        self.pipeline = pipeline
+
+    def debug(self, message: str, **fields: Any) -> None:
+        self.pipeline.emit("DEBUG", message, fields)
+
+    def info(self, message: str, **fields: Any) -> None:
+        self.pipeline.emit("INFO", message, fields)
+
+    def warning(self, message: str, **fields: Any) -> None:
+        self.pipeline.emit("WARNING", message, fields)
+
+    def error(self, message: str, **fields: Any) -> None:
+        self.pipeline.emit("ERROR", message, fields)
+
+
+def build_sinks() -> List[LogSink]:
+    """Build sinks from environment config, falling back to the console."""
+    sinks: List[LogSink] = []
+    if os.getenv("LOGFIRE_ENABLED", "false").lower() == "true":
+        try:
+            sinks.append(LogfireSink())
         except Exception as e:
             print(f"Logfire initialization failed: {e}")
-            self.fallback = ConsoleLogger()
 
-    def info(self, message: str) -> None:
-        if self.available:
-            self.logfire.info(message)
-        else:
-            self.fallback.info(message)
+    if not sinks or os.getenv("LOG_TO_CONSOLE", "false").lower() == "true":
+        sinks.append(ConsoleSink())
+    return sinks
 
-    def error(self, message: str) -> None:
-        if self.available:
-            self.logfire.error(message)
-        else:
-            self.fallback.error(message)
 
+_logger: Optional[StructuredLogger] = None
+_logger_lock = threading.Lock()
+
+
+def get_logger() -> StructuredLogger:
+    """Get the process-wide logger, creating its pipeline on first use."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                pipeline = LogPipeline(
+                    build_sinks(),
+                    level=os.getenv("LOG_LEVEL", "INFO"),
+                    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+                    max_queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+                )
+                atexit.register(pipeline.close)
+                _logger = StructuredLogger(pipeline)
+    return _logger
 
-def get_logger() -> Logger:
-    """Get logger based on environment config."""
-    if os.getenv("LOGFIRE_ENABLED", "false").lower() == "true":
-        return LogfireLogger()
 
-    return ConsoleLogger()
+def log_stats() -> Dict[str, int]:
+    """Return the process-wide pipeline's queue counters."""
+    return get_logger().pipeline.stats()
@@ -0,0 +1,413 @@
+"""
+Exact in-process vector search with NumPy.
+
+For small collections (hundreds to a few thousand documents) an exact
+matrix-vector product is faster than a Chroma round trip through SQLite and
+HNSW. NumpyVectorStore keeps unit-normalised embeddings in one contiguous
+float32 matrix, finds the top k with argpartition, evaluates metadata filters
+as boolean masks and answers a batch of queries with a single matrix multiply.
+
+With quantization ("int8" or "binary", see app/services/quantization.py) only
+compact codes stay resident: a coarse search over the codes picks
+k x rescore_factor candidates, which are rescored exactly against the
+memory-mapped float32 rows.
+
+It implements the parts of the Chroma store API the datastore uses, and
+reports cosine distances like a cosine Chroma collection. On disk a store is
+three append-only files, so the matrix can be memory-mapped and shared through
+the page cache by every worker:
+
+    vectors.f32     row-major float32 vectors
+    records.jsonl   one {"id", "document", "metadata"} object per row
+    index.json      {"dimensions": ...}
+
+The two data files are appended one after the other, so a crash in between
+leaves one a few rows ahead. Only rows present in both are loaded, and the
+next append first cuts both files back to those rows.
+"""
+
+import json
+import operator
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import uuid4
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.logger import get_logger
+from app.services.quantization import QUANTIZATIONS, quantize
+
+load_dotenv()
+
+NUMPY_STORE_MMAP = os.getenv("NUMPY_STORE_MMAP", "true").lower() == "true"
+
+# Candidates rescored exactly per result when searching quantized codes; sign
+# bits lose far more ranking information than int8 (benchmarks/quantization.py)
+RESCORE_FACTORS = {
+    "int8": int(os.getenv("INT8_RESCORE_FACTOR", "4")),
+    "binary": int(os.getenv("BINARY_RESCORE_FACTOR", "64")),
+}
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], Any]] = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class NumpyVectorStore:
+    """Brute-force cosine vector store over a contiguous float32 matrix."""
+
+    metric = "cosine"
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Embeddings,
+        persist_directory: str,
+        mmap: bool = NUMPY_STORE_MMAP,
+        quantization: str = "none",
+        rescore_factor: Optional[int] = None,
+    ):
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        # Quantization only saves memory if the float rows are not resident
+        self.mmap = mmap or quantization != "none"
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor or RESCORE_FACTORS.get(quantization, 1)
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.persist_directory, "vectors.f32")
+
+    @property
+    def _records_path(self) -> str:
+        return os.path.join(self.persist_directory, "records.jsonl")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.persist_directory, "index.json")
+
+    def _load(self) -> None:
+        """(Re)load vectors and records from disk."""
+        self.ids: List[str] = []
+        self._id_set: Set[str] = set()
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        self._codes = None
+        self._records_size = 0
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path) as f:
+            dimensions = json.load(f)["dimensions"]
+        records, ends = self._read_records()
+        rows = min(len(records), self._vector_rows(dimensions))
+        if rows < len(records) or rows < self._vector_rows(dimensions):
+            get_logger().warning(
+                "Vector store files out of step, loading the rows in both",
+                collection=self.collection_name,
+                records=len(records),
+                vectors=self._vector_rows(dimensions),
+            )
+        for record in records[:rows]:
+            self.ids.append(record["id"])
+            self._id_set.add(record["id"])
+            self.documents.append(record["document"])
+            self.metadatas.append(record["metadata"])
+        self._records_size = ends[rows - 1] if rows else 0
+
+        self.matrix = self._open_matrix(dimensions)
+        self._codes = quantize(self.matrix, self.quantization)
+
+    def _read_records(self) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Complete records and the file offset just past each of them."""
+        records: List[Dict[str, Any]] = []
+        ends: List[int] = []
+        if not os.path.exists(self._records_path):
+            return records, ends
+        offset = 0
+        with open(self._records_path, "rb") as f:
+            for line in f:
+                # A line without its newline is a write cut short
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                records.append(json.loads(line))
+                ends.append(offset)
+        return records, ends
+
+    def _vector_rows(self, dimensions: int) -> int:
+        """Complete rows in the vectors file."""
+        if not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (dimensions * 4)
+
+    def _trim_files(self, dimensions: int) -> None:
+        """Cut both files back to the loaded rows, dropping a torn append."""
+        for path, size in (
+            (self._vectors_path, len(self.ids) * dimensions * 4),
+            (self._records_path, self._records_size),
+        ):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _open_matrix(self, dimensions: int) -> np.ndarray:
+        """Map (or read) the loaded rows of the vectors file as a matrix."""
+        shape = (len(self.ids), dimensions)
+        if not self.ids:
+            return np.zeros(shape, dtype=np.float32)
+        if self.mmap:
+            return np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=shape
+            )
+        return np.fromfile(
+            self._vectors_path, dtype=np.float32, count=shape[0] * shape[1]
+        ).reshape(shape)
+
+    def add_documents(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Embed documents and append them to the store."""
+        return self.add_embedded_documents(
+            documents,
+            self.embedding_function.embed_documents(
+                [document.page_content for document in documents]
+            ),
+            ids,
+        )
+
+    def add_embedded_documents(
+        self,
+        documents: List[Document],
+        embeddings: Sequence[Sequence[float]],
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Append documents whose embeddings were already computed.
+
+        Ids already in the store are skipped, so re-running a batch is a no-op.
+        """
+        ids = ids or [str(uuid4()) for _ in documents]
+        with self._lock:
+            new = [i for i, doc_id in enumerate(ids) if doc_id not in self._id_set]
+            if not new:
+                return ids
+            documents = [documents[i] for i in new]
+            embeddings = [embeddings[i] for i in new]
+            new_ids = [ids[i] for i in new]
+            vectors = _normalise(np.asarray(embeddings, dtype=np.float32))
+            os.makedirs(self.persist_directory, exist_ok=True)
+            if not os.path.exists(self._index_path):
+                with open(self._index_path, "w") as f:
+                    json.dump({"dimensions": vectors.shape[1]}, f)
+            elif self.matrix.shape[1] != vectors.shape[1]:
+                raise ValueError(
+                    f"{self.collection_name} holds {self.matrix.shape[1]}-dim "
+                    f"vectors, got {vectors.shape[1]}"
+                )
+            self._trim_files(vectors.shape[1])
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            with open(self._records_path, "ab") as f:
+                for doc_id, document in zip(new_ids, documents):
+                    record = {
+                        "id": doc_id,
+                        "document": document.page_content,
+                        "metadata": document.metadata,
+                    }
+                    f.write((json.dumps(record) + "\n").encode())
+                self._records_size = f.tell()
+
+            self.ids += new_ids
+            self._id_set.update(new_ids)
+            self.documents += [document.page_content for document in documents]
+            self.metadatas += [document.metadata for document in documents]
+            self._columns = {}
+            self.matrix = self._open_matrix(vectors.shape[1])
+            self._codes = None
+        return ids
+
+    def get(self, **kwargs: Any) -> Dict[str, List[Any]]:
+        """Return every id, document and metadata, like Chroma's get()."""
+        return {
+            "ids": list(self.ids),
+            "documents": list(self.documents),
+            "metadatas": list(self.metadatas),
+        }
+
+    def delete_collection(self) -> None:
+        """Delete the store's files and clear it."""
+        with self._lock:
+            shutil.rmtree(self.persist_directory, ignore_errors=True)
+            self._load()
+
+    def _column(self, field: str) -> np.ndarray:
+        """Metadata field as an array, built once per field."""
+        column = self._columns.get(field)
+        if column is None:
+            values = [metadata.get(field) for metadata in self.metadatas]
+            if all(isinstance(v, (int, float)) for v in values):
+                column = np.asarray(values, dtype=np.float64)
+            else:
+                column = np.asarray(values, dtype=object)
+            self._columns[field] = column
+        return column
+
+    def filter_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Evaluate a Chroma-style where filter as a boolean row mask."""
+        if not where:
+            return None
+        masks = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                parts = [self.filter_mask(part) for part in condition]
+                combine = np.logical_and if key == "$and" else np.logical_or
+                masks.append(combine.reduce(parts))
+                continue
+            column = self._column(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$in":
+                    masks.append(np.isin(column, list(value)))
+                elif op == "$nin":
+                    masks.append(~np.isin(column, list(value)))
+                elif op in _COMPARISONS:
+                    masks.append(
+                        np.asarray(_COMPARISONS[op](column, value), dtype=bool)
+                    )
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return np.logical_and.reduce(masks)
+
+    def _best(
+        self, scores: np.ndarray, k: int, mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Indices of the k highest scores allowed by mask, best first."""
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _results(
+        self, indices: np.ndarray, similarities: np.ndarray
+    ) -> List[Tuple[Document, float]]:
+        """(document, cosine distance) pairs for row indices."""
+        return [
+            (
+                Document(
+                    id=self.ids[i],
+                    page_content=self.documents[i],
+                    metadata=self.metadatas[i],
+                ),
+                float(1.0 - similarity),
+            )
+            for i, similarity in zip(indices, similarities)
+        ]
+
+    def _quantized_codes(self):
+        """Codes for the current matrix, rebuilt after documents were added."""
+        if self._codes is None and self.quantization != "none":
+            with self._lock:
+                if self._codes is None:
+                    self._codes = quantize(self.matrix, self.quantization)
+        return self._codes
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search a batch of query vectors with one matrix multiply."""
+        if not self.ids:
+            return [[] for _ in embeddings]
+        queries = _normalise(np.asarray(embeddings, dtype=np.float32))
+        mask = self.filter_mask(filter)
+        codes = self._quantized_codes()
+
+        if codes is None:
+            results = []
+            for row in queries @ self.matrix.T:
+                best = self._best(row, k, mask)
+                results.append(self._results(best, row[best]))
+            return results
+
+        results = []
+        for query, coarse in zip(queries, codes.scores(queries)):
+            candidates = np.sort(self._best(coarse, k * self.rescore_factor, mask))
+            exact = np.asarray(self.matrix[candidates]) @ query
+            order = np.argsort(-exact)[:k]
+            results.append(self._results(candidates[order], exact[order]))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, quantization and resident vector memory."""
+        codes = self._quantized_codes()
+        return {
+            "documents": len(self.ids),
+            "dimensions": self.matrix.shape[1] if self.matrix.ndim == 2 else 0,
+            "quantization": self.quantization,
+            "float_vector_bytes": int(self.matrix.nbytes),
+            "resident_vector_bytes": int(
+                codes.nbytes if codes is not None else self.matrix.nbytes
+            ),
+        }
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Search one query vector, returning (document, cosine distance)."""
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search by query text, returning (document, cosine distance)."""
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(
+            embedding, k, filter
+        )
+
+    def similarity_search_batch_with_score(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search several query texts at once."""
+        embeddings = [self.embedding_function.embed_query(q) for q in queries]
+        return self.similarity_search_by_vectors(embeddings, k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Search by query text, returning documents only."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
@@ -0,0 +1,74 @@
+"""
+Progress events for streaming responses.
+
+A streaming request runs its work under stream_progress(), which gives the
+work's context a sink; stages then publish() partial results as soon as they
+exist (each specialist agent's recommendation) and the endpoint forwards them
+to the client before the full advice is ready. listen() adds further
+listeners, such as the session recording which query each specialist ran.
+With no listener publish() does nothing.
+
+A request that joins an identical in-flight query (see coalescer.py) only
+receives the final result, since the events go to the first caller's stream.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+_sink: ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = ContextVar(
+    "progress_sink", default=None
+)
+
+
+def publish(event_type: str, **fields: Any) -> None:
+    """Send an event to the current request's stream, if it has one."""
+    sink = _sink.get()
+    if sink is not None:
+        sink({"type": event_type, **fields})
+
+
+@contextmanager
+def listen(callback: Callable[[Dict[str, Any]], None]) -> Iterator[None]:
+    """Also pass events published in this context (and tasks it starts) to callback."""
+    outer = _sink.get()
+
+    def sink(event: Dict[str, Any]) -> None:
+        callback(event)
+        if outer is not None:
+            outer(event)
+
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+async def stream_progress(
+    work: Callable[[], Awaitable[Any]],
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run work, yielding its events as published, then {"type": "result"}.
+
+    Errors raised by work are raised from the iterator after its events.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    with listen(queue.put_nowait):
+        # The task copies the context, sink included
+        task = asyncio.ensure_future(work())
+
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        while not queue.empty():
+            yield queue.get_nowait()
+        yield {"type": "result", "result": task.result()}
+    finally:
+        # Stop the work if the client goes away mid-stream
+        task.cancel()
@@ -0,0 +1,95 @@
+"""
+Quantized vector codes for two-stage search.
+
+Codes replace the resident float32 matrix for the first, coarse stage of a
+search; the best candidates are then rescored exactly against the float32
+vectors, which stay on disk (memory-mapped) and are only read for those rows.
+
+    int8    one signed byte per dimension with a per-dimension scale (4x smaller)
+    binary  one sign bit per dimension, compared by Hamming distance (32x smaller)
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Rows converted back to float32 at a time when scoring int8 codes
+_CHUNK_ROWS = 4096
+
+
+class Int8Codes:
+    """Symmetric per-dimension scalar quantization to int8."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.scale = np.zeros(vectors.shape[1], dtype=np.float32)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            chunk = np.abs(vectors[start : start + _CHUNK_ROWS]).max(axis=0)
+            np.maximum(self.scale, chunk, out=self.scale)
+        self.scale /= 127.0
+        self.scale[self.scale == 0] = 1.0
+        self.codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            chunk = np.asarray(vectors[start : start + _CHUNK_ROWS]) / self.scale
+            self.codes[start : start + _CHUNK_ROWS] = np.clip(np.rint(chunk), -127, 127)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scale.nbytes
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate dot products of queries with every row (higher is better)."""
+        scaled = (queries * self.scale).astype(np.float32)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), _CHUNK_ROWS):
+            chunk = self.codes[start : start + _CHUNK_ROWS].astype(np.float32)
+            scores[:, start : start + _CHUNK_ROWS] = scaled @ chunk.T
+        return scores
+
+
+class BinaryCodes:
+    """Sign-bit quantization packed eight dimensions per byte.
+
+    Signs are taken around the per-dimension mean so every bit splits the
+    collection roughly in half instead of mostly agreeing across rows.
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        self.mean = np.zeros(vectors.shape[1], dtype=np.float64)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            self.mean += np.asarray(vectors[start : start + _CHUNK_ROWS]).sum(axis=0)
+        self.mean = (self.mean / max(len(vectors), 1)).astype(np.float32)
+        self.codes = np.empty((len(vectors), (vectors.shape[1] + 7) // 8), np.uint8)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            chunk = np.asarray(vectors[start : start + _CHUNK_ROWS]) - self.mean
+            self.codes[start : start + _CHUNK_ROWS] = np.packbits(chunk > 0, axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.mean.nbytes
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Negated Hamming distances of queries to every row (higher is better)."""
+        packed = np.packbits(queries - self.mean > 0, axis=1)
+        return np.stack(
+            [
+                -np.bitwise_count(np.bitwise_xor(self.codes, query)).sum(
+                    axis=1, dtype=np.int32
+                )
+                for query in packed
+            ]
+        ).astype(np.float32)
+
+
+def quantize(
+    vectors: np.ndarray, quantization: str
+) -> Optional[Union[Int8Codes, BinaryCodes]]:
+    """Build codes for vectors, or None when quantization is "none"."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown vector quantization: {quantization}")
+    if quantization == "none" or not len(vectors):
+        return None
+    if quantization == "int8":
+        return Int8Codes(vectors)
+    return BinaryCodes(vectors)
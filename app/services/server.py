@@ -0,0 +1,142 @@
+"""
+Production server: preforked uvicorn workers sharing one listening socket.
+
+    python -m app.services.server --workers 4 --port 8000
+
+The parent loads the read-only seed catalogues (app.data) and freezes them out
+of the garbage collector, binds the socket, then forks the workers, so every
+worker maps the same catalogue pages copy-on-write instead of parsing its own
+copy. Each worker then imports the application itself: vector store clients
+and HTTP connection pools must not be shared across a fork. The parent
+restarts workers that exit unexpectedly and stops them all on SIGINT/SIGTERM.
+
+Set CACHE_BACKEND=sqlite so the embedding and search caches are shared by the
+workers (see app/services/cache.py); otherwise each worker caches alone.
+"""
+
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from typing import Any, Dict, Optional, Union
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+
+
+def preload() -> None:
+    """Load the read-only catalogues once, before forking."""
+    from app.data import CATALOGUE_FILES, load_catalogue
+
+    for name in CATALOGUE_FILES:
+        load_catalogue(name)
+
+    # Keep the preloaded objects out of collections so the GC does not write
+    # to (and so copy) their pages in every worker
+    gc.freeze()
+
+
+class PreforkServer:
+    """Supervises N forked uvicorn workers accepting on one socket."""
+
+    def __init__(
+        self,
+        app: Union[str, Any],
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        workers: int = WEB_WORKERS,
+        **config: Any,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.config = config
+        self.socket: Optional[socket.socket] = None
+        self.children: Dict[int, int] = {}
+        self._stopping = False
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.socket = sock
+        return sock
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        # Worker: default signal handling, its own random stream, then serve
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        random.seed()
+        code = 0
+        try:
+            config = uvicorn.Config(self.app, **self.config)
+            uvicorn.Server(config).run(sockets=[self.socket])
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, *_: Any) -> None:
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        """Fork the workers and keep them running until signalled."""
+        if self.socket is None:
+            self.bind()
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        print(f"Serving on {self.host}:{self.port} with {self.workers} workers")
+
+        while self.children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is not None and not self._stopping:
+                print(f"Worker {pid} exited, restarting")
+                time.sleep(0.5)
+                self._spawn(slot)
+        self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with forked workers")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+
+    preload()
+    PreforkServer("app.main:app", args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Conversation sessions, so follow-up questions re-run only one specialist.
+
+Every answer is recorded in a session: the user's turns, the slots of the
+trip (destination, cities, airports, date), the query the manager sent each
+specialist agent and the advice returned. Sessions live in a bounded cache
+with a time-to-live (build_cache, so CACHE_BACKEND=sqlite shares them between
+server workers) and clients send the id back with their next query. Sessions
+change on every turn, so they skip the per-worker cache tier: a follow-up
+served by another worker always reads the latest turn.
+
+A follow-up that names exactly one kind of recommendation and no new place
+("cheaper hotel instead", "an earlier flight?") is answered by re-running only
+that specialist agent with its previous query, the follow-up and the
+recommendation it replaces, and patching the previous advice: one LLM call
+instead of the manager plus three specialists. Anything else (a new
+destination, several kinds at once, no session) runs the full pipeline.
+Moderation still checks every turn.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+from app.services.cache import build_cache
+from app.services.coalescer import normalise_query
+
+load_dotenv()
+
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Turns kept per session
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))
+
+SPECIALISTS = ("hotel", "flight", "experience")
+
+# Words marking which recommendation a follow-up is about
+SPECIALIST_TERMS = {
+    "hotel": ("hotel", "room", "stay", "accommodation", "resort", "suite"),
+    "flight": (
+        "flight",
+        "fly",
+        "flying",
+        "airline",
+        "cabin",
+        "depart",
+        "departure",
+        "departing",
+        "plane",
+    ),
+    "experience": (
+        "experience",
+        "activity",
+        "activities",
+        "things to do",
+        "tour",
+        "excursion",
+        "attraction",
+    ),
+}
+
+# Price of each recommendation used for the budget category
+PRICE_FIELDS = {"hotel": "price_per_night", "flight": "price", "experience": "price"}
+
+
+@lru_cache(maxsize=1)
+def known_places() -> FrozenSet[str]:
+    """Lower-cased city names in the catalogues."""
+    from app.data import experiences, flights, hotels
+
+    places = {hotel["city"] for hotel in hotels}
+    places.update(experience["city"] for experience in experiences)
+    places.update(flight["city_arrive"] for flight in flights)
+    places.update(flight["city_depart"] for flight in flights)
+    return frozenset(place.lower() for place in places if place)
+
+
+def places_in(text: str) -> FrozenSet[str]:
+    """Catalogue cities named in text."""
+    text = normalise_query(text)
+    return frozenset(
+        place for place in known_places() if re.search(rf"\b{re.escape(place)}\b", text)
+    )
+
+
+def budget_category(advice: Dict[str, Any]) -> Optional[str]:
+    """The manager's budget rule: the average recommended price, bucketed."""
+    prices = [
+        advice[kind][field]
+        for kind, field in PRICE_FIELDS.items()
+        if advice.get(kind) and advice[kind].get(field) is not None
+    ]
+    if not prices:
+        return None
+    average = sum(prices) / len(prices)
+    if average < 500:
+        return "Budget"
+    return "Midrange" if average <= 1000 else "Expensive"
+
+
+class ConversationSession:
+    """One user's conversation: turns, trip slots, specialist queries and advice."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.turns: List[str] = []
+        # The query that planned the current trip
+        self.trip_query = ""
+        self.slots: Dict[str, Any] = {}
+        self.specialist_queries: Dict[str, str] = {}
+        self.advice: Optional[Dict[str, Any]] = None
+
+    def record_trip(
+        self, query: str, advice: Dict[str, Any], specialist_queries: Dict[str, str]
+    ) -> None:
+        """Remember a fully planned trip and the queries its specialists ran."""
+        self.advice = advice
+        self.trip_query = query
+        self.specialist_queries = dict(specialist_queries)
+        self.slots = {"places": []}
+        self._update_slots(query)
+
+    def record_follow_up(
+        self, query: str, kind: str, advice: Dict[str, Any], specialist_query: str
+    ) -> None:
+        """Remember advice patched by a single specialist."""
+        self.advice = advice
+        self.specialist_queries[kind] = specialist_query
+        self._update_slots(query)
+
+    def _update_slots(self, query: str) -> None:
+        self.turns = (self.turns + [query])[-SESSION_MAX_TURNS:]
+        advice = self.advice or {}
+        hotel = advice.get("hotel") or {}
+        flight = advice.get("flight") or {}
+        experience = advice.get("experience") or {}
+        places = set(self.slots.get("places", [])) | places_in(query)
+        for city in (
+            advice.get("destination"),
+            hotel.get("city"),
+            experience.get("city"),
+        ):
+            if city:
+                places.add(city.lower())
+        self.slots.update(
+            destination=advice.get("destination"),
+            hotel_city=hotel.get("city"),
+            experience_city=experience.get("city"),
+            from_airport=flight.get("from_airport"),
+            to_airport=flight.get("to_airport"),
+            date=flight.get("date"),
+            places=sorted(places),
+        )
+
+    def affected_specialist(self, query: str) -> Optional[str]:
+        """The one specialist a follow-up is about, or None for a full run."""
+        if not self.advice:
+            return None
+        text = normalise_query(query)
+        kinds = [
+            kind
+            for kind, terms in SPECIALIST_TERMS.items()
+            if any(re.search(rf"\b{re.escape(term)}(s|es)?\b", text) for term in terms)
+        ]
+        if len(kinds) != 1:
+            return None
+        # Naming somewhere new starts a new trip
+        if places_in(query) - set(self.slots.get("places", [])):
+            return None
+        return kinds[0]
+
+    def specialist_query(self, kind: str, follow_up: str) -> str:
+        """Query for re-running kind's agent on a follow-up."""
+        # No recorded query when the run was warmed or joined another request
+        previous = self.specialist_queries.get(kind) or self.trip_query
+        parts = [previous, f"Follow-up request: {follow_up}"]
+        if self.advice and self.advice.get(kind):
+            parts.append(
+                f"It replaces this recommendation: {json.dumps(self.advice[kind])}"
+            )
+        return "\n".join(part for part in parts if part)
+
+    def patched_advice(self, kind: str, output: Dict[str, Any]) -> Dict[str, Any]:
+        """The previous advice with kind's recommendation replaced."""
+        advice = {**self.advice, kind: output}
+        advice["budget"] = budget_category(advice) or advice["budget"]
+        return advice
+
+
+class SessionStore:
+    """Bounded, expiring store of conversation sessions."""
+
+    def __init__(
+        self,
+        max_size: int = SESSION_STORE_SIZE,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        cache: Any = None,
+    ):
+        self.cache = cache or build_cache(
+            "sessions", max_size, ttl_seconds, local_tier=False
+        )
+
+    def open(self, session_id: Optional[str] = None) -> ConversationSession:
+        """The session with this id, or a new one if it is unknown or expired."""
+        session = self.cache.get(session_id) if session_id else None
+        return session or ConversationSession(uuid4().hex)
+
+    def save(self, session: ConversationSession) -> None:
+        """Store session, restarting its time-to-live."""
+        self.cache.set(session.id, session)
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
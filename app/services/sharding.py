@@ -0,0 +1,320 @@
+"""
+Region-sharded vector stores.
+
+A sharded store keeps one Chroma collection per destination region instead of
+one collection for the whole catalogue. Searches are routed to the shards a
+query names (by region filter, country, city or airport code) and fan out to
+every shard in parallel only when the query is ambiguous, so search latency
+follows shard size rather than catalogue size. Flights are sharded by
+destination, so only the place a flight query flies to picks its shard.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+import chromadb
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.vector_index import (
+    apply_search_params,
+    collection_metric,
+    upsert_embedded,
+)
+
+load_dotenv()
+
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", "8"))
+
+DEFAULT_REGION = "other"
+
+# Destination country (as spelled in the catalogues) to shard region
+COUNTRY_REGIONS: Dict[str, str] = {
+    "usa": "north-america",
+    "united states": "north-america",
+    "florida": "north-america",
+    "canada": "north-america",
+    "barbados": "caribbean",
+    "jamaica": "caribbean",
+    "india": "south-asia",
+    "south africa": "africa",
+    "nigeria": "africa",
+    "saudi arabia": "middle-east",
+    "united kingdom": "europe",
+    "uk": "europe",
+}
+
+# Text a query names as its destination: after "to"/"into", up to any "from"
+_DESTINATION = re.compile(r"\b(?:to|into)\b(.*?)(?=\bfrom\b|$)", re.IGNORECASE)
+
+_fanout_pool = ThreadPoolExecutor(
+    max_workers=SHARD_FANOUT_WORKERS, thread_name_prefix="shard-search"
+)
+
+
+def region_of(country: Optional[str]) -> str:
+    """Map a country name to its shard region."""
+    return COUNTRY_REGIONS.get((country or "").strip().lower(), DEFAULT_REGION)
+
+
+class RegionRouter:
+    """Resolves which regions a query or metadata filter refers to."""
+
+    def __init__(
+        self,
+        place_regions: Dict[str, str],
+        airport_regions: Optional[Dict[str, str]] = None,
+    ):
+        terms = {name.lower(): region for name, region in place_regions.items()}
+        terms.update({region: region for region in set(COUNTRY_REGIONS.values())})
+        self.terms = terms
+        self.airport_regions = airport_regions or {}
+        self._place_pattern = re.compile(
+            r"\b("
+            + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+            + r")\b"
+        )
+
+    def regions_for_filter(self, filter_dict: Optional[Dict[str, Any]]) -> List[str]:
+        """Regions pinned by an equality filter on region or country."""
+        if not filter_dict:
+            return []
+        if isinstance(filter_dict.get("region"), str):
+            return [filter_dict["region"]]
+        for key in ("country", "to_country"):
+            if isinstance(filter_dict.get(key), str):
+                return [region_of(filter_dict[key])]
+        if filter_dict.get("to_airport") in self.airport_regions:
+            return [self.airport_regions[filter_dict["to_airport"]]]
+        return []
+
+    def regions_for_query(self, query: str) -> List[str]:
+        """Regions of the places and airport codes mentioned in a query."""
+        regions = [self.terms[m] for m in self._place_pattern.findall(query.lower())]
+        regions += [
+            self.airport_regions[code]
+            for code in re.findall(r"\b[A-Z]{3}\b", query)
+            if code in self.airport_regions
+        ]
+        return list(dict.fromkeys(regions))
+
+    def regions_for_destination(self, query: str) -> List[str]:
+        """Regions of the places and airport codes a query names as its destination.
+
+        An origin ("flights from London") names no destination, so it routes
+        nowhere and the search fans out.
+        """
+        return self.regions_for_query(" ".join(_DESTINATION.findall(query)))
+
+
+class ShardedStore:
+    """A set of per-region Chroma collections behind the Chroma search API.
+
+    Documents are assigned to a shard from their `region_field` metadata and
+    tagged with a `region` metadata value, so filters on region keep working.
+    Collections sharded by destination (a `to_` region field, as for flights)
+    are only routed on the destination a query names: their shards hold
+    arrivals, so routing on an origin would miss every outbound flight.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Embeddings,
+        persist_directory: str,
+        region_field: str,
+        router: RegionRouter,
+        client: Optional[chromadb.ClientAPI] = None,
+        collection_configuration: Optional[Dict[str, Any]] = None,
+    ):
+        self.collection_name = collection_name
+        self.collection_configuration = collection_configuration
+        self.embedding_function = embedding_function
+        self.region_field = region_field
+        self.by_destination = region_field.startswith("to_")
+        self.router = router
+        self.client = client or chromadb.PersistentClient(path=persist_directory)
+        self._shards: Dict[str, Chroma] = {}
+        self._metric: Optional[str] = None
+        self._lock = threading.Lock()
+        self._counters = {"searches": 0, "routed": 0, "fanned_out": 0}
+
+    def _shard_name(self, region: str) -> str:
+        return f"{self.collection_name}__{region}"
+
+    def shard(self, region: str) -> Chroma:
+        """Return the Chroma collection for region, creating it on first use."""
+        with self._lock:
+            if region not in self._shards:
+                shard = Chroma(
+                    collection_name=self._shard_name(region),
+                    embedding_function=self.embedding_function,
+                    client=self.client,
+                    collection_configuration=self.collection_configuration,
+                )
+                # Shards opened from an existing collection keep their old ef_search
+                hnsw = (self.collection_configuration or {}).get("hnsw")
+                if hnsw:
+                    apply_search_params(shard._collection, hnsw)
+                self._shards[region] = shard
+            return self._shards[region]
+
+    @property
+    def metric(self) -> str:
+        """Distance metric the shard collections were created with."""
+        if self._metric is None:
+            for region in self.regions():
+                self._metric = collection_metric(self.shard(region)._collection)
+                break
+        if self._metric is not None:
+            return self._metric
+        # No shard yet; new ones are created with the configured space
+        hnsw = (self.collection_configuration or {}).get("hnsw") or {}
+        return hnsw.get("space", "l2")
+
+    def regions(self) -> List[str]:
+        """Regions that currently have a shard collection."""
+        prefix = f"{self.collection_name}__"
+        return sorted(
+            collection.name[len(prefix) :]
+            for collection in self.client.list_collections()
+            if collection.name.startswith(prefix)
+        )
+
+    def add_documents(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Add documents, grouping them into their region's shard."""
+        ids = ids or [None] * len(documents)
+        grouped: Dict[str, Tuple[List[Document], List[str]]] = {}
+        for document, doc_id in zip(documents, ids):
+            region = region_of(document.metadata.get(self.region_field))
+            document.metadata["region"] = region
+            shard_documents, shard_ids = grouped.setdefault(region, ([], []))
+            shard_documents.append(document)
+            shard_ids.append(doc_id)
+
+        added: List[str] = []
+        for region, (shard_documents, shard_ids) in grouped.items():
+            added += self.shard(region).add_documents(
+                documents=shard_documents,
+                ids=shard_ids if all(shard_ids) else None,
+            )
+        return added
+
+    def add_embedded_documents(
+        self,
+        documents: List[Document],
+        embeddings: Sequence[Sequence[float]],
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add already-embedded documents, grouping them into their region's shard."""
+        ids = ids or [str(uuid4()) for _ in documents]
+        grouped: Dict[str, Tuple[List[Document], List[Any], List[str]]] = {}
+        for document, vector, doc_id in zip(documents, embeddings, ids):
+            region = region_of(document.metadata.get(self.region_field))
+            document.metadata["region"] = region
+            shard = grouped.setdefault(region, ([], [], []))
+            shard[0].append(document)
+            shard[1].append(vector)
+            shard[2].append(doc_id)
+
+        for region, (shard_documents, vectors, shard_ids) in grouped.items():
+            upsert_embedded(
+                self.shard(region)._collection, shard_documents, vectors, shard_ids
+            )
+        return ids
+
+    def get(self, **kwargs: Any) -> Dict[str, List[Any]]:
+        """Concatenate Chroma get() results across shards."""
+        merged: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": []}
+        for region in self.regions():
+            result = self.shard(region).get(**kwargs)
+            for key in merged:
+                merged[key] += result.get(key) or []
+        return merged
+
+    def route(self, query: str, filter_dict: Optional[Dict[str, Any]]) -> List[str]:
+        """Shards to search: those the filter or query names, else all of them."""
+        available = self.regions()
+        wanted = self.router.regions_for_filter(filter_dict)
+        if not wanted and self.by_destination:
+            wanted = self.router.regions_for_destination(query)
+        elif not wanted:
+            wanted = self.router.regions_for_query(query)
+        routed = [region for region in wanted if region in available]
+
+        with self._lock:
+            self._counters["searches"] += 1
+            self._counters["routed" if routed else "fanned_out"] += 1
+        return routed or available
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search the routed shards in parallel and merge by distance."""
+        regions = self.route(query, filter)
+        if not regions:
+            return []
+
+        embedding = self.embedding_function.embed_query(query)
+
+        def search_shard(region: str) -> List[Tuple[Document, float]]:
+            return self.shard(region).similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=filter
+            )
+
+        if len(regions) == 1:
+            results = search_shard(regions[0])
+        else:
+            results = [
+                pair
+                for shard_results in _fanout_pool.map(search_shard, regions)
+                for pair in shard_results
+            ]
+        return sorted(results, key=lambda pair: pair[1])[:k]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Search the routed shards and return documents only."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def delete_collection(self) -> None:
+        """Delete every shard collection."""
+        for region in self.regions():
+            self.shard(region).delete_collection()
+        with self._lock:
+            self._shards.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-shard document counts and routing counters."""
+        shards = {
+            region: self.shard(region)._collection.count() for region in self.regions()
+        }
+        with self._lock:
+            counters = dict(self._counters)
+        return {"shards": shards, **counters}
+
+
+def build_router(
+    places: Iterable[Tuple[str, str]], airports: Iterable[Tuple[str, str]] = ()
+) -> RegionRouter:
+    """Build a router from (place name, country) and (airport code, country) pairs."""
+    place_regions = {}
+    for name, country in places:
+        if name and region_of(country) != DEFAULT_REGION:
+            place_regions[name] = region_of(country)
+            place_regions[country] = region_of(country)
+    airport_regions = {
+        code: region_of(country)
+        for code, country in airports
+        if code and region_of(country) != DEFAULT_REGION
+    }
+    return RegionRouter(place_regions, airport_regions)
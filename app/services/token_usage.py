@@ -0,0 +1,80 @@
+"""
+Token counting and per-call LLM usage accounting.
+"""
+
+import os
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RECENT_CALLS = 50
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """Return the tiktoken encoding for model, or None if it is unavailable."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken may be missing or unable to download its encoding files
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in text for model, falling back to ~4 characters per token."""
+    model = (model or os.getenv("GPT_MODEL") or "gpt-4o").split(":")[-1]
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+class TokenUsageTracker:
+    """Accumulates prompt/completion tokens per agent and keeps recent calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._recent: deque = deque(maxlen=RECENT_CALLS)
+
+    def record(
+        self, label: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]
+    ) -> None:
+        """Record the usage of one model call."""
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        with self._lock:
+            totals = self._totals.setdefault(
+                label, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            )
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            self._recent.append(
+                {
+                    "agent": label,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                }
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-agent totals and the most recent calls."""
+        with self._lock:
+            return {
+                "totals": {label: dict(t) for label, t in self._totals.items()},
+                "recent_calls": list(self._recent),
+            }
+
+
+token_usage = TokenUsageTracker()
@@ -1,5 +1,156 @@
+import json
+import os
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+API_URL = os.getenv("TRAVEL_API_URL", "http://localhost:8000")
+CONNECT_TIMEOUT_SECONDS = 5
+# Longest wait between two streamed lines, not for the whole answer
+READ_TIMEOUT_SECONDS = 120
+
+UNAVAILABLE = "Sorry, I couldn't get travel advice right now."
+
+CARD_TITLES = {
+    "hotel": "🏨 Hotel Recommendation",
+    "flight": "🛫 Flight Recommendation",
+    "experience": "🎉 Experience Recommendation",
+}
+
+
+class AdviceUnavailable(Exception):
+    """The API answered without usable advice."""
+
+
+def http_session() -> requests.Session:
+    """This browser session's keep-alive connection pool to the API."""
+    if "http" not in st.session_state:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        st.session_state.http = session
+    return st.session_state.http
+
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def format_card(kind: str, data: dict) -> str:
+    """Text of one recommendation card."""
+    if kind == "hotel":
+        lines = [
+            f"• {data['name']} in {data['city']}",
+            f"• Rating: {data['rating']} ⭐",
+            f"• Price: ${data['price_per_night']}/night",
+        ]
+    elif kind == "flight":
+        lines = [
+            f"• {data['airline']} - {data['from_airport']} → {data['to_airport']}",
+            f"• Duration: {data['duration']}",
+            f"• Price: ${data['price']}",
+            f"• Date: {data['date']}",
+        ]
+    else:
+        lines = [
+            f"• {data['name']} in {data['city']}",
+            f"• Duration: {data['duration']}",
+            f"• Price: ${data['price']}",
+        ]
+    return "\n".join([CARD_TITLES[kind], *lines])
+
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def format_summary(advice: dict) -> str:
+    """Text of the destination, reason and budget."""
+    return f"""Based on your request, here is my recommendation.
+
+🌍 Recommended Destination:
+{advice['destination']}
+
+💡 Why am I recommending this destination:
+{advice['reason']}
+
+💰 Budget Estimate:
+{advice['budget']}"""
+
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def format_tips(tips: tuple) -> str:
+    return "💡 Travel Tips:\n" + "\n".join(f"• {tip}" for tip in tips)
+
+
+def render_card(kind: str, data: dict) -> None:
+    with st.container(border=True):
+        st.text(format_card(kind, data))
+
+
+def render_advice(advice: dict) -> None:
+    st.text(format_summary(advice))
+    for kind in CARD_TITLES:
+        if advice.get(kind):
+            render_card(kind, advice[kind])
+    if advice.get("tips"):
+        st.text(format_tips(tuple(advice["tips"])))
+
+
+def render_message(message: dict) -> None:
+    if "advice" in message:
+        render_advice(message["advice"])
+    elif message.get("error"):
+        st.error(message["content"])
+    else:
+        st.text(message["content"])
+
+
+def stream_advice(prompt: str) -> dict:
+    """Stream advice for prompt, showing each recommendation as it arrives.
+
+    Returns the message to keep in the chat history.
+    """
+    status = st.status("Planning your perfect trip...")
+    # Cards shown while the answer is being put together; replaced by the answer
+    progress = st.empty()
+    shown = []
+    try:
+        with http_session().post(
+            f"{API_URL}/travel-assistant/stream",
+            # Follow-ups in the same conversation only re-run the agent they change
+            json={"query": prompt, "session_id": st.session_state.get("session_id")},
+            stream=True,
+            timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
+        ) as response:
+            if response.status_code != 200:
+                raise AdviceUnavailable(UNAVAILABLE)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "session":
+                    st.session_state.session_id = event["id"]
+                elif event["type"] == "status":
+                    status.update(label=event["message"])
+                elif event["type"] in CARD_TITLES:
+                    shown.append((event["type"], event["data"]))
+                    with progress.container():
+                        for kind, data in shown:
+                            render_card(kind, data)
+                elif event["type"] == "advice":
+                    status.update(label="Here's your trip", state="complete")
+                    progress.empty()
+                    render_advice(event["data"])
+                    return {"role": "assistant", "advice": event["data"]}
+                elif event["type"] == "error":
+                    raise AdviceUnavailable(UNAVAILABLE)
+            raise AdviceUnavailable(UNAVAILABLE)
+    except AdviceUnavailable as e:
+        error_msg = str(e)
+    except Exception as e:
+        error_msg = f"Error connecting to travel assistant: {str(e)}"
+    status.update(label="Something went wrong", state="error")
+    progress.empty()
+    st.error(error_msg)
+    return {"role": "assistant", "content": error_msg, "error": True}
+
 
 st.set_page_config(page_title="AI Travel Assistant", page_icon="🌍", layout="centered")
 st.title("AI Travel Assistant")
@@ -16,7 +167,7 @@ if "messages" not in st.session_state:
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
-        st.text(message["content"])
+        render_message(message)
 
 if prompt := st.chat_input("Ask about travel destinations..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -25,70 +176,4 @@ if prompt := st.chat_input("Ask about travel destinations..."):
         st.text(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Planning your perfect trip..."):
-            try:
-                response = requests.post(
-                    "http://localhost:8000/travel-assistant",
-                    json={"query": prompt},
-                    timeout=120,
-                )
-
-                if response.status_code == 200:
-                    advice = response.json()
-                    formatted_response = f"""
-Based on your request, here is my recommendation. \n                    
-🌍 Recommended Destination:
-{advice['destination']}\n
-💡 Why am I recommending this destination:
-{advice['reason']}\n
-💰 Budget Estimate:
-{advice['budget']}"""
-                    if advice.get("hotel"):
-                        hotel = advice["hotel"]
-                        formatted_response += f"""
-\n🏨 Hotel Recommendation:
-• {hotel['name']} in {hotel['city']}
-• Rating: {hotel['rating']} ⭐
-• Price: ${hotel['price_per_night']}/night"""
-
-                    if advice.get("flight"):
-                        flight = advice["flight"]
-                        formatted_response += f"""
-\n🛫 Flight Recommendation:
-• {flight['airline']} - {flight['from_airport']} → {flight['to_airport']}
-• Duration: {flight['duration']}
-• Price: ${flight['price']}
-• Date: {flight['date']}"""
-
-                    if advice.get("experience"):
-                        experience = advice["experience"]
-                        formatted_response += f"""
-\n🎉 Experience Recommendation:
-• {experience['name']} in {experience['city']}
-• Duration: {experience['duration']}
-• Price: ${experience['price']}"""
-
-                    if advice.get("tips"):
-                        formatted_response += f"""
-\n💡 Travel Tips:
-{chr(10).join(f'• {tip}' for tip in advice['tips'])}"""
-
-                    st.text(formatted_response)
-
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": formatted_response}
-                    )
-
-                else:
-                    error_msg = "Sorry, I couldn't get travel advice right now."
-                    st.error(error_msg)
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": error_msg}
-                    )
-
-            except Exception as e:
-                error_msg = f"Error connecting to travel assistant: {str(e)}"
-                st.error(error_msg)
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": error_msg}
-                )
+        st.session_state.messages.append(stream_advice(prompt))
@@ -1,4 +1,8 @@
+import asyncio
+from typing import Collection
+
 from app.schemas import TravelAdvice
+from app.services.deadline import run_stage
 
 from app.datastore import (
     search_hotels_with_score,
@@ -10,7 +14,10 @@ from app.datastore import (
 async def search_hotel_in_data(hotel_name: str, city: str) -> bool:
     """Search for a hotel in our seed data by name and city."""
     search_query = f"{hotel_name} {city}"
-    results = search_hotels_with_score(search_query, k=5)
+    results = await run_stage(
+        "response_validation",
+        asyncio.to_thread(search_hotels_with_score, search_query, k=5),
+    )
 
     if not results:
         return False
@@ -33,7 +40,10 @@ async def search_flight_in_data(
 ) -> bool:
     """Search for a flight route in our seed data."""
     search_query = f"{airline} {from_airport} {to_airport} {date}"
-    results = search_flights_with_score(search_query, k=5)
+    results = await run_stage(
+        "response_validation",
+        asyncio.to_thread(search_flights_with_score, search_query, k=5),
+    )
 
     if not results:
         return False
@@ -61,7 +71,10 @@ async def search_flight_in_data(
 async def search_experience_in_data(experience_name: str, city: str) -> bool:
     """Search for an experience in our seed data by name and city."""
     search_query = f"{experience_name} {city}"
-    results = search_experiences_with_score(search_query, k=5)
+    results = await run_stage(
+        "response_validation",
+        asyncio.to_thread(search_experiences_with_score, search_query, k=5),
+    )
 
     if not results:
         return False
@@ -79,26 +92,42 @@ async def search_experience_in_data(experience_name: str, city: str) -> bool:
     return len(matches) > 0
 
 
-async def get_all_recommendations(recommendations: TravelAdvice) -> bool:
-    """Get all recommendations from the manager agent."""
+async def get_all_recommendations(
+    recommendations: TravelAdvice, optional: Collection[str] = ()
+) -> bool:
+    """Get all recommendations from the manager agent.
+
+    Enrichments named in optional (e.g. "hotel") may be missing, which is how
+    partial advice is accepted when a sub-agent ran out of time.
+    """
+    checks = []
+    if recommendations.hotel:
+        checks.append(
+            search_hotel_in_data(recommendations.hotel.name, recommendations.hotel.city)
+        )
+    elif "hotel" not in optional:
+        return False
+
+    if recommendations.flight:
+        checks.append(
+            search_flight_in_data(
+                recommendations.flight.airline,
+                recommendations.flight.from_airport,
+                recommendations.flight.to_airport,
+                recommendations.flight.date,
+            )
+        )
+    elif "flight" not in optional:
+        return False
 
-    if (
-        not recommendations.hotel
-        or not recommendations.flight
-        or not recommendations.experience
-    ):
+    if recommendations.experience:
+        checks.append(
+            search_experience_in_data(
+                recommendations.experience.name, recommendations.experience.city
+            )
+        )
+    elif "experience" not in optional:
         return False
-    has_hotel = await search_hotel_in_data(
-        recommendations.hotel.name, recommendations.hotel.city
-    )
-    has_flight = await search_flight_in_data(
-        recommendations.flight.airline,
-        recommendations.flight.from_airport,
-        recommendations.flight.to_airport,
-        recommendations.flight.date,
-    )
-    has_experience = await search_experience_in_data(
-        recommendations.experience.name, recommendations.experience.city
-    )
 
-    return has_hotel and has_flight and has_experience
+    results = await asyncio.gather(*checks)
+    return all(results)
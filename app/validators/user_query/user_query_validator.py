@@ -1,9 +1,11 @@
-import os
 import re
 
-import openai
 from dotenv import load_dotenv
 
+from app.services.deadline import run_stage
+from app.services.http_client import get_openai_client
+from app.services.llm_scheduler import estimate_tokens, moderation_scheduler
+
 
 load_dotenv()
 
@@ -49,9 +51,12 @@ async def validate_user_query(query: str) -> dict:
         }
 
     try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = get_openai_client()
 
-        response = client.moderations.create(input=query)
+        async with moderation_scheduler.acquire(estimate_tokens(query)):
+            response = await run_stage(
+                "moderation", client.moderations.create(input=query)
+            )
         result = response.results[0]
 
         if result.flagged:
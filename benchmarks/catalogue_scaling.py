@@ -0,0 +1,151 @@
+"""
+Benchmark: how document building, ingestion, index size, search latency and
+memory grow with catalogue size.
+
+Usage:
+    python -m benchmarks.catalogue_scaling --scales 1,10,100
+
+Each scale generates a synthetic catalogue of scale x the seed sizes (see
+app/services/catalogue_generator.py), builds documents with the create_*
+functions and ingests them into a throwaway Chroma directory. Embeddings come
+from benchmarks.embeddings.HashEmbeddings, so no API calls are made and the
+timings exclude embedding latency.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import chromadb
+from langchain_chroma import Chroma
+
+from app.datastore import (
+    create_experience_document,
+    create_flight_document,
+    create_hotel_document,
+)
+from app.services.catalogue_generator import CatalogueGenerator
+from benchmarks.embeddings import HashEmbeddings
+from benchmarks.measure import directory_size_mb, latency_ms, peak_rss_mb
+
+BATCH_SIZE = 1000
+
+CATALOGUES: Dict[str, Dict[str, Any]] = {
+    "hotels": {
+        "build": create_hotel_document,
+        "queries": ["luxury hotel with a spa", "cheap hotel near the beach"],
+        "filter": {"city": "Orlando"},
+    },
+    "flights": {
+        "build": create_flight_document,
+        "queries": ["flight from London to New York", "overnight flight to Miami"],
+        "filter": {"to_airport": "JFK"},
+    },
+    "experiences": {
+        "build": create_experience_document,
+        "queries": ["kayaking at sunset", "art gallery tour"],
+        "filter": {"city": "Orlando"},
+    },
+}
+
+
+def measure(
+    kind: str, records: List[Dict[str, Any]], directory: str, dimensions: int, k: int
+) -> Dict[str, Any]:
+    """Build, ingest and search one catalogue, returning its measurements."""
+    config = CATALOGUES[kind]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    documents = [config["build"](record) for record in records]
+    build_seconds = time.perf_counter() - started
+    _, documents_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    store = Chroma(
+        collection_name=f"bench_{kind}",
+        embedding_function=HashEmbeddings(dimensions),
+        client=chromadb.PersistentClient(path=os.path.join(directory, kind)),
+    )
+    started = time.perf_counter()
+    for i in range(0, len(documents), BATCH_SIZE):
+        store.add_documents(
+            documents[i : i + BATCH_SIZE],
+            ids=[str(n) for n in range(i, i + len(documents[i : i + BATCH_SIZE]))],
+        )
+    ingest_seconds = time.perf_counter() - started
+
+    repeats = 20
+    unfiltered = latency_ms(
+        lambda: [store.similarity_search_with_score(q, k=k) for q in config["queries"]],
+        repeats,
+    )
+    filtered = latency_ms(
+        lambda: [
+            store.similarity_search_with_score(q, k=k, filter=config["filter"])
+            for q in config["queries"]
+        ],
+        repeats,
+    )
+    queries = len(config["queries"])
+
+    return {
+        "documents": len(documents),
+        "build_docs_per_s": len(documents) / build_seconds,
+        "ingest_docs_per_s": len(documents) / ingest_seconds,
+        "index_mb": directory_size_mb(os.path.join(directory, kind)),
+        "documents_mb": documents_peak / 1e6,
+        "search_p50_ms": unfiltered["p50"] / queries,
+        "search_p95_ms": unfiltered["p95"] / queries,
+        "filtered_p50_ms": filtered["p50"] / queries,
+        "filtered_p95_ms": filtered["p95"] / queries,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalogue scaling benchmark")
+    parser.add_argument("--scales", default="1,10", help="Comma-separated multiples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    generator = CatalogueGenerator(args.seed)
+    results = []
+    print(
+        f"{'scale':>6} {'catalogue':<12}{'docs':>9}{'build/s':>10}{'ingest/s':>10}"
+        f"{'index MB':>10}{'p50 ms':>8}{'p95 ms':>8}{'filt p50':>9}{'RSS MB':>8}"
+    )
+    for scale in (float(s) for s in args.scales.split(",")):
+        catalogue = {
+            kind: list(records) for kind, records in generator.catalogue(scale).items()
+        }
+        directory = tempfile.mkdtemp(prefix="catalogue-scaling-")
+        try:
+            for kind, records in catalogue.items():
+                row = measure(kind, records, directory, args.dimensions, args.k)
+                results.append({"scale": scale, "catalogue": kind, **row})
+                print(
+                    f"{scale:>6g} {kind:<12}{row['documents']:>9}"
+                    f"{row['build_docs_per_s']:>10.0f}{row['ingest_docs_per_s']:>10.0f}"
+                    f"{row['index_mb']:>10.1f}{row['search_p50_ms']:>8.2f}"
+                    f"{row['search_p95_ms']:>8.2f}{row['filtered_p50_ms']:>9.2f}"
+                    f"{row['peak_rss_mb']:>8.0f}"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: embedded Chroma vs a local Chroma server.
+
+Usage:
+    python -m benchmarks.chroma_modes --size 5000 --threads 16
+
+Both modes hold the same clustered unit vectors. The benchmark reports
+single-query latency, then the throughput of --threads threads searching at
+once: in embedded mode, in server mode with one request per query, and in
+server mode through BatchingCollection, which sends queries that arrive while
+one is in flight as a single request. The server is started with `chroma run`
+on a temporary directory. No API calls are made.
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+
+import chromadb
+import numpy as np
+
+from app.services.chroma_client import BatchingCollection, http_client, local_server
+from benchmarks.hnsw_tuning import clustered_vectors
+from benchmarks.measure import latency_ms
+
+BATCH_SIZE = 5000
+
+
+def fill(collection: Any, vectors: np.ndarray) -> None:
+    for start in range(0, len(vectors), BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, len(vectors))
+        collection.upsert(
+            ids=[str(i) for i in range(start, stop)],
+            embeddings=vectors[start:stop].tolist(),
+            documents=[f"doc {i}" for i in range(start, stop)],
+        )
+
+
+def throughput(search: Callable[[np.ndarray], Any], queries: np.ndarray, threads: int):
+    """Queries per second with threads threads sharing the query list."""
+    chunks = np.array_split(queries, threads)
+
+    def run(chunk):
+        for query in chunk:
+            search(query)
+
+    workers = [threading.Thread(target=run, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(queries) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedded vs server Chroma")
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=800)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.size, args.dimensions, 50, rng)
+    queries = clustered_vectors(args.queries, args.dimensions, 50, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        embedded = chromadb.PersistentClient(path=f"{directory}/embedded")
+        with local_server(f"{directory}/server") as port:
+            server = http_client(port=port)
+            collections = {
+                "embedded": embedded.create_collection("bench"),
+                "server": server.create_collection("bench"),
+            }
+            for collection in collections.values():
+                fill(collection, vectors)
+            collections["server+batching"] = BatchingCollection(collections["server"])
+
+            print(f"{'mode':<17}{'p50 ms':>8}{'p95 ms':>8}{'qps':>9}")
+            for mode, collection in collections.items():
+
+                def search(query, collection=collection):
+                    return collection.query(
+                        query_embeddings=[query.tolist()], n_results=args.k
+                    )
+
+                single = latency_ms(lambda: search(queries[0]), 200)
+                qps = throughput(search, queries, args.threads)
+                print(
+                    f"{mode:<17}{single['p50']:>8.2f}{single['p95']:>8.2f}{qps:>9.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: document building throughput and memory for ingestion.
+
+Usage:
+    python -m benchmarks.document_building --scales 1,10,100
+
+For each catalogue at each scale (synthetic records, see
+app/services/catalogue_generator.py) this measures documents built per second
+and the peak memory held by the documents, for the whole catalogue built as
+one list and for app.datastore.document_batches streaming batches to a
+consumer that drops them (as the embedder does). It also times the flight
+duration parse on its own against the previous uncached two-regex version.
+No API calls are made.
+"""
+
+import argparse
+import re
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.datastore import (
+    INGEST_BATCH_SIZE,
+    convert_duration_to_string,
+    create_experience_document,
+    create_flight_document,
+    create_hotel_document,
+    document_batches,
+)
+from app.services.catalogue_generator import CatalogueGenerator
+
+BUILDERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "hotels": create_hotel_document,
+    "experiences": create_experience_document,
+    "flights": create_flight_document,
+}
+
+
+def legacy_convert_duration(duration_pt: str) -> str:
+    """The per-call two re.search parse document building used before."""
+    hours_match = re.search(r"(\d+)H", duration_pt)
+    minutes_match = re.search(r"(\d+)M", duration_pt)
+    hours = int(hours_match.group(1)) if hours_match else 0
+    minutes = int(minutes_match.group(1)) if minutes_match else 0
+    if hours and minutes:
+        return f"{hours}h {minutes}m"
+    return f"{hours}h" if hours else f"{minutes}m"
+
+
+def measure(build: Callable[[], None], count: int) -> Dict[str, float]:
+    """Documents per second of one build, and peak traced memory of another."""
+    started = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - started
+    # Tracing slows allocation down, so memory is measured in a separate run
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"docs_per_s": count / seconds, "peak_mb": peak / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document building benchmark")
+    parser.add_argument("--scales", default="1,10", help="Comma-separated multiples")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = CatalogueGenerator(args.seed)
+    print(
+        f"{'scale':>6} {'catalogue':<12}{'docs':>9}"
+        f"{'list/s':>10}{'list MB':>9}{'stream/s':>10}{'stream MB':>11}"
+    )
+    for scale in (float(s) for s in args.scales.split(",")):
+        catalogue = {
+            kind: list(records) for kind, records in generator.catalogue(scale).items()
+        }
+        for kind, records in catalogue.items():
+            create = BUILDERS[kind]
+            documents: List[Any] = []
+
+            def build_list():
+                documents[:] = [create(record) for record in records]
+
+            def build_stream():
+                for _ in document_batches(records, create, INGEST_BATCH_SIZE):
+                    pass
+
+            as_list = measure(build_list, len(records))
+            documents.clear()
+            streamed = measure(build_stream, len(records))
+            print(
+                f"{scale:>6g} {kind:<12}{len(records):>9}"
+                f"{as_list['docs_per_s']:>10.0f}{as_list['peak_mb']:>9.1f}"
+                f"{streamed['docs_per_s']:>10.0f}{streamed['peak_mb']:>11.1f}"
+            )
+
+        durations = [flight["flight_duration"] for flight in catalogue["flights"]]
+        for name, parse in (
+            ("two re.search", legacy_convert_duration),
+            ("compiled+cached", convert_duration_to_string),
+        ):
+            started = time.perf_counter()
+            for duration in durations:
+                parse(duration)
+            rate = len(durations) / (time.perf_counter() - started)
+            print(f"{scale:>6g} duration parse, {name}: {rate:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
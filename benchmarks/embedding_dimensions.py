@@ -0,0 +1,222 @@
+"""
+Benchmark: retrieval quality, search latency and index size by embedding
+dimension.
+
+Usage:
+    python -m benchmarks.embedding_dimensions --dimensions 256,512,1024,3072
+
+The seed catalogues are embedded once at the model's full width (cached under
+--cache-dir, so re-runs make no API calls). text-embedding-3 vectors at a
+reduced `dimensions` are the full vector truncated and re-normalised, so every
+width is derived from that one embedding pass. Each width is ingested into a
+throwaway cosine Chroma collection per catalogue and scored on the labelled
+queries in benchmarks/labelled_queries.json: precision@k and MRR@k against
+records matching each query's "relevant" fields ("amenities" and "tags" match
+one item of the comma-separated list).
+
+--offline uses benchmarks.embeddings.HashEmbeddings instead of the API; the
+vectors carry no meaning, so only latency and size are worth reading then.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from typing import Any, Callable, Dict, List
+
+import chromadb
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.data import experiences, flights, hotels
+from app.datastore import (
+    create_experience_document,
+    create_flight_document,
+    create_hotel_document,
+)
+from app.services.vector_index import collection_configuration
+from benchmarks.embeddings import HashEmbeddings
+from benchmarks.measure import directory_size_mb, latency_ms
+
+load_dotenv()
+
+LABELLED_QUERIES = os.path.join(os.path.dirname(__file__), "labelled_queries.json")
+LIST_FIELDS = ("amenities", "tags")
+BATCH_SIZE = 1000
+
+CATALOGUES: Dict[str, Dict[str, Any]] = {
+    "hotels": {"records": hotels, "build": create_hotel_document},
+    "experiences": {"records": experiences, "build": create_experience_document},
+    "flights": {"records": flights, "build": create_flight_document},
+}
+
+
+def is_relevant(record: Dict[str, Any], relevant: Dict[str, str]) -> bool:
+    """True if a raw catalogue record matches every labelled field."""
+    for field, value in relevant.items():
+        if field in LIST_FIELDS:
+            items = [item.strip() for item in (record.get(field) or "").split(",")]
+            if value not in items:
+                return False
+        elif record.get(field) != value:
+            return False
+    return True
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Shorten vectors to dimensions and re-normalise them to unit length."""
+    short = vectors[:, :dimensions]
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def embed_cached(
+    embedder: Embeddings, texts: List[str], path: str, query: bool = False
+) -> np.ndarray:
+    """Embed texts, reusing vectors saved at path by an earlier run."""
+    if os.path.exists(path):
+        vectors = np.load(path)
+        if len(vectors) == len(texts):
+            return vectors
+    if query:
+        vectors = np.asarray([embedder.embed_query(t) for t in texts], np.float32)
+    else:
+        vectors = np.asarray(embedder.embed_documents(texts), np.float32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, vectors)
+    return vectors
+
+
+def evaluate(
+    search: Callable[[np.ndarray], List[int]],
+    queries: np.ndarray,
+    labels: List[List[bool]],
+    k: int,
+) -> Dict[str, float]:
+    """Mean precision@k and MRR@k of a search over labelled query vectors."""
+    precision, reciprocal_rank = [], []
+    for vector, relevant in zip(queries, labels):
+        hits = [relevant[i] for i in search(vector)]
+        precision.append(sum(hits) / k)
+        reciprocal_rank.append(next((1 / (r + 1) for r, h in enumerate(hits) if h), 0))
+    return {
+        "precision": float(np.mean(precision)),
+        "mrr": float(np.mean(reciprocal_rank)),
+    }
+
+
+def measure_dimension(
+    dimensions: int,
+    vectors: Dict[str, np.ndarray],
+    queries: Dict[str, np.ndarray],
+    labels: Dict[str, List[List[bool]]],
+    k: int,
+    repeats: int,
+) -> Dict[str, float]:
+    """Ingest every catalogue at one width and score the labelled queries."""
+    directory = tempfile.mkdtemp(prefix=f"embedding-{dimensions}-")
+    try:
+        client = chromadb.PersistentClient(path=directory)
+        totals = {"precision": 0.0, "mrr": 0.0, "ms": 0.0}
+        count = sum(len(q) for q in queries.values())
+        for kind, full in vectors.items():
+            collection = client.create_collection(
+                f"bench_{kind}", configuration=collection_configuration(kind)
+            )
+            short = truncate(full, dimensions)
+            for start in range(0, len(short), BATCH_SIZE):
+                batch = short[start : start + BATCH_SIZE]
+                collection.add(
+                    ids=[str(i) for i in range(start, start + len(batch))],
+                    embeddings=batch,
+                )
+
+            def search(vector: np.ndarray) -> List[int]:
+                result = collection.query(query_embeddings=[vector], n_results=k)
+                return [int(i) for i in result["ids"][0]]
+
+            short_queries = truncate(queries[kind], dimensions)
+            scores = evaluate(search, short_queries, labels[kind], k)
+            for name in ("precision", "mrr"):
+                totals[name] += scores[name] * len(short_queries)
+            for vector in short_queries:
+                totals["ms"] += latency_ms(lambda: search(vector), repeats)["p50"]
+
+        return {
+            "precision": totals["precision"] / count,
+            "mrr": totals["mrr"] / count,
+            "ms": totals["ms"] / count,
+            "disk_mb": directory_size_mb(directory),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding dimension benchmark")
+    parser.add_argument(
+        "--dimensions",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[256, 512, 1024, 1536, 3072],
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--cache-dir", default=".benchmark_cache/embeddings")
+    parser.add_argument("--offline", action="store_true")
+    args = parser.parse_args()
+
+    model = os.getenv("EMBEDDING_MODEL")
+    if args.offline:
+        embedder, model = HashEmbeddings(max(args.dimensions)), "offline"
+    else:
+        embedder = OpenAIEmbeddings(model=model)
+
+    with open(LABELLED_QUERIES) as f:
+        labelled = json.load(f)
+
+    vectors, queries, labels = {}, {}, {}
+    for kind, catalogue in CATALOGUES.items():
+        records = catalogue["records"]
+        texts = [catalogue["build"](record).page_content for record in records]
+        vectors[kind] = embed_cached(
+            embedder, texts, os.path.join(args.cache_dir, model, f"{kind}.npy")
+        )
+        entries = [entry for entry in labelled if entry["catalogue"] == kind]
+        texts = [entry["query"] for entry in entries]
+        # Keyed by content so editing the labelled set re-embeds its queries
+        digest = zlib.crc32("\n".join(texts).encode())
+        queries[kind] = embed_cached(
+            embedder,
+            texts,
+            os.path.join(args.cache_dir, model, f"{kind}_queries_{digest:08x}.npy"),
+            query=True,
+        )
+        labels[kind] = [
+            [is_relevant(record, entry["relevant"]) for record in records]
+            for entry in entries
+        ]
+
+    width = vectors["hotels"].shape[1]
+    print(f"{model}, native width {width}, {len(labelled)} labelled queries")
+    print(
+        f"{'dims':>6}{f'P@{args.k}':>8}{f'MRR@{args.k}':>9}"
+        f"{'ms/query':>10}{'disk MB':>10}"
+    )
+    for dimensions in args.dimensions:
+        if dimensions > width:
+            print(f"{dimensions:>6}  skipped: wider than the model's {width}")
+            continue
+        row = measure_dimension(
+            dimensions, vectors, queries, labels, args.k, args.repeats
+        )
+        print(
+            f"{dimensions:>6}{row['precision']:>8.3f}{row['mrr']:>9.3f}"
+            f"{row['ms']:>10.2f}{row['disk_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Offline embeddings for benchmarks.
+
+Vectors are seeded from a hash of the text, so they are deterministic and cost
+no API calls. They carry no meaning, which is fine for measuring ingestion,
+index size and search latency but not for measuring relevance.
+"""
+
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic unit vectors of a fixed dimension derived from the text."""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        vector = rng.standard_normal(self.dimensions, dtype=np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
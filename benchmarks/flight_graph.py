@@ -0,0 +1,74 @@
+"""
+Benchmark: itinerary search over the flight graph as the schedule grows.
+
+Usage:
+    python -m benchmarks.flight_graph --scales 1,10,100
+
+Each scale generates scale x the seed flight count with the synthetic
+catalogue generator (see app/services/catalogue_generator.py), builds a
+FlightGraph and searches random airport pairs over a 31-day window, sorted by
+price and by duration. Reported latencies are per search; "found" is the share
+of searches that returned at least one itinerary. No API calls are made.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.services.catalogue_generator import SEED_SIZES, CatalogueGenerator
+from app.services.flight_graph import SORT_KEYS, FlightGraph
+from benchmarks.measure import latency_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flight graph benchmark")
+    parser.add_argument("--scales", default="1,10", help="Comma-separated multiples")
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'scale':>6}{'flights':>9}{'build s':>9} {'sort':<9}"
+        f"{'p50 ms':>8}{'p95 ms':>8}{'found':>7}"
+    )
+    for scale in (float(s) for s in args.scales.split(",")):
+        generator = CatalogueGenerator(args.seed)
+        flights = list(generator.flights(int(SEED_SIZES["flights"] * scale)))
+        started = time.perf_counter()
+        graph = FlightGraph(flights)
+        build_seconds = time.perf_counter() - started
+
+        rng = random.Random(args.seed)
+        airports = graph.airports
+        searches = []
+        for _ in range(args.searches):
+            origin, destination = rng.sample(airports, 2)
+            start = date(2025, 7, 1) + timedelta(days=rng.randrange(31))
+            searches.append(({origin}, {destination}, start, start + timedelta(30)))
+
+        for sort_by in SORT_KEYS:
+            found = 0
+            samples = []
+            for origins, destinations, start, end in searches:
+                results = []
+
+                def search():
+                    results[:] = graph.itineraries(
+                        origins, destinations, start, end, sort_by=sort_by, k=args.k
+                    )
+
+                samples.append(latency_ms(search, 3)["p50"])
+                found += bool(results)
+            samples.sort()
+            print(
+                f"{scale:>6g}{len(flights):>9}{build_seconds:>9.2f} {sort_by:<9}"
+                f"{samples[len(samples) // 2]:>8.2f}"
+                f"{samples[min(len(samples) - 1, int(len(samples) * 0.95))]:>8.2f}"
+                f"{found / len(searches):>7.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
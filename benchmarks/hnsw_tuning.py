@@ -0,0 +1,185 @@
+"""
+Benchmark: HNSW recall@k, QPS, build time and index size for a grid of
+M / ef_construction / ef_search settings.
+
+Usage:
+    python -m benchmarks.hnsw_tuning --vectors 40000 --dimensions 256
+
+Vectors are clustered unit vectors (a Gaussian mixture on the sphere), which
+are closer to real text embeddings than uniform noise. Recall is measured
+against exact brute-force cosine search with NumPy. No API calls are made.
+Use the results to set <KIND>_INDEX_M / _EF_CONSTRUCTION / _EF_SEARCH (see
+app/services/vector_index.py).
+"""
+
+import argparse
+import itertools
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import chromadb
+import numpy as np
+
+from benchmarks.measure import directory_size_mb
+
+BATCH_SIZE = 5000
+
+
+def clustered_vectors(
+    count: int, dimensions: int, clusters: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Unit vectors drawn around random cluster centres."""
+    centres = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centres[labels] + 0.6 * rng.standard_normal(
+        (count, dimensions), dtype=np.float32
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most similar vectors to each query by cosine."""
+    similarities = queries @ vectors.T
+    top = np.argpartition(-similarities, k, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(similarities, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def build_index(
+    directory: str, vectors: np.ndarray, params: Dict[str, Any]
+) -> Tuple[Any, float]:
+    """Create a cosine collection with params and add vectors; return build time."""
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.create_collection(
+        "hnsw_tuning",
+        configuration={"hnsw": {"space": "cosine", **params}},
+        embedding_function=None,
+    )
+    ids = [str(i) for i in range(len(vectors))]
+    started = time.perf_counter()
+    for i in range(0, len(vectors), BATCH_SIZE):
+        collection.add(
+            ids=ids[i : i + BATCH_SIZE], embeddings=vectors[i : i + BATCH_SIZE]
+        )
+    return collection, time.perf_counter() - started
+
+
+def run_grid(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    ms: List[int],
+    ef_constructions: List[int],
+    ef_searches: List[int],
+    k: int,
+) -> List[Dict[str, float]]:
+    """Measure every (M, ef_construction, ef_search) combination.
+
+    Chroma reads ef_search when it loads an index, so each setting gets its own
+    freshly built collection.
+    """
+    rows = []
+    for m, ef_construction, ef_search in itertools.product(
+        ms, ef_constructions, ef_searches
+    ):
+        directory = tempfile.mkdtemp(prefix="hnsw-tuning-")
+        try:
+            collection, build_seconds = build_index(
+                directory,
+                vectors,
+                {
+                    "max_neighbors": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                },
+            )
+            index_mb = directory_size_mb(directory)
+
+            found = []
+            started = time.perf_counter()
+            for query in queries:
+                result = collection.query(
+                    query_embeddings=[query], n_results=k, include=[]
+                )
+                found.append({int(i) for i in result["ids"][0]})
+            qps = len(queries) / (time.perf_counter() - started)
+            recall = float(
+                np.mean([len(f & set(t.tolist())) / k for f, t in zip(found, truth)])
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        rows.append(
+            {
+                "M": m,
+                "ef_construction": ef_construction,
+                "ef_search": ef_search,
+                "recall": recall,
+                "qps": qps,
+                "build_s": build_seconds,
+                "index_mb": index_mb,
+            }
+        )
+        print(
+            f"{m:>4}{ef_construction:>8}{ef_search:>8}{recall:>9.3f}"
+            f"{qps:>9.0f}{build_seconds:>9.1f}{index_mb:>10.1f}"
+        )
+    return rows
+
+
+def brute_force_qps(vectors: np.ndarray, queries: np.ndarray, k: int) -> float:
+    """Queries per second of exact single-query NumPy search."""
+    started = time.perf_counter()
+    for query in queries:
+        exact_top_k(vectors, query[None, :], k)
+    return len(queries) / (time.perf_counter() - started)
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW parameter sweep")
+    parser.add_argument("--vectors", type=int, default=40000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=_ints, default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=_ints, default=[100, 200])
+    parser.add_argument("--ef-search", type=_ints, default=[16, 32, 64, 128])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = clustered_vectors(
+        args.vectors + args.queries, args.dimensions, args.clusters, rng
+    )
+    vectors, queries = data[: args.vectors], data[args.vectors :]
+    truth = exact_top_k(vectors, queries, args.k)
+
+    print(
+        f"{args.vectors} vectors x {args.dimensions} dims, "
+        f"{vectors.nbytes / 1e6:.1f} MB raw float32, recall@{args.k}"
+    )
+    print(f"brute force: {brute_force_qps(vectors, queries, args.k):.0f} QPS")
+    print(
+        f"{'M':>4}{'ef_con':>8}{'ef_srch':>8}{'recall':>9}{'QPS':>9}"
+        f"{'build s':>9}{'index MB':>10}"
+    )
+    run_grid(
+        vectors,
+        queries,
+        truth,
+        args.m,
+        args.ef_construction,
+        args.ef_search,
+        args.k,
+    )
+
+
+if __name__ == "__main__":
+    main()
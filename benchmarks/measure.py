@@ -0,0 +1,36 @@
+"""
+Measurement helpers shared by the benchmarks.
+"""
+
+import os
+import resource
+import statistics
+import time
+from typing import Any, Callable, Dict
+
+
+def directory_size_mb(path: str) -> float:
+    """Total size of the files under path in MB."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1e6
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def latency_ms(search: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """p50/p95 latency of search in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        search()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
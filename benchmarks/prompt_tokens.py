@@ -0,0 +1,137 @@
+"""
+Benchmark: prompt and tool-output token counts, legacy vs compact encoding.
+
+Usage:
+    python -m benchmarks.prompt_tokens
+
+Counts use tiktoken when its encodings are available, otherwise ~4 chars/token.
+No API calls are made; tool results are built from the seed catalogues.
+"""
+
+import json
+import random
+from typing import Any, Dict, List
+
+from app.agents.tool_output import compact_results
+from app.data import experiences, flights, hotels
+from app.prompts import (
+    EXPERIENCE_AGENT_PROMPT,
+    FLIGHT_AGENT_PROMPT,
+    HOTEL_AGENT_PROMPT,
+    MANAGER_AGENT_PROMPT,
+)
+from app.services.token_usage import count_tokens
+from benchmarks.legacy_prompts import (
+    LEGACY_EXPERIENCE_AGENT_PROMPT,
+    LEGACY_FLIGHT_AGENT_PROMPT,
+    LEGACY_HOTEL_AGENT_PROMPT,
+    LEGACY_MANAGER_AGENT_PROMPT,
+)
+
+SEARCH_K = 5
+
+
+def _scores(rng: random.Random) -> List[float]:
+    return sorted((rng.uniform(0.6, 1.4) for _ in range(SEARCH_K)))
+
+
+def sample_rows(rng: random.Random) -> Dict[str, List[Dict[str, Any]]]:
+    """Build one search result set per agent, shaped like the tool rows."""
+    orlando_hotels = [h for h in hotels if h["city"] == "Orlando"][:SEARCH_K]
+    orlando_experiences = [e for e in experiences if e["city"] == "Orlando"][:SEARCH_K]
+    london_orlando = [
+        f
+        for f in flights
+        if (f["airport_depart"], f["airport_arrive"]) == ("LHR", "MCO")
+    ][:SEARCH_K]
+
+    return {
+        "hotel": [
+            {
+                "name": h["hotel_name"],
+                "city": h["city"],
+                "price_per_night": float(rng.randint(100, 1000)),
+                "rating": float(h["rating"]),
+                "score": score,
+            }
+            for h, score in zip(orlando_hotels, _scores(rng))
+        ],
+        "experience": [
+            {
+                "name": e["title"],
+                "city": e["city"],
+                "price": float(e["base_price"]),
+                "duration": f"{e['duration_hours']} hours",
+                "score": score,
+            }
+            for e, score in zip(orlando_experiences, _scores(rng))
+        ],
+        "flight": [
+            {
+                "airline": f["operating_airline"],
+                "from_airport": f["airport_depart"],
+                "to_airport": f["airport_arrive"],
+                "price": float(rng.randint(100, 1000)),
+                "duration": "9h 30m",
+                "date": f["depart_date"],
+                "score": score,
+            }
+            for f, score in zip(london_orlando, _scores(rng))
+        ],
+    }
+
+
+def legacy_output(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The previous tool output: every row with verbose keys and raw scores."""
+    return [
+        {
+            **{k: v for k, v in row.items() if k != "score"},
+            "similarity_score": row["score"],
+        }
+        for row in rows
+    ]
+
+
+def encode(value: Any) -> str:
+    """Serialise a tool return value the way it is sent to the model."""
+    return json.dumps(value, separators=(",", ":"))
+
+
+def main():
+    rng = random.Random(7)
+    rows = sample_rows(rng)
+    groups = {"hotel": "city", "experience": "city", "flight": "airline"}
+    cases = [
+        ("hotel instructions", LEGACY_HOTEL_AGENT_PROMPT, HOTEL_AGENT_PROMPT),
+        ("flight instructions", LEGACY_FLIGHT_AGENT_PROMPT, FLIGHT_AGENT_PROMPT),
+        (
+            "experience instructions",
+            LEGACY_EXPERIENCE_AGENT_PROMPT,
+            EXPERIENCE_AGENT_PROMPT,
+        ),
+        ("manager instructions", LEGACY_MANAGER_AGENT_PROMPT, MANAGER_AGENT_PROMPT),
+    ]
+    for agent, group_by in groups.items():
+        cases.append(
+            (
+                f"{agent} tool output",
+                encode(legacy_output(rows[agent])),
+                encode(compact_results(rows[agent], group_by=group_by)),
+            )
+        )
+
+    print(f"{'input':<26}{'legacy':>8}{'compact':>9}{'saved':>8}")
+    legacy_total = compact_total = 0
+    for name, legacy, compact in cases:
+        legacy_tokens, compact_tokens = count_tokens(legacy), count_tokens(compact)
+        legacy_total += legacy_tokens
+        compact_total += compact_tokens
+        saved = 1 - compact_tokens / legacy_tokens
+        print(f"{name:<26}{legacy_tokens:>8}{compact_tokens:>9}{saved:>8.0%}")
+
+    saved = 1 - compact_total / legacy_total
+    print(f"{'total per request':<26}{legacy_total:>8}{compact_total:>9}{saved:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: recall, latency and resident vector memory of int8 and binary
+quantized search against the float32 path.
+
+Usage:
+    python -m benchmarks.quantization --vectors 40000 --dimensions 1536
+
+All modes search the same memory-mapped NumPy store (see
+app/services/numpy_store.py). Quantized modes search codes first and rescore
+k x rescore_factor candidates exactly; recall@k is measured against exact
+float32 search. No API calls are made.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.numpy_store import NumpyVectorStore
+from benchmarks.hnsw_tuning import clustered_vectors
+from benchmarks.vector_engines import FixedEmbeddings, fill
+
+
+def _ids(results) -> List[List[str]]:
+    return [[doc.id for doc, _ in rows] for rows in results]
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized search benchmark")
+    parser.add_argument("--vectors", type=int, default=40000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factors", type=_ints, default=[1, 4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = clustered_vectors(args.vectors + args.queries, args.dimensions, 64, rng)
+    vectors, queries = data[: args.vectors], data[args.vectors :].tolist()
+
+    directory = tempfile.mkdtemp(prefix="quantization-")
+    try:
+        fill(
+            NumpyVectorStore("bench", FixedEmbeddings(vectors), directory), len(vectors)
+        )
+        exact_store = NumpyVectorStore("bench", None, directory, mmap=False)
+        truth = _ids(exact_store.similarity_search_by_vectors(queries, k=args.k))
+
+        print(f"{args.vectors} vectors x {args.dimensions} dims, recall@{args.k}")
+        print(
+            f"{'mode':<8}{'rescore':>8}{'recall':>8}{'ms/query':>10}"
+            f"{'resident MB':>13}{'reduction':>11}"
+        )
+        cases = [("float32", 0)] + [
+            (mode, factor)
+            for mode in ("int8", "binary")
+            for factor in args.rescore_factors
+        ]
+        float_bytes = exact_store.stats()["float_vector_bytes"]
+        for mode, factor in cases:
+            store = (
+                exact_store
+                if mode == "float32"
+                else NumpyVectorStore(
+                    "bench", None, directory, quantization=mode, rescore_factor=factor
+                )
+            )
+            started = time.perf_counter()
+            found = _ids(
+                [
+                    store.similarity_search_by_vector_with_relevance_scores(
+                        query, k=args.k
+                    )
+                    for query in queries
+                ]
+            )
+            ms = (time.perf_counter() - started) * 1000 / len(queries)
+            recall = np.mean(
+                [len(set(f) & set(t)) / args.k for f, t in zip(found, truth)]
+            )
+            resident = store.stats()["resident_vector_bytes"]
+            print(
+                f"{mode:<8}{factor or '-':>8}{recall:>8.3f}{ms:>10.2f}"
+                f"{resident / 1e6:>13.1f}{float_bytes / resident:>10.1f}x"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
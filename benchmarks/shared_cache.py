@@ -0,0 +1,75 @@
+"""
+Benchmark: cache hit rate and lookup latency across server workers.
+
+Usage:
+    python -m benchmarks.shared_cache --workers 1,2,4,8
+
+Each worker is a forked process drawing the same total number of lookups,
+split evenly, from a Zipf-distributed stream of query keys (a few popular
+destinations dominate, as in production traffic). A miss stores the key, as
+the embedding and search caches do. Per-worker TTLCaches each warm their own
+copy; the tiered cache shares a SQLite tier between workers. Latencies are
+per lookup, including the write on a miss. No API calls are made.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from multiprocessing import get_context
+from typing import Tuple
+
+import numpy as np
+
+from app.services.cache import SQLiteCache, TieredCache, TTLCache
+
+
+def worker(args: Tuple[str, str, int, int, int]) -> Tuple[int, int, float]:
+    backend, path, keys, lookups, seed = args
+    if backend == "memory":
+        cache = TTLCache(max_size=keys)
+    else:
+        cache = TieredCache(TTLCache(max_size=keys), SQLiteCache(path, "bench"))
+    rng = np.random.default_rng(seed)
+    stream = np.minimum(rng.zipf(1.2, lookups), keys)
+    hits = 0
+    started = time.perf_counter()
+    for key in stream:
+        query = f"hotels near destination {key}"
+        if cache.get(query) is None:
+            cache.set(query, [0.0] * 64)
+        else:
+            hits += 1
+    return hits, lookups, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache benchmark")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated")
+    parser.add_argument("--lookups", type=int, default=20000, help="Total lookups")
+    parser.add_argument("--keys", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'backend':<8}{'hit rate':>9}{'us/lookup':>11}")
+    context = get_context("fork")
+    for workers in (int(w) for w in args.workers.split(",")):
+        for backend in ("memory", "sqlite"):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "cache.sqlite3")
+                jobs = [
+                    (backend, path, args.keys, args.lookups // workers, seed)
+                    for seed in range(workers)
+                ]
+                with context.Pool(workers) as pool:
+                    results = pool.map(worker, jobs)
+            hits = sum(r[0] for r in results)
+            lookups = sum(r[1] for r in results)
+            seconds = sum(r[2] for r in results)
+            print(
+                f"{workers:>8} {backend:<8}{hits / lookups:>9.1%}"
+                f"{seconds / lookups * 1e6:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
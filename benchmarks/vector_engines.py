@@ -0,0 +1,143 @@
+"""
+Benchmark: exact NumPy search vs Chroma HNSW by collection size.
+
+Usage:
+    python -m benchmarks.vector_engines --sizes 190,562,4026,40000
+
+For each size both engines hold the same clustered unit vectors with a "city"
+metadata field. The benchmark reports single-query latency (unfiltered and
+with a city filter) and the per-query cost of a batch of queries, where the
+NumPy store answers the whole batch with one matrix multiply and Chroma runs
+one query call for the batch. Query embedding time is excluded. No API calls
+are made.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import chromadb
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.services.numpy_store import NumpyVectorStore
+from app.services.vector_index import collection_configuration
+from benchmarks.hnsw_tuning import clustered_vectors
+from benchmarks.measure import latency_ms
+
+CITIES = ["Orlando", "New York", "Miami", "Bridgetown", "Mumbai", "Toronto"]
+BATCH_SIZE = 5000
+
+
+class FixedEmbeddings:
+    """Hands out precomputed vectors in order, so both engines index the same data."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.offset = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batch = self.vectors[self.offset : self.offset + len(texts)]
+        self.offset += len(texts)
+        return batch.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError("benchmarks search by vector")
+
+
+def fill(store: Any, count: int) -> None:
+    """Add count small documents with a city field to store."""
+    for start in range(0, count, BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, count)
+        store.add_documents(
+            [
+                Document(page_content=f"doc {i}", metadata={"city": CITIES[i % 6]})
+                for i in range(start, stop)
+            ],
+            ids=[str(i) for i in range(start, stop)],
+        )
+
+
+def per_query_ms(search: Callable[[], Any], queries: int, repeats: int) -> float:
+    """Median milliseconds per query of a call that runs queries queries."""
+    return latency_ms(search, repeats)["p50"] / queries
+
+
+def compare(
+    vectors: np.ndarray, queries: np.ndarray, k: int, batch: int
+) -> Dict[str, float]:
+    """Measure both engines on the same vectors."""
+    directory = tempfile.mkdtemp(prefix="vector-engines-")
+    try:
+        numpy_store = NumpyVectorStore(
+            "bench", FixedEmbeddings(vectors), f"{directory}/numpy", mmap=True
+        )
+        chroma_store = Chroma(
+            collection_name="bench",
+            embedding_function=FixedEmbeddings(vectors),
+            client=chromadb.PersistentClient(path=f"{directory}/chroma"),
+            collection_configuration=collection_configuration("flights"),
+        )
+        fill(numpy_store, len(vectors))
+        fill(chroma_store, len(vectors))
+
+        single = queries[0].tolist()
+        batch_queries = queries[:batch].tolist()
+        city = {"city": "Orlando"}
+        repeats = 30
+        results = {}
+        for name, store in [("numpy", numpy_store), ("chroma", chroma_store)]:
+            search = store.similarity_search_by_vector_with_relevance_scores
+            results[f"{name}_ms"] = per_query_ms(
+                lambda: search(single, k=k), 1, repeats
+            )
+            results[f"{name}_filtered_ms"] = per_query_ms(
+                lambda: search(single, k=k, filter=city), 1, repeats
+            )
+        results["numpy_batch_ms"] = per_query_ms(
+            lambda: numpy_store.similarity_search_by_vectors(batch_queries, k=k),
+            batch,
+            repeats,
+        )
+        results["chroma_batch_ms"] = per_query_ms(
+            lambda: chroma_store._collection.query(
+                query_embeddings=batch_queries, n_results=k
+            ),
+            batch,
+            repeats,
+        )
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy vs Chroma search latency")
+    parser.add_argument("--sizes", default="190,562,4026,40000")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{args.dimensions} dims, k={args.k}, batch={args.batch}; ms per query")
+    print(
+        f"{'vectors':>8}{'numpy':>9}{'chroma':>9}{'np filt':>9}{'ch filt':>9}"
+        f"{'np batch':>10}{'ch batch':>10}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = clustered_vectors(size + args.batch, args.dimensions, 64, rng)
+        row = compare(data[:size], data[size:], args.k, args.batch)
+        print(
+            f"{size:>8}{row['numpy_ms']:>9.3f}{row['chroma_ms']:>9.3f}"
+            f"{row['numpy_filtered_ms']:>9.3f}{row['chroma_filtered_ms']:>9.3f}"
+            f"{row['numpy_batch_ms']:>10.3f}{row['chroma_batch_ms']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
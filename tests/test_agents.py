@@ -2,6 +2,8 @@
 Tests for AI agents and their functionality.
 """
 
+import asyncio
+from datetime import date
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
@@ -9,8 +11,9 @@ from langchain_core.documents import Document
 from pydantic_ai.models.test import TestModel
 
 from app.agents.experience_agent import experience_agent, experience_search
-from app.agents.flight_agent import flight_agent, flight_search
+from app.agents.flight_agent import flight_agent, flight_search, itinerary_search
 from app.agents.hotel_agent import hotel_agent, hotel_search
+from app.agents.tool_output import TOOL_TOP_N, compact_results
 from app.agents.manager_agent import get_hotel_recommendations, manager_agent
 from app.schemas import (
     ExperienceRecommendation,
@@ -87,6 +90,24 @@ class TestManagerAgent:
             "luxury hotel in London", deps="luxury hotel in London"
         )
 
+    @pytest.mark.asyncio
+    @patch.dict("app.services.deadline.STAGE_BUDGETS", {"hotel_agent": 0.01})
+    async def test_get_hotel_recommendations_times_out_to_none(self):
+        """Test a slow hotel agent degrades to no hotel recommendation."""
+
+        async def slow_run(query, deps):
+            await asyncio.sleep(1)
+
+        mock_hotel_agent = Mock()
+        mock_hotel_agent.run = slow_run
+
+        mock_ctx = Mock()
+        mock_ctx.deps = {"hotel_agent": mock_hotel_agent}
+
+        result = await get_hotel_recommendations(mock_ctx, "luxury hotel in London")
+
+        assert result is None
+
 
 class TestHotelAgent:
     """Test hotel agent functionality."""
@@ -108,12 +129,8 @@ class TestHotelAgent:
 
         result = await hotel_search("luxury hotel", location="London")
 
-        assert len(result) == 1
-        assert result[0]["name"] == "Test Hotel"
-        assert result[0]["city"] == "London"
-        assert result[0]["price_per_night"] == 200.0
-        assert result[0]["rating"] == 4.5
-        assert result[0]["similarity_score"] == 0.9
+        assert result["fields"] == ["name", "price_per_night", "rating", "score"]
+        assert result["city"] == {"London": [["Test Hotel", 200.0, 4.5, 0.9]]}
 
     @pytest.mark.asyncio
     @patch("app.agents.hotel_agent.search_hotels_with_score")
@@ -157,6 +174,31 @@ class TestHotelAgent:
         assert result.output.rating >= 0
 
 
+class TestToolOutput:
+    """Test the compact tool-output encoding."""
+
+    def test_compact_results_groups_and_truncates(self):
+        """Test rows are grouped, scores rounded and only the top rows kept."""
+        rows = [
+            {"name": f"Hotel {i}", "city": city, "score": 0.123456 + i}
+            for i, city in enumerate(["Orlando", "Miami", "Orlando", "Tampa"])
+        ]
+
+        result = compact_results(rows, group_by="city", top_n=3)
+
+        assert result == {
+            "fields": ["name", "score"],
+            "city": {
+                "Orlando": [["Hotel 0", 0.12], ["Hotel 2", 2.12]],
+                "Miami": [["Hotel 1", 1.12]],
+            },
+        }
+
+    def test_compact_results_empty(self):
+        """Test no rows encode as an empty list."""
+        assert compact_results([], group_by="city") == []
+
+
 class TestFlightAgent:
     """Test flight agent functionality."""
 
@@ -181,12 +223,72 @@ class TestFlightAgent:
             "flight from London", from_city="London", to_city="New York"
         )
 
-        assert len(result) == 1
-        assert result[0]["airline"] == "Virgin Atlantic"
-        assert result[0]["from_airport"] == "LHR"
-        assert result[0]["to_airport"] == "JFK"
-        assert result[0]["price"] == 500.0
-        assert result[0]["similarity_score"] == 0.95
+        assert result["fields"] == [
+            "from_airport",
+            "to_airport",
+            "price",
+            "duration",
+            "date",
+            "score",
+        ]
+        assert result["airline"] == {
+            "Virgin Atlantic": [["LHR", "JFK", 500.0, "8h 0m", "2024-07-01", 0.95]]
+        }
+
+    @pytest.mark.asyncio
+    @patch("app.agents.flight_agent.search_flights_with_score")
+    async def test_flight_search_by_dates_skips_embeddings(self, mock_search):
+        """Test a date window is answered from the date index."""
+        result = await flight_search(
+            "flight to New York",
+            from_city="London",
+            to_city="New York",
+            start_date=date(2025, 7, 10),
+            end_date=date(2025, 7, 12),
+        )
+
+        mock_search.assert_not_called()
+        assert "score" not in result["fields"]
+        rows = [row for rows in result["airline"].values() for row in rows]
+        assert rows
+        for row in rows:
+            assert row[:2] == ["LHR", "JFK"]
+            assert "2025-07-10" <= row[4] <= "2025-07-12"
+
+    @pytest.mark.asyncio
+    async def test_flight_search_by_dates_filters_price_before_limit(self):
+        """Test max_price is applied before the date window is cut to k flights."""
+        result = await flight_search(
+            "flight to New York",
+            from_city="London",
+            to_city="New York",
+            max_price=300,
+            start_date=date(2025, 7, 1),
+            end_date=date(2025, 7, 31),
+        )
+
+        rows = [row for rows in result["airline"].values() for row in rows]
+        assert len(rows) == TOOL_TOP_N
+        assert all(row[2] <= 300 for row in rows)
+
+    @pytest.mark.asyncio
+    async def test_itinerary_search_connects_through_hub(self):
+        """Test itinerary search finds connections where no direct flight exists."""
+        result = await itinerary_search(
+            "New York", "Tampa", date(2025, 7, 1), date(2025, 7, 31)
+        )
+
+        assert result["fields"][:2] == ["from_airport", "to_airport"]
+        rows = [row for rows in result["airline"].values() for row in rows]
+        prices = [row[2] for row in rows]
+        assert prices == sorted(prices)
+        assert all(row[:2] == ["JFK", "TPA"] for row in rows)
+        assert all(row[5] == ["LHR"] for row in rows)
+
+    @pytest.mark.asyncio
+    async def test_itinerary_search_unknown_place(self):
+        """Test unknown places return no itineraries."""
+        assert await itinerary_search("Atlantis", "Tampa") == []
 
     @pytest.mark.asyncio
     async def test_flight_agent_with_test_model(self):
@@ -224,11 +326,8 @@ class TestExperienceAgent:
 
         result = await experience_search("sightseeing", location="London")
 
-        assert len(result) == 1
-        assert result[0]["name"] == "London Eye"
-        assert result[0]["city"] == "London"
-        assert result[0]["price"] == 50.0
-        assert result[0]["duration"] == "2 hours"
+        assert result["fields"] == ["name", "price", "duration", "score"]
+        assert result["city"] == {"London": [["London Eye", 50.0, "2 hours", 0.85]]}
 
     @pytest.mark.asyncio
     async def test_experience_agent_with_test_model(self):
@@ -2,21 +2,66 @@
 Tests for datastore functionality and data processing.
 """
 
+import hashlib
+import json
+import shutil
+import sys
+import threading
+from functools import partial
 from unittest.mock import patch
 
+import chromadb
+import numpy as np
 import pytest
+from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
+import app.datastore
+from app.data import experiences, flights, hotels
 from app.datastore import (
+    CachedEmbeddings,
+    _cached_search_with_score,
+    _populate_store,
+    build_store,
+    check_embedding_schemas,
+    collection_alias,
     convert_duration_to_string,
     create_experience_document,
     create_flight_document,
     create_hotel_document,
-    get_random_cabin_price,
+    document_batches,
     get_random_room_price,
+    live_store,
+    needs_reindex,
+    populate_hotels_store,
+    precompute_query_embeddings,
+    reindex_store,
     search_experiences,
     search_flights,
     search_hotels,
+    stored_embedding_schema,
+)
+from app.services.cache import SQLiteCache, TTLCache
+from app.services.chroma_client import (
+    BatchingCollection,
+    ChromaCollectionAlias,
+    http_client,
+    local_server,
+)
+from app.services.embedding_lookup import EmbeddingLookup, query_templates
+from app.services.flight_fields import cabin_price
+from app.services.ingest_jobs import IngestCheckpoint, checkpoint_path
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.numpy_store import NumpyVectorStore
+from app.services.quantization import BinaryCodes, Int8Codes
+from app.services.sharding import ShardedStore, build_router, region_of
+from app.services.vector_index import (
+    apply_search_params,
+    collection_configuration,
+    collection_metric,
+    index_params,
+    relevance_score,
 )
 
 
@@ -49,8 +94,28 @@ class TestDurationConversion:
             convert_duration_to_string("PT")
 
 
+class TestDocumentBatches:
+    """Test streaming document construction for ingestion."""
+
+    def test_batches_cover_all_records_lazily(self):
+        """Test records are built on demand in batches of the requested size."""
+        built = []
+
+        def create(record):
+            built.append(record)
+            return Document(page_content=str(record))
+
+        batches = document_batches(range(7), create, batch_size=3)
+        assert built == []
+
+        first = next(batches)
+        assert [doc.page_content for doc in first] == ["0", "1", "2"]
+        assert built == [0, 1, 2]
+        assert [len(batch) for batch in batches] == [3, 1]
+
+
 class TestPriceGeneration:
-    """Test random price generation."""
+    """Test mock price generation."""
 
     @patch("app.datastore.random.randint")
     def test_get_random_room_price(self, mock_randint):
@@ -60,13 +125,14 @@ class TestPriceGeneration:
         assert price == 250.0
         mock_randint.assert_called_once_with(100, 1000)
 
-    @patch("app.datastore.random.randint")
-    def test_get_random_cabin_price(self, mock_randint):
-        """Test random cabin price generation."""
-        mock_randint.return_value = 500
-        price = get_random_cabin_price()
-        assert price == 500.0
-        mock_randint.assert_called_once_with(100, 1000)
+    def test_cabin_price_is_stable_per_flight(self):
+        """Test every lookup of a flight quotes the same cabin price."""
+        prices = {cabin_price({"flight_id": f"flight_{i}"}) for i in range(50)}
+        assert all(100 <= price <= 1000 for price in prices)
+        assert len(prices) > 1
+        assert cabin_price({"flight_id": "flight_7"}) == cabin_price(
+            {"flight_id": "flight_7", "depart_date": "2024-07-01"}
+        )
 
 
 class TestDocumentCreation:
@@ -131,7 +197,7 @@ class TestDocumentCreation:
         assert doc.metadata["duration"] == "2 hours"
         assert doc.metadata["type"] == "experience"
 
-    @patch("app.datastore.get_random_cabin_price")
+    @patch("app.datastore.cabin_price")
     def test_create_flight_document(self, mock_price):
         """Test flight document creation."""
         mock_price.return_value = 500.0
@@ -216,3 +282,885 @@ class TestSearchFunctions:
         mock_store.similarity_search.assert_called_once_with(
             "London to New York", k=10, filter=None
         )
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic offline embeddings for vector store tests."""
+
+    def __init__(self, size: int = 16):
+        self.size = size
+
+    def _embed(self, text: str) -> list:
+        digest = hashlib.sha256(text.encode()).digest()
+        return [byte / 255 for byte in digest[: self.size]]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class TestShardedStore:
+    """Test region-sharded vector stores."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        router = build_router(
+            [("Bridgetown", "Barbados"), ("Miami", "USA"), ("Mumbai", "India")],
+            [("BGI", "Barbados")],
+        )
+        store = ShardedStore(
+            collection_name="test_hotels",
+            embedding_function=HashEmbeddings(),
+            persist_directory=str(tmp_path),
+            region_field="country",
+            router=router,
+            client=chromadb.PersistentClient(path=str(tmp_path)),
+        )
+        documents = [
+            Document(page_content=f"Hotel {i} in {city}", metadata={"country": c})
+            for i, (city, c) in enumerate(
+                [("Bridgetown", "Barbados")] * 3
+                + [("Miami", "USA")] * 4
+                + [("Mumbai", "India")] * 2
+            )
+        ]
+        store.add_documents(documents, ids=[f"hotel-{i}" for i in range(9)])
+        return store
+
+    def test_region_of(self):
+        """Test country names map to shard regions."""
+        assert region_of("USA") == "north-america"
+        assert region_of("United States") == "north-america"
+        assert region_of("Jamaica") == "caribbean"
+        assert region_of("Atlantis") == "other"
+
+    def test_documents_are_partitioned_by_region(self, store):
+        """Test each document lands in its region's shard."""
+        stats = store.stats()
+
+        assert stats["shards"] == {"caribbean": 3, "north-america": 4, "south-asia": 2}
+        assert len(store.get()["ids"]) == 9
+
+    def test_query_naming_a_place_routes_to_one_shard(self, store):
+        """Test a query naming a destination searches only its shard."""
+        assert store.route("beach hotel in Bridgetown", None) == ["caribbean"]
+        assert store.route("flights to BGI", None) == ["caribbean"]
+
+        results = store.similarity_search_with_score("hotel in Barbados", k=5)
+
+        assert len(results) == 3
+        assert all(doc.metadata["region"] == "caribbean" for doc, _ in results)
+
+    def test_filter_pins_the_shard(self, store):
+        """Test a region or country filter selects the shard."""
+        assert store.route("anything", {"region": "south-asia"}) == ["south-asia"]
+        assert store.route("anything", {"country": "USA"}) == ["north-america"]
+
+    def test_ambiguous_query_fans_out_and_merges(self, store):
+        """Test ambiguous queries search every shard and merge by distance."""
+        assert store.route("a quiet hotel", None) == [
+            "caribbean",
+            "north-america",
+            "south-asia",
+        ]
+
+        results = store.similarity_search_with_score("a quiet hotel", k=5)
+        distances = [distance for _, distance in results]
+
+        assert len(results) == 5
+        assert distances == sorted(distances)
+        assert store.stats()["fanned_out"] == 2
+
+    def test_flights_route_on_destination_only(self, tmp_path):
+        """Test an origin-only flight query still finds flights into other regions."""
+        store = ShardedStore(
+            collection_name="test_flights",
+            embedding_function=HashEmbeddings(),
+            persist_directory=str(tmp_path),
+            region_field="to_country",
+            router=build_router(
+                [("London", "United Kingdom"), ("Bridgetown", "Barbados")],
+                [("LHR", "United Kingdom"), ("BGI", "Barbados")],
+            ),
+            client=chromadb.PersistentClient(path=str(tmp_path)),
+        )
+        store.add_documents(
+            [
+                Document(
+                    page_content="Flight from London LHR to Bridgetown BGI",
+                    metadata={"to_country": "Barbados", "to_airport": "BGI"},
+                ),
+                Document(
+                    page_content="Flight from Bridgetown BGI to London LHR",
+                    metadata={"to_country": "United Kingdom", "to_airport": "LHR"},
+                ),
+            ]
+        )
+
+        assert store.route("flights from London to Bridgetown", None) == ["caribbean"]
+        assert store.route("flights to LHR from BGI", None) == ["europe"]
+        assert store.route("anything", {"to_airport": "BGI"}) == ["caribbean"]
+        assert store.route("flights from LHR", None) == ["caribbean", "europe"]
+        results = store.similarity_search_with_score("flight from London", k=2)
+        assert {doc.metadata["to_country"] for doc, _ in results} == {
+            "Barbados",
+            "United Kingdom",
+        }
+
+    def test_shards_report_their_metric_and_take_search_params(self, tmp_path):
+        """Test an existing shard's metric is reported and its ef_search updated."""
+        client = chromadb.PersistentClient(path=str(tmp_path))
+        client.create_collection(
+            "test_metric__caribbean",
+            configuration={"hnsw": {"space": "l2", "ef_search": 10}},
+        )
+        configuration = collection_configuration("hotels")
+        store = ShardedStore(
+            collection_name="test_metric",
+            embedding_function=HashEmbeddings(),
+            persist_directory=str(tmp_path),
+            region_field="country",
+            router=build_router([], []),
+            client=client,
+            collection_configuration=configuration,
+        )
+
+        assert configuration["hnsw"]["space"] == "cosine"
+        assert store.metric == "l2"
+        assert (
+            client.get_collection("test_metric__caribbean").configuration["hnsw"][
+                "ef_search"
+            ]
+            == configuration["hnsw"]["ef_search"]
+        )
+
+    def test_delete_collection_removes_all_shards(self, store):
+        """Test deleting a sharded store drops every shard."""
+        store.delete_collection()
+
+        assert store.regions() == []
+
+
+class TestVectorIndex:
+    """Test index parameters and score normalisation."""
+
+    def test_index_params_defaults_and_overrides(self, monkeypatch):
+        """Test per-collection parameters can be overridden from the environment."""
+        assert index_params("hotels")["space"] == "cosine"
+
+        monkeypatch.setenv("FLIGHTS_INDEX_M", "32")
+        monkeypatch.setenv("FLIGHTS_INDEX_EF_SEARCH", "128")
+        params = index_params("flights")
+
+        assert params["max_neighbors"] == 32
+        assert params["ef_search"] == 128
+        assert collection_configuration("flights") == {"hnsw": params}
+
+    def test_unknown_metric_is_rejected(self, monkeypatch):
+        """Test a typo in the metric fails loudly."""
+        monkeypatch.setenv("HOTELS_INDEX_METRIC", "cosin")
+
+        with pytest.raises(ValueError, match="Unknown vector index metric"):
+            index_params("hotels")
+
+    def test_relevance_score_is_cosine_similarity(self):
+        """Test distances from every metric map to cosine similarity."""
+        assert relevance_score(0.0, "cosine") == 1.0
+        assert relevance_score(0.25, "cosine") == 0.75
+        assert relevance_score(0.25, "ip") == 0.75
+        assert relevance_score(0.5, "l2") == 0.75
+
+    def test_search_returns_relevance_best_first(self, tmp_path):
+        """Test scored searches return higher-is-better scores in rank order."""
+        client = chromadb.PersistentClient(path=str(tmp_path))
+        store = Chroma(
+            collection_name="test_relevance",
+            embedding_function=HashEmbeddings(),
+            client=client,
+            collection_configuration=collection_configuration("hotels"),
+        )
+        store.add_texts(["a quiet hotel", "a loud hostel", "a beach resort"])
+
+        results = _cached_search_with_score(store, "a quiet hotel", 3, None)
+        scores = [score for _, score in results]
+
+        assert collection_metric(store._collection) == "cosine"
+        assert results[0][0].page_content == "a quiet hotel"
+        assert scores[0] == pytest.approx(1.0)
+        assert scores == sorted(scores, reverse=True)
+
+    def test_apply_search_params_updates_ef_search(self, tmp_path):
+        """Test ef_search is applied to an existing collection."""
+        client = chromadb.PersistentClient(path=str(tmp_path))
+        collection = client.create_collection(
+            "test_ef_search", configuration=collection_configuration("hotels")
+        )
+
+        apply_search_params(collection, {"ef_search": 42})
+
+        assert (
+            client.get_collection("test_ef_search").configuration["hnsw"]["ef_search"]
+            == 42
+        )
+
+
+class TestNumpyVectorStore:
+    """Test the exact in-process vector store."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = NumpyVectorStore("test_numpy", HashEmbeddings(), str(tmp_path))
+        store.add_documents(
+            [
+                Document(
+                    page_content=f"hotel {i}",
+                    metadata={"city": ["Orlando", "Miami"][i % 2], "price": 100 * i},
+                )
+                for i in range(10)
+            ],
+            ids=[f"hotel-{i}" for i in range(10)],
+        )
+        return store
+
+    def test_exact_match_ranks_first(self, store):
+        """Test results are ordered by cosine distance, best first."""
+        results = store.similarity_search_with_score("hotel 3", k=4)
+        distances = [distance for _, distance in results]
+
+        assert results[0][0].id == "hotel-3"
+        assert distances[0] == pytest.approx(0.0, abs=1e-6)
+        assert distances == sorted(distances)
+        assert len(results) == 4
+
+    def test_filters_are_applied_as_masks(self, store):
+        """Test equality, comparison, $in and $and filters."""
+        orlando = store.similarity_search_with_score(
+            "hotel", k=10, filter={"city": "Orlando"}
+        )
+        cheap_miami = store.similarity_search_with_score(
+            "hotel",
+            k=10,
+            filter={"$and": [{"city": "Miami"}, {"price": {"$lt": 500}}]},
+        )
+        chosen = store.similarity_search_with_score(
+            "hotel", k=10, filter={"price": {"$in": [200, 900]}}
+        )
+
+        assert {doc.metadata["city"] for doc, _ in orlando} == {"Orlando"}
+        assert len(orlando) == 5
+        assert sorted(doc.metadata["price"] for doc, _ in cheap_miami) == [100, 300]
+        assert sorted(doc.id for doc, _ in chosen) == ["hotel-2", "hotel-9"]
+
+    def test_batch_matches_single_queries(self, store):
+        """Test a batched search returns the same results as one-by-one searches."""
+        queries = ["hotel 1", "hotel 7", "a beach resort"]
+
+        batched = store.similarity_search_batch_with_score(queries, k=3)
+
+        for query, results in zip(queries, batched):
+            single = store.similarity_search_with_score(query, k=3)
+            assert [doc.id for doc, _ in results] == [doc.id for doc, _ in single]
+
+    def test_store_reloads_from_disk(self, store, tmp_path):
+        """Test a new store maps the persisted vectors and records."""
+        reloaded = NumpyVectorStore("test_numpy", HashEmbeddings(), str(tmp_path))
+
+        assert reloaded.ids == store.ids
+        assert reloaded.matrix.dtype == np.float32
+        assert reloaded.matrix.shape == (10, 16)
+        assert reloaded.similarity_search("hotel 5", k=1)[0].id == "hotel-5"
+
+    def test_torn_append_is_dropped(self, store, tmp_path):
+        """Test rows written to only one file are ignored, then trimmed on append."""
+        with open(tmp_path / "vectors.f32", "ab") as f:
+            f.write(np.ones((2, 16), dtype=np.float32).tobytes())
+        with open(tmp_path / "records.jsonl", "a") as f:
+            f.write('{"id": "hotel-10", "docu')
+
+        reloaded = NumpyVectorStore("test_numpy", HashEmbeddings(), str(tmp_path))
+        reloaded.add_documents([Document(page_content="hotel 11")], ids=["hotel-11"])
+        after = NumpyVectorStore("test_numpy", HashEmbeddings(), str(tmp_path))
+
+        assert reloaded.ids == store.ids + ["hotel-11"]
+        assert after.ids == reloaded.ids
+        assert after.matrix.shape == (11, 16)
+        assert after.similarity_search("hotel 11", k=1)[0].id == "hotel-11"
+
+    def test_delete_collection(self, store):
+        """Test deleting clears the store."""
+        store.delete_collection()
+
+        assert store.get()["ids"] == []
+        assert store.similarity_search_with_score("hotel 1") == []
+
+    def test_build_store_selects_engine(self, monkeypatch, tmp_path):
+        """Test the engine is selectable per collection."""
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        monkeypatch.setitem(app.datastore.VECTOR_ENGINES, "hotels", "numpy")
+        monkeypatch.setitem(app.datastore.VECTOR_ENGINES, "flights", "faiss")
+
+        assert isinstance(
+            build_store("hotels", "va_hotels_collection", "country"),
+            NumpyVectorStore,
+        )
+        with pytest.raises(ValueError, match="Unknown vector engine"):
+            build_store("flights", "va_flights_collection", "to_country")
+
+
+class TestQuantizedSearch:
+    """Test quantized codes and two-stage search."""
+
+    @pytest.fixture
+    def vectors(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((500, 64)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_codes_shrink_vector_memory(self, vectors):
+        """Test int8 codes are ~4x and binary codes ~32x smaller than float32."""
+        assert Int8Codes(vectors).codes.nbytes * 4 == vectors.nbytes
+        assert BinaryCodes(vectors).codes.nbytes * 32 == vectors.nbytes
+
+    def test_int8_scores_approximate_dot_products(self, vectors):
+        """Test int8 coarse scores stay close to exact similarities."""
+        exact = vectors[:3] @ vectors.T
+
+        approx = Int8Codes(vectors).scores(vectors[:3])
+
+        assert np.abs(approx - exact).max() < 0.05
+
+    def test_binary_scores_rank_self_first(self, vectors):
+        """Test a vector's own code has the smallest Hamming distance."""
+        scores = BinaryCodes(vectors).scores(vectors[:5])
+
+        assert list(scores.argmax(axis=1)) == [0, 1, 2, 3, 4]
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_two_stage_search_matches_exact(self, tmp_path, quantization):
+        """Test rescored quantized search returns the exact top results."""
+        exact = NumpyVectorStore("test_exact", HashEmbeddings(), str(tmp_path))
+        exact.add_documents(
+            [Document(page_content=f"flight {i}") for i in range(300)],
+            ids=[str(i) for i in range(300)],
+        )
+        quantized = NumpyVectorStore(
+            "test_quantized", HashEmbeddings(), str(tmp_path), quantization=quantization
+        )
+
+        for query in ["flight 7", "flight 123", "overnight to Miami"]:
+            expected = exact.similarity_search_with_score(query, k=5)
+            found = quantized.similarity_search_with_score(query, k=5)
+            assert [doc.id for doc, _ in found] == [doc.id for doc, _ in expected]
+            assert [d for _, d in found] == pytest.approx([d for _, d in expected])
+
+        stats = quantized.stats()
+        assert stats["quantization"] == quantization
+        assert stats["resident_vector_bytes"] < stats["float_vector_bytes"]
+
+    def test_quantization_needs_numpy_engine(self, monkeypatch, tmp_path):
+        """Test quantizing a Chroma collection is rejected."""
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        monkeypatch.setitem(app.datastore.VECTOR_QUANTIZATION, "flights", "int8")
+
+        with pytest.raises(ValueError, match="needs the numpy engine"):
+            build_store("flights", "va_flights_collection", "to_country")
+
+
+class TestEmbeddingSchema:
+    """Test embedding schema tracking and re-ingestion on change."""
+
+    @pytest.fixture
+    def store(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        monkeypatch.setattr("app.datastore.EMBEDDING_MODEL", "text-embedding-3-large")
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", None)
+        return NumpyVectorStore(
+            "test_schema", HashEmbeddings(), str(tmp_path / "hotels" / "numpy")
+        )
+
+    def populate(self, store):
+        _populate_store(
+            "hotels",
+            store,
+            [f"hotel {i}" for i in range(5)],
+            lambda name: Document(page_content=name),
+            "Hotels",
+        )
+
+    def test_populate_records_schema(self, store):
+        """Test ingestion records the embedding model and dimension."""
+        self.populate(store)
+
+        assert stored_embedding_schema("hotels") == {
+            "model": "text-embedding-3-large",
+            "dimensions": None,
+        }
+        assert not needs_reindex("hotels", store)
+
+    def test_dimension_change_reingests(self, store, monkeypatch):
+        """Test changing the dimension rebuilds the store at the new width."""
+        self.populate(store)
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", 8)
+        store.embedding_function = HashEmbeddings(size=8)
+        assert needs_reindex("hotels", store)
+
+        self.populate(store)
+
+        assert len(store.get()["ids"]) == 5
+        assert store.stats()["dimensions"] == 8
+        assert stored_embedding_schema("hotels")["dimensions"] == 8
+        assert not needs_reindex("hotels", store)
+
+    def test_startup_fails_fast_on_a_changed_schema(self, store, monkeypatch, tmp_path):
+        """Test the API refuses to start on stores embedded at another width."""
+        self.populate(store)
+        empty = NumpyVectorStore("empty", HashEmbeddings(), str(tmp_path / "empty"))
+        monkeypatch.setattr(
+            "app.datastore.live_store",
+            lambda kind: store if kind == "hotels" else empty,
+        )
+        check_embedding_schemas()
+
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", 8)
+        with pytest.raises(ValueError, match="--reindex hotels$"):
+            check_embedding_schemas()
+
+    def test_unrecorded_store_is_assumed_native_width(self, store, monkeypatch):
+        """Test stores ingested before schema tracking only reindex if reduced."""
+        store.add_documents([Document(page_content="hotel 0")])
+
+        assert not needs_reindex("hotels", store)
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", 256)
+        assert needs_reindex("hotels", store)
+
+
+class TestStreamingIngestion:
+    """Test ingestion through the staged pipeline into each store type."""
+
+    @pytest.fixture(autouse=True)
+    def db_path(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+
+    def populate(self, store, count=250):
+        _populate_store(
+            "hotels",
+            store,
+            iter(
+                {"name": f"hotel {i}", "country": "Barbados" if i % 2 else "India"}
+                for i in range(count)
+            ),
+            lambda hotel: Document(
+                page_content=hotel["name"], metadata={"country": hotel["country"]}
+            ),
+            "Hotels",
+        )
+
+    def test_chroma_store(self, tmp_path):
+        """Test streamed documents are upserted with their embeddings."""
+        store = Chroma(
+            collection_name="test_streaming",
+            embedding_function=HashEmbeddings(),
+            client=chromadb.PersistentClient(path=str(tmp_path / "chroma")),
+        )
+
+        self.populate(store)
+
+        assert len(store.get()["ids"]) == 250
+        doc, _ = store.similarity_search_with_score("hotel 42", k=1)[0]
+        assert doc.page_content == "hotel 42"
+        assert doc.metadata == {"country": "India"}
+
+    def test_numpy_store(self, tmp_path):
+        """Test the numpy store accepts pre-computed embeddings."""
+        store = NumpyVectorStore("test_streaming", HashEmbeddings(), str(tmp_path))
+
+        self.populate(store)
+
+        assert len(store.get()["ids"]) == 250
+        assert store.similarity_search("hotel 7", k=1)[0].page_content == "hotel 7"
+
+    def test_sharded_store(self, tmp_path):
+        """Test pre-computed embeddings are routed to their region's shard."""
+        store = ShardedStore(
+            collection_name="test_streaming",
+            embedding_function=HashEmbeddings(),
+            persist_directory=str(tmp_path),
+            region_field="country",
+            router=build_router([("Bridgetown", "Barbados")], []),
+            client=chromadb.PersistentClient(path=str(tmp_path)),
+        )
+
+        self.populate(store, count=10)
+
+        assert store.regions() == ["caribbean", "south-asia"]
+        assert len(store.get()["ids"]) == 10
+
+
+class FlakyEmbeddings(HashEmbeddings):
+    """Hash embeddings that fail once on a given text, like a rate limit."""
+
+    def __init__(self, fail_on: str):
+        super().__init__()
+        self.fail_on = fail_on
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        if self.fail_on in texts:
+            self.fail_on = None
+            raise RuntimeError("rate limited")
+        self.embedded += texts
+        return super().embed_documents(texts)
+
+
+class TestResumableIngestion:
+    """Test checkpointed ingestion resumes after a failure."""
+
+    @pytest.fixture(autouse=True)
+    def db_path(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        # One embedding worker makes the batches that land before a failure fixed
+        monkeypatch.setattr(
+            "app.datastore.IngestPipeline", partial(IngestPipeline, embed_workers=1)
+        )
+
+    def populate(self, store):
+        _populate_store(
+            "flights",
+            store,
+            iter(f"flight {i}" for i in range(1000)),
+            lambda name: Document(page_content=name),
+            "Flights",
+        )
+
+    def checkpoint(self, tmp_path):
+        return IngestCheckpoint(checkpoint_path(str(tmp_path))).get("flights")
+
+    @pytest.mark.parametrize("engine", ["chroma", "numpy"])
+    def test_failed_ingest_resumes(self, engine, tmp_path):
+        """Test a failed ingest resumes from its last checkpointed batch."""
+        embeddings = FlakyEmbeddings(fail_on="flight 550")
+        if engine == "chroma":
+            store = Chroma(
+                collection_name="test_resume",
+                embedding_function=embeddings,
+                client=chromadb.PersistentClient(path=str(tmp_path / "chroma")),
+            )
+        else:
+            store = NumpyVectorStore("test_resume", embeddings, str(tmp_path / "np"))
+
+        with pytest.raises(RuntimeError, match="rate limited"):
+            self.populate(store)
+        failed = self.checkpoint(tmp_path)
+        assert failed["status"] == "failed"
+        assert "rate limited" in failed["error"]
+        assert failed["records_done"] == 500
+
+        embeddings.embedded.clear()
+        self.populate(store)
+
+        completed = self.checkpoint(tmp_path)
+        assert completed["status"] == "complete"
+        assert completed["count"] == 1000
+        assert len(set(store.get()["ids"])) == len(store.get()["ids"]) == 1000
+        # Only batches from the last checkpoint on were embedded again
+        assert "flight 0" not in embeddings.embedded
+        assert len(embeddings.embedded) == 1000 - failed["records_done"]
+
+    def test_emptied_store_is_reingested(self, tmp_path):
+        """Test a store whose count no longer matches its checkpoint is rebuilt."""
+        store = NumpyVectorStore("test_resume", HashEmbeddings(), str(tmp_path / "np"))
+        self.populate(store)
+        store.delete_collection()
+
+        self.populate(store)
+
+        assert len(store.get()["ids"]) == 1000
+        assert self.checkpoint(tmp_path)["status"] == "complete"
+
+
+class UnavailableEmbeddings(HashEmbeddings):
+    """Embeddings whose API is down."""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding API unavailable")
+
+
+class TestBlueGreenReindex:
+    """Test versioned collections swapped in behind an alias."""
+
+    @pytest.fixture(autouse=True)
+    def environment(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        monkeypatch.setattr("app.datastore.embeddings", HashEmbeddings())
+        monkeypatch.setattr("app.datastore.EMBEDDING_MODEL", "text-embedding-3-large")
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", None)
+        monkeypatch.setitem(app.datastore.VECTOR_ENGINES, "hotels", "numpy")
+        monkeypatch.setattr(
+            "app.datastore.hotels_store",
+            build_store("hotels", "va_hotels_collection", "country"),
+        )
+        populate_hotels_store()
+
+    def test_reindex_swaps_and_collects_old_versions(self, tmp_path):
+        """Test each reindex serves a new version and keeps only the previous."""
+        original = live_store("hotels")
+
+        assert reindex_store("hotels") == 562
+        assert collection_alias("hotels").read()["collection"] == (
+            "va_hotels_collection_v1"
+        )
+        assert live_store("hotels") is not original
+        assert live_store("hotels").collection_name == "va_hotels_collection_v1"
+        assert (tmp_path / "hotels" / "numpy").exists()
+
+        reindex_store("hotels")
+
+        assert collection_alias("hotels").versions() == [1, 2]
+        assert not (tmp_path / "hotels" / "numpy").exists()
+        assert len(app.datastore.search_hotels("beach resort")) == 5
+
+    def test_failed_build_keeps_serving(self, monkeypatch):
+        """Test a failing build leaves the live version in place, then resumes."""
+        original = live_store("hotels")
+        monkeypatch.setattr("app.datastore.embeddings", UnavailableEmbeddings())
+
+        with pytest.raises(RuntimeError, match="unavailable"):
+            reindex_store("hotels")
+
+        assert collection_alias("hotels").version == 0
+        assert live_store("hotels") is original
+        assert len(app.datastore.search_hotels("beach resort")) == 5
+
+        monkeypatch.setattr("app.datastore.embeddings", HashEmbeddings())
+        reindex_store("hotels")
+        assert collection_alias("hotels").version == 1
+
+    def test_schema_change_builds_new_version(self, monkeypatch):
+        """Test a dimension change is rebuilt beside the serving collection."""
+        monkeypatch.setattr("app.datastore.EMBEDDING_DIMENSIONS", 8)
+        monkeypatch.setattr("app.datastore.embeddings", HashEmbeddings(size=8))
+
+        populate_hotels_store()
+
+        assert collection_alias("hotels").version == 1
+        assert live_store("hotels").stats()["dimensions"] == 8
+        assert not needs_reindex("hotels", live_store("hotels"))
+
+
+@pytest.fixture(scope="module")
+def chroma_port(tmp_path_factory):
+    if shutil.which("chroma") is None:
+        pytest.skip("needs the chroma CLI to run a local server")
+    with local_server(str(tmp_path_factory.mktemp("chroma_server"))) as port:
+        yield port
+
+
+class TestChromaServerMode:
+    """Test stores backed by a locally launched Chroma server."""
+
+    @pytest.fixture(autouse=True)
+    def environment(self, monkeypatch, tmp_path, chroma_port):
+        client = http_client(port=chroma_port)
+        monkeypatch.setattr("app.datastore.DB_PATH", str(tmp_path))
+        monkeypatch.setattr("app.datastore.CHROMA_MODE", "http")
+        monkeypatch.setattr("app.datastore.shared_http_client", lambda: client)
+        monkeypatch.setattr("app.datastore.embeddings", HashEmbeddings())
+        monkeypatch.setattr("app.datastore._aliases", {})
+        self.client = client
+        yield
+        for collection in client.list_collections():
+            client.delete_collection(collection.name)
+
+    def populate(self, store):
+        _populate_store(
+            "hotels",
+            store,
+            iter(f"hotel {i}" for i in range(300)),
+            lambda name: Document(page_content=name, metadata={"country": "India"}),
+            "Hotels",
+        )
+
+    def test_store_lives_in_the_server(self):
+        """Test ingestion and search go through the server, not DB_PATH."""
+        store = build_store("hotels", "va_hotels_collection", "country")
+        self.populate(store)
+
+        assert isinstance(store._collection, BatchingCollection)
+        assert self.client.get_collection("va_hotels_collection").count() == 300
+        doc, _ = store.similarity_search_with_score("hotel 42", k=1)[0]
+        assert doc.page_content == "hotel 42"
+
+    def test_concurrent_queries_are_batched(self):
+        """Test simultaneous searches share requests and keep their own results."""
+        store = build_store("hotels", "va_hotels_collection", "country")
+        self.populate(store)
+        barrier = threading.Barrier(16)
+        results = {}
+
+        def search(i):
+            barrier.wait()
+            results[i] = store.similarity_search(f"hotel {i}", k=1)[0].page_content
+
+        threads = [threading.Thread(target=search, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {i: f"hotel {i}" for i in range(16)}
+        stats = store._collection.stats()
+        assert stats["queries"] == 16
+        assert stats["requests"] < 16
+
+    def test_aliases_are_shared_through_the_server(self):
+        """Test a swap made by one replica is seen by another."""
+        this_replica = collection_alias("hotels")
+        other_replica = ChromaCollectionAlias(self.client, "hotels", refresh_seconds=0)
+
+        this_replica.point_to(this_replica.start_build())
+
+        assert isinstance(this_replica, ChromaCollectionAlias)
+        assert other_replica.poll()
+        assert other_replica.version == 1
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """HashEmbeddings recording every online query embedding."""
+
+    def __init__(self, size: int = 16):
+        super().__init__(size)
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+class TestQueryEmbeddingLookup:
+    """Test precomputed embeddings for templated tool queries."""
+
+    SCHEMA = {"model": "text-embedding-3-large", "dimensions": None}
+
+    def test_templates_cover_catalogue_entities(self):
+        """Test templates are filled from catalogue cities, tags and routes."""
+        queries = query_templates(hotels, experiences, flights)
+
+        assert "family hotel in Orlando" in queries
+        assert "romantic experiences in Dallas" in queries
+        assert "flights from London to Miami in July" in queries
+        assert len(queries) == len(set(queries))
+
+    def test_precompute_streams_the_given_catalogues(self, tmp_path, monkeypatch):
+        """Test ingestion builds the table from catalogue files, not loaded seeds."""
+        paths = {}
+        for kind, records in (
+            ("hotels", [{"city": "Tampa"}]),
+            ("experiences", [{"city": "Tampa", "tags": "food"}]),
+            ("flights", [{"city_depart": "London", "city_arrive": "Tampa"}]),
+        ):
+            paths[kind] = str(tmp_path / f"{kind}.jsonl")
+            with open(paths[kind], "w") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+        def unused(name):
+            raise AssertionError(f"{name} catalogue loaded during ingestion")
+
+        lookup = EmbeddingLookup(str(tmp_path / "lookup"), self.SCHEMA)
+        monkeypatch.setattr(app.datastore, "load_catalogue", unused)
+        monkeypatch.setattr(app.datastore, "query_embedding_lookup", lookup)
+        monkeypatch.setattr(app.datastore, "embeddings", HashEmbeddings())
+
+        assert precompute_query_embeddings(paths) == 14
+        assert lookup.get("food experiences in Tampa") is not None
+        assert precompute_query_embeddings(paths) == 0
+
+    def test_templated_queries_skip_the_api(self, tmp_path):
+        """Test lookups are normalised and only other queries are embedded online."""
+        lookup = EmbeddingLookup(str(tmp_path), self.SCHEMA, refresh_seconds=0)
+        assert (
+            lookup.build(
+                [
+                    "family hotel in Orlando",
+                    "Family hotel in orlando",
+                    "hotel in Miami",
+                ],
+                HashEmbeddings().embed_documents,
+                batch_size=1,
+            )
+            == 2
+        )
+        online = CountingEmbeddings()
+        embeddings = CachedEmbeddings(online, TTLCache(), lookup)
+
+        assert embeddings.embed_query("family  hotel in ORLANDO") == pytest.approx(
+            HashEmbeddings().embed_query("family hotel in Orlando")
+        )
+        embeddings.embed_query("spa hotel in Miami")
+
+        assert online.queries == ["spa hotel in Miami"]
+        assert lookup.stats() == {"hits": 1, "misses": 1, "size": 2}
+
+    def test_shared_cache_is_keyed_by_schema(self, tmp_path):
+        """Test a shared query cache never serves another schema's vectors."""
+        cache = SQLiteCache(str(tmp_path / "cache.db"), "query_embeddings")
+        old, new = CountingEmbeddings(16), CountingEmbeddings(8)
+        CachedEmbeddings(old, cache, schema=("old-model", None)).embed_query("spa")
+        vector = CachedEmbeddings(new, cache, schema=("new-model", 8)).embed_query(
+            "spa"
+        )
+
+        assert len(vector) == 8
+        assert new.queries == ["spa"]
+
+    def test_table_follows_schema_and_rebuilds(self, tmp_path):
+        """Test a table from another model is ignored and rebuilds are reloaded."""
+        builder = EmbeddingLookup(str(tmp_path), self.SCHEMA)
+        builder.build(["hotel in Miami"], HashEmbeddings().embed_documents)
+        other = EmbeddingLookup(str(tmp_path), {**self.SCHEMA, "dimensions": 8})
+        reader = EmbeddingLookup(str(tmp_path), self.SCHEMA, refresh_seconds=0)
+
+        assert other.get("hotel in Miami") is None
+        assert not other.holds(["hotel in Miami"])
+        assert reader.holds(["Hotel in Miami"])
+
+        builder.build(["hotel in Tampa"], HashEmbeddings().embed_documents)
+
+        assert reader.get("hotel in Miami") is None
+        assert reader.get("hotel in Tampa") is not None
+        assert len(list(tmp_path.glob("vectors-*.f32"))) == 1
+
+    def test_reads_during_rebuilds_see_one_table(self, tmp_path):
+        """Test concurrent lookups never mix the rows and vectors of two tables."""
+        builder = EmbeddingLookup(str(tmp_path), self.SCHEMA)
+        reader = EmbeddingLookup(str(tmp_path), self.SCHEMA, refresh_seconds=0)
+        small = ["hotel in Miami"]
+        large = [f"hotel in city {i}" for i in range(50)] + small
+        builder.build(small, HashEmbeddings().embed_documents)
+        errors, done = [], threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    assert reader.get("hotel in Miami") is not None
+                    reader.get("hotel in city 49")
+                except Exception as error:
+                    errors.append(error)
+
+        # Switch threads as often as possible to land reads mid-swap
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        try:
+            for thread in readers:
+                thread.start()
+            for texts in [large, small] * 50:
+                builder.build(texts, HashEmbeddings().embed_documents)
+        finally:
+            done.set()
+            sys.setswitchinterval(interval)
+            for thread in readers:
+                thread.join()
+
+        assert errors == []
@@ -2,12 +2,17 @@
 Tests for the main FastAPI application and endpoints.
 """
 
+import asyncio
+import json
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.advice_warmer import AdviceCache
+from app.services.cache import TTLCache
+from app.services.progress import publish
 from app.schemas import (
     ExperienceRecommendation,
     FlightRecommendation,
@@ -36,6 +41,13 @@ class TestHealthEndpoints:
         assert response.status_code == 200
         assert response.json() == {"status": "healthy"}
 
+    def test_metrics_endpoint(self, client):
+        """Test metrics endpoint exposes coalescing counters."""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "coalesced" in response.json()["coalescing"]
+        assert "warmed" in response.json()["advice_warmer"]
+
 
 class TestTravelAssistantEndpoint:
     """Test the main travel assistant endpoint."""
@@ -135,6 +147,53 @@ class TestTravelAssistantEndpoint:
         assert response.status_code == 500
         assert "API error: Agent processing error" in response.json()["detail"]
 
+    @patch("app.main.check_api_key")
+    @patch("app.main.validate_user_query")
+    @patch("app.main.manager_agent")
+    @patch.dict("app.services.deadline.STAGE_BUDGETS", {"manager": 0.01})
+    def test_travel_assistant_manager_timeout(
+        self, mock_manager, mock_validate, mock_api_key, client
+    ):
+        """Test a manager agent exceeding its budget returns a gateway timeout."""
+        mock_api_key.return_value = True
+        mock_validate.return_value = {"is_safe": True, "message": "Valid"}
+
+        async def slow_run(query, deps):
+            await asyncio.sleep(1)
+
+        mock_manager.run = slow_run
+
+        response = client.post(
+            "/travel-assistant", json={"query": "I want to visit Paris"}
+        )
+
+        assert response.status_code == 504
+        assert "manager timed out" in response.json()["detail"]
+
+    @patch("app.main.run_travel_pipeline")
+    def test_precomputed_advice_is_served_from_cache(self, mock_pipeline, client):
+        """Test a warmed query skips the pipeline and reports the answer's age."""
+        cache = AdviceCache(cache=TTLCache())
+        cache.put(
+            "Plan a trip to Orlando",
+            TravelAdvice(
+                destination="Orlando",
+                reason="Theme parks",
+                budget="Midrange",
+                tips=["Book early"],
+            ).model_dump(),
+        )
+
+        with patch("app.main.advice_cache", cache):
+            response = client.post(
+                "/travel-assistant", json={"query": "plan a trip to  Orlando"}
+            )
+
+        assert response.status_code == 200
+        assert response.json()["destination"] == "Orlando"
+        assert response.headers["age"] == "0"
+        mock_pipeline.assert_not_called()
+
     def test_travel_assistant_invalid_json(self, client):
         """Test travel assistant with invalid request body."""
         response = client.post("/travel-assistant", json={})
@@ -146,3 +205,181 @@ class TestTravelAssistantEndpoint:
         response = client.post("/travel-assistant", json={"query": ""})
 
         assert response.status_code == 500
+
+
+class TestConversationSessions:
+    """Test follow-up questions within a session."""
+
+    @patch("app.main.get_all_recommendations", new_callable=AsyncMock)
+    @patch("app.main.check_api_key")
+    @patch("app.main.validate_user_query")
+    @patch("app.main.run_travel_pipeline")
+    def test_follow_up_reruns_only_the_affected_agent(
+        self, mock_pipeline, mock_validate, mock_api_key, mock_valid, client
+    ):
+        """Test a cheaper-hotel follow-up skips the manager and other agents."""
+        mock_api_key.return_value = True
+        mock_validate.return_value = {"is_safe": True, "message": "Valid"}
+        mock_valid.return_value = True
+        flight = FlightRecommendation(
+            airline="Virgin Atlantic",
+            from_airport="LHR",
+            to_airport="MCO",
+            price=900.0,
+            duration="9h 40m",
+            date="2023-07-01",
+        )
+
+        async def pipeline(query, logger):
+            publish("hotel", query="family hotel in Orlando", data={})
+            return TravelAdvice(
+                destination="Orlando",
+                reason="Theme parks",
+                budget="Expensive",
+                tips=["Book early"],
+                hotel=HotelRecommendation(
+                    name="Grand Hotel",
+                    city="Orlando",
+                    price_per_night=1500.0,
+                    rating=5.0,
+                ),
+                flight=flight,
+            )
+
+        mock_pipeline.side_effect = pipeline
+        hotel_agent = Mock()
+        hotel_agent.run = AsyncMock(
+            return_value=Mock(
+                output=HotelRecommendation(
+                    name="Budget Inn", city="Orlando", price_per_night=80.0, rating=3.5
+                )
+            )
+        )
+
+        first = client.post(
+            "/travel-assistant",
+            json={"query": "Family holiday in Orlando from London in July"},
+        )
+        session_id = first.headers["x-session-id"]
+        with patch.dict("app.main.specialist_agents", {"hotel": hotel_agent}):
+            response = client.post(
+                "/travel-assistant",
+                json={"query": "Cheaper hotel instead", "session_id": session_id},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["x-session-id"] == session_id
+        data = response.json()
+        assert data["hotel"]["name"] == "Budget Inn"
+        assert data["flight"] == flight.model_dump()
+        assert data["budget"] == "Budget"
+        mock_pipeline.assert_called_once()
+        (checked,), kwargs = mock_valid.call_args
+        assert checked.hotel.name == "Budget Inn"
+        assert checked.flight is None
+        assert kwargs["optional"] == {"flight", "experience"}
+        (specialist_query,), _ = hotel_agent.run.call_args
+        assert specialist_query.startswith("family hotel in Orlando\n")
+        assert "Cheaper hotel instead" in specialist_query
+
+
+class TestTravelAssistantStreamEndpoint:
+    """Test the streaming travel assistant endpoint."""
+
+    @patch("app.main.run_travel_pipeline")
+    def test_recommendations_stream_before_advice(self, mock_pipeline, client):
+        """Test specialist results arrive as events ahead of the final advice."""
+        hotel = HotelRecommendation(
+            name="Test Hotel", city="Orlando", price_per_night=150.0, rating=4.0
+        )
+
+        async def pipeline(query, logger):
+            publish("hotel", data=hotel.model_dump())
+            await asyncio.sleep(0)
+            return TravelAdvice(
+                destination="Orlando",
+                reason="Theme parks",
+                budget="Midrange",
+                tips=["Book early"],
+                hotel=hotel,
+            )
+
+        mock_pipeline.side_effect = pipeline
+
+        response = client.post(
+            "/travel-assistant/stream", json={"query": "Family holiday in Orlando"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [event["type"] for event in events] == ["session", "hotel", "advice"]
+        assert events[1]["data"]["name"] == "Test Hotel"
+        assert events[2]["data"]["destination"] == "Orlando"
+
+    @patch("app.main.check_api_key")
+    @patch("app.main.validate_user_query")
+    def test_errors_end_the_stream(self, mock_validate, mock_api_key, client):
+        """Test a rejected query ends the stream with an error event."""
+        mock_api_key.return_value = True
+        mock_validate.return_value = {"is_safe": False, "message": "Unsafe query"}
+
+        response = client.post(
+            "/travel-assistant/stream", json={"query": "inappropriate content"}
+        )
+
+        assert response.status_code == 200
+        assert json.loads(response.text.splitlines()[-1]) == {
+            "type": "error",
+            "status": 400,
+            "detail": "Unsafe query",
+        }
+
+
+class TestTravelAssistantBatchEndpoint:
+    """Test the bulk travel assistant endpoint."""
+
+    @patch("app.main.query_tracker")
+    @patch("app.main.run_travel_pipeline")
+    def test_batch_streams_ndjson(self, mock_pipeline, mock_tracker, client):
+        """Test each query produces one NDJSON line and failures are isolated."""
+
+        async def pipeline(query, logger):
+            if "fail" in query:
+                raise Exception("Agent processing error")
+            return TravelAdvice(
+                destination="Orlando",
+                reason="Theme parks",
+                budget="Midrange",
+                tips=["Book early"],
+            )
+
+        mock_pipeline.side_effect = pipeline
+
+        response = client.post(
+            "/travel-assistant/batch",
+            json={
+                "queries": [
+                    {"query": "Family holiday in Orlando"},
+                    {"query": "Trip that will fail"},
+                ],
+                "concurrency": 2,
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = sorted(
+            (json.loads(line) for line in response.text.splitlines()),
+            key=lambda line: line["index"],
+        )
+        assert len(lines) == 2
+        assert lines[0]["advice"]["destination"] == "Orlando"
+        assert lines[1]["error"] == "Agent processing error"
+        mock_tracker.record.assert_not_called()
+
+    def test_batch_rejects_empty_list(self, client):
+        """Test an empty batch is rejected by request validation."""
+        response = client.post("/travel-assistant/batch", json={"queries": []})
+
+        assert response.status_code == 422
@@ -0,0 +1,1144 @@
+"""
+Tests for the runtime services used by the API pipeline.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+import app.data
+import app.services.cache
+from app.data import experiences, flights, hotels, iter_records
+from app.datastore import (
+    create_experience_document,
+    create_flight_document,
+    create_hotel_document,
+)
+from app.schemas import TravelAdvice
+from app.services.advice_warmer import (
+    AdviceCache,
+    AdviceWarmer,
+    QueryTracker,
+    parse_hours,
+)
+from app.services.batch_advice import iter_batch_advice
+from app.services.cache import SQLiteCache, TieredCache, TTLCache
+from app.services.catalogue_generator import CatalogueGenerator, write_catalogue
+from app.services.coalescer import SingleFlight, normalise_query
+from app.services.collection_alias import CollectionAlias, versioned_name
+from app.services.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    degraded_enrichments,
+    remaining,
+    run_stage,
+    timed_out_stages,
+)
+from app.services.flight_graph import FlightGraph, RangeMin, parse_schedule_time
+from app.services.flight_index import FlightDateIndex
+from app.services.http_client import (
+    HostLimitedAsyncTransport,
+    RetryingTransport,
+    openai_model,
+    pool_monitor,
+)
+from app.services.ingest_jobs import (
+    IngestCheckpoint,
+    IngestJob,
+    print_status,
+    source_fingerprint,
+)
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.logger import LogPipeline, LogSink, StructuredLogger, get_logger
+from app.services.llm_scheduler import BATCH, INTERACTIVE, LLMScheduler
+from app.services.sessions import ConversationSession, SessionStore
+from app.services.token_usage import TokenUsageTracker, count_tokens
+
+
+class TestSingleFlight:
+    """Test request coalescing."""
+
+    def test_normalise_query(self):
+        """Test case and whitespace are ignored in the coalescing key."""
+        assert (
+            normalise_query("  Family trip   to ORLANDO ") == "family trip to orlando"
+        )
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_share_result(self):
+        """Test concurrent callers with the same key run the work once."""
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "advice"
+
+        results = await asyncio.gather(*(flight.run("key", work) for _ in range(5)))
+
+        assert results == ["advice"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {
+            "leaders": 1,
+            "coalesced": 4,
+            "errors": 0,
+            "cancelled": 0,
+            "in_flight": 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared_and_not_cached(self):
+        """Test an error reaches every waiter and the next call retries."""
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.run("key", failing),
+            flight.run("key", failing),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats()["errors"] == 1
+
+        async def working():
+            return "ok"
+
+        assert await flight.run("key", working) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_work(self):
+        """Test cancelling one waiter leaves the pipeline running for the others."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "advice"
+
+        first = asyncio.ensure_future(flight.run("key", work))
+        second = asyncio.ensure_future(flight.run("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "advice"
+        assert flight.stats()["cancelled"] == 0
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_cancelling_cancels_work(self):
+        """Test the shared task is cancelled once nobody is waiting for it."""
+        flight = SingleFlight()
+        finished = []
+
+        async def work():
+            await asyncio.sleep(1)
+            finished.append(1)
+
+        waiter = asyncio.ensure_future(flight.run("key", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+        assert not finished
+        assert flight.stats()["cancelled"] == 1
+        assert flight.stats()["in_flight"] == 0
+
+
+class TestTTLCache:
+    """Test the shared in-process cache."""
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["size"] == 2
+
+    def test_expired_entries_miss(self):
+        """Test expired entries are treated as misses."""
+        cache = TTLCache(ttl_seconds=-1)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+        assert cache.stats()["misses"] == 1
+
+
+class TestBatchAdvice:
+    """Test bounded-concurrency batch generation."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test no more than the configured number of items run at once."""
+        running = []
+        peak = []
+
+        async def advise(query):
+            running.append(query)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(query)
+            raise ValueError(f"no advice for {query}")
+
+        results = [
+            result
+            async for result in iter_batch_advice(
+                [f"query {i}" for i in range(6)], advise, concurrency=2
+            )
+        ]
+
+        assert max(peak) == 2
+        assert sorted(result["index"] for result in results) == list(range(6))
+        assert all(result["error"].startswith("no advice") for result in results)
+
+
+class TestLLMScheduler:
+    """Test LLM admission control."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_calls_jump_the_batch_queue(self):
+        """Test waiting interactive calls are admitted before earlier batch calls."""
+        scheduler = LLMScheduler("test", 6000, 1_000_000, max_concurrency=1)
+        order = []
+
+        async def call(name, priority):
+            async with scheduler.acquire(10, priority=priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        holder = asyncio.ensure_future(call("holder", INTERACTIVE))
+        await asyncio.sleep(0)
+        batch = asyncio.ensure_future(call("batch", BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(call("interactive", INTERACTIVE))
+        await asyncio.sleep(0)
+
+        assert scheduler.stats()["queue_depth"] == {"interactive": 1, "batch": 1}
+        await asyncio.gather(holder, batch, interactive)
+        assert order == ["holder", "interactive", "batch"]
+
+    @pytest.mark.asyncio
+    async def test_requests_per_minute_budget_throttles(self):
+        """Test calls beyond the RPM budget wait for the bucket to refill."""
+        scheduler = LLMScheduler("test", 600, 1_000_000, max_concurrency=10)
+        scheduler._requests.tokens = 1
+
+        for _ in range(2):
+            async with scheduler.acquire(1):
+                pass
+
+        stats = scheduler.stats()
+        assert stats["admitted"] == 2
+        assert stats["throttled"] == 1
+        assert stats["wait_seconds"] > 0
+
+    def test_settle_corrects_token_budget(self):
+        """Test actual usage replaces the estimate in the token bucket."""
+        scheduler = LLMScheduler("test", 600, 1000, max_concurrency=1)
+
+        with scheduler.acquire_sync(100) as permit:
+            permit.settle(300)
+
+        assert scheduler.stats()["tokens_available"] <= 701
+
+
+class TestDeadlines:
+    """Test request deadlines and stage budgets."""
+
+    @pytest.mark.asyncio
+    async def test_stage_is_bounded_by_request_deadline(self):
+        """Test a stage times out when the request deadline is shorter than its budget."""
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceeded, match="hotel_agent"):
+                await run_stage("hotel_agent", asyncio.sleep(1))
+
+            assert timed_out_stages() == {"hotel_agent"}
+            assert degraded_enrichments() == {"hotel"}
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_skips_stage(self):
+        """Test nothing is started once the deadline has passed."""
+        started = []
+
+        async def stage():
+            started.append(1)
+
+        with deadline_scope(-1):
+            with pytest.raises(DeadlineExceeded):
+                await run_stage("manager", stage())
+
+        assert not started
+
+    @pytest.mark.asyncio
+    async def test_stage_within_budget_returns_result(self):
+        """Test a fast stage returns its result and records no timeouts."""
+
+        async def stage():
+            return "ok"
+
+        with deadline_scope(5):
+            assert await run_stage("search", stage()) == "ok"
+            assert remaining() > 0
+            assert timed_out_stages() == set()
+
+        assert remaining() is None
+
+
+class TestTokenUsage:
+    """Test token counting and usage accounting."""
+
+    def test_count_tokens_is_positive(self):
+        """Test a non-empty text always counts at least one token."""
+        assert count_tokens("Family holiday in Orlando") > 0
+
+    def test_tracker_accumulates_per_agent(self):
+        """Test usage is summed per agent and recent calls are kept."""
+        tracker = TokenUsageTracker()
+        tracker.record("hotel_agent", 100, 20)
+        tracker.record("hotel_agent", 50, None)
+
+        stats = tracker.stats()
+        assert stats["totals"]["hotel_agent"] == {
+            "calls": 2,
+            "prompt_tokens": 150,
+            "completion_tokens": 20,
+        }
+        assert len(stats["recent_calls"]) == 2
+
+
+class TestHttpClient:
+    """Test the shared HTTP transport."""
+
+    def test_openai_models_share_the_pooled_client(self):
+        """Test OpenAI model names are bound to the shared OpenAI client."""
+        first = openai_model("openai:gpt-4o-mini")
+        second = openai_model("gpt-4o-mini")
+
+        assert first.model_name == "gpt-4o-mini"
+        assert first.client is second.client
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit_and_counters(self):
+        """Test requests to one host are capped and counted."""
+        peak = []
+
+        async def handler(request):
+            peak.append(transport._semaphores[request.url.host]._value)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200)
+
+        transport = HostLimitedAsyncTransport(httpx.MockTransport(handler), per_host=2)
+        async with httpx.AsyncClient(transport=transport) as client:
+            await asyncio.gather(
+                *(client.get("https://pool-test.example/") for _ in range(4))
+            )
+
+        assert min(peak) == 0
+        assert pool_monitor.stats()["pool-test.example"] == {
+            "requests": 4,
+            "in_flight": 0,
+            "peak_in_flight": 2,
+        }
+
+
+class ListSink(LogSink):
+    """Sink collecting records in memory."""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+class TestLogPipeline:
+    """Test the queue-backed structured logger."""
+
+    def test_records_reach_sink_with_fields(self):
+        """Test records are written by the background thread with their fields."""
+        sink = ListSink()
+        logger = StructuredLogger(LogPipeline([sink]))
+
+        logger.info("Recommendations are valid", destination="Orlando")
+        logger.pipeline.flush()
+
+        assert sink.records[0]["level"] == "INFO"
+        assert sink.records[0]["message"] == "Recommendations are valid"
+        assert sink.records[0]["fields"] == {"destination": "Orlando"}
+
+    def test_level_filter_and_sampling(self):
+        """Test DEBUG is filtered by level and INFO by sampling, never errors."""
+        sink = ListSink()
+        logger = StructuredLogger(LogPipeline([sink], level="INFO", sample_rate=0))
+
+        logger.debug("filtered by level")
+        logger.info("sampled out")
+        logger.error("always kept")
+        logger.pipeline.flush()
+
+        assert [record["message"] for record in sink.records] == ["always kept"]
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test a full queue counts dropped records rather than blocking."""
+        pipeline = LogPipeline([ListSink()], max_queue_size=1)
+        pipeline.close()
+
+        for _ in range(3):
+            pipeline.emit("ERROR", "message", {})
+
+        assert pipeline.stats()["dropped"] >= 2
+
+    def test_get_logger_is_a_singleton(self):
+        """Test the dependency returns the same logger on every request."""
+        assert get_logger() is get_logger()
+
+
+class TestCatalogueGenerator:
+    """Test synthetic catalogue generation."""
+
+    def test_same_seed_gives_same_catalogue(self):
+        """Test generation is deterministic by seed."""
+        first, second, other = (
+            {kind: list(records) for kind, records in generator.catalogue(0.2).items()}
+            for generator in (
+                CatalogueGenerator(seed=3),
+                CatalogueGenerator(seed=3),
+                CatalogueGenerator(seed=4),
+            )
+        )
+
+        assert first == second
+        assert first != other
+
+    def test_records_match_seed_schema(self):
+        """Test generated records have the seed files' fields and value types."""
+        catalogue = CatalogueGenerator().catalogue(0.2)
+
+        for kind, seed in [
+            ("hotels", hotels),
+            ("flights", flights),
+            ("experiences", experiences),
+        ]:
+            for record in catalogue[kind]:
+                assert list(record) == list(seed[0])
+                assert {k: type(v) for k, v in record.items() if v is not None} == {
+                    k: type(v) for k, v in seed[0].items() if v is not None
+                }
+
+    def test_catalogue_scales_with_unique_ids(self):
+        """Test sizes follow the scale and ids stay unique."""
+        catalogue = CatalogueGenerator().catalogue(3)
+        generated_flights = list(catalogue["flights"])
+        generated_hotels = list(catalogue["hotels"])
+
+        assert len(generated_hotels) == len(hotels) * 3
+        assert len(generated_flights) == len(flights) * 3
+        assert len({f["flight_id"] for f in generated_flights}) == len(flights) * 3
+        assert len({h["hotel_id"] for h in generated_hotels}) == len(hotels) * 3
+
+    def test_records_build_documents(self):
+        """Test generated records go through the document builders."""
+        generator = CatalogueGenerator()
+
+        assert all(create_hotel_document(h) for h in generator.hotels(50))
+        assert all(create_flight_document(f) for f in generator.flights(50))
+        assert all(create_experience_document(e) for e in generator.experiences(50))
+
+    def test_write_catalogue(self, tmp_path):
+        """Test catalogues are written under the seed file names."""
+        counts = write_catalogue(str(tmp_path), scale=0.1, seed=1)
+
+        assert counts == {
+            "hotels": len(hotels) // 10,
+            "flights": len(flights) // 10,
+            "experiences": len(experiences) // 10,
+        }
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "experiences_catalogue.json",
+            "flight_catalogue.json",
+            "hotel_catalogue.json",
+        ]
+        assert list(iter_records(str(tmp_path / "flight_catalogue.json"))) == list(
+            CatalogueGenerator(seed=1).flights(len(flights) // 10)
+        )
+
+
+class TestFlightDateIndex:
+    """Test the sorted date and route indexes over flights."""
+
+    @pytest.fixture
+    def index(self):
+        return FlightDateIndex(flights)
+
+    def test_window_is_inclusive_and_ordered(self, index):
+        """Test a window returns exactly the flights in range, earliest first."""
+        found = list(index.search(date(2025, 7, 10), date(2025, 7, 20)))
+
+        expected = [
+            f for f in flights if "2025-07-10" <= f["depart_date"] <= "2025-07-20"
+        ]
+        assert len(found) == len(expected) > 0
+        assert [f["depart"] for f in found] == sorted(f["depart"] for f in found)
+
+    def test_route_restricts_window(self, index):
+        """Test origin and destination airports narrow the window."""
+        found = list(
+            index.search(
+                date(2025, 7, 1), date(2025, 8, 31), {"LHR"}, index.airports("New York")
+            )
+        )
+
+        assert found
+        assert all(f["airport_depart"] == "LHR" for f in found)
+        assert all(f["airport_arrive"] == "JFK" for f in found)
+
+    def test_places_resolve_to_airports(self, index):
+        """Test codes, cities and countries resolve to airport codes."""
+        assert index.airports("jfk") == {"JFK"}
+        assert index.airports(" London ") == {"LHR"}
+        assert "BGI" in index.airports("Barbados")
+        assert index.airports("Atlantis") is None
+
+    def test_empty_window(self, index):
+        """Test a window with no flights returns nothing."""
+        assert list(index.search(date(2030, 1, 1), date(2030, 1, 31))) == []
+
+
+def _flight(number, origin, destination, depart, arrive):
+    return {
+        "flight_id": f"{depart[:10]}-{destination}-VS-{number}",
+        "flight_number": f"VS{number}",
+        "operating_airline": "Virgin Atlantic",
+        "airport_depart": origin,
+        "airport_arrive": destination,
+        "depart": f"{depart}:00+00",
+        "depart_date": depart[:10],
+        "arrive": f"{arrive}:00+00",
+    }
+
+
+class TestFlightGraph:
+    """Test time-respecting itinerary search over the flight graph."""
+
+    @pytest.fixture
+    def graph(self):
+        return FlightGraph(
+            [
+                _flight("0001", "JFK", "LHR", "2025-07-01 20:00", "2025-07-02 08:00"),
+                # Leaves 30 minutes after landing, too tight to connect
+                _flight("0002", "LHR", "TPA", "2025-07-02 08:30", "2025-07-02 18:00"),
+                _flight("0003", "LHR", "TPA", "2025-07-02 11:00", "2025-07-02 21:00"),
+                # Leaves more than a day after landing
+                _flight("0004", "LHR", "TPA", "2025-07-04 11:00", "2025-07-04 21:00"),
+                _flight("0005", "JFK", "LHR", "2025-07-05 20:00", "2025-07-06 08:00"),
+            ],
+            min_connection_minutes=60,
+            max_connection_hours=24,
+        )
+
+    def test_connections_respect_time_limits(self, graph):
+        """Test only connections within the layover limits are used."""
+        found = graph.itineraries({"JFK"}, {"TPA"})
+
+        assert [i["flights"] for i in found] == [["VS0001", "VS0003"]]
+        assert found[0]["stops"] == ["LHR"]
+        assert found[0]["duration"] == "25h"
+
+    def test_window_limits_first_departure(self, graph):
+        """Test the first leg must depart inside the travel window."""
+        assert graph.itineraries({"JFK"}, {"TPA"}, date(2025, 7, 3)) == []
+        assert len(graph.itineraries({"JFK"}, {"LHR"}, date(2025, 7, 1))) == 2
+
+    def test_later_arrival_keeps_its_later_connections(self, monkeypatch):
+        """Test an earlier, cheaper arrival does not prune a label that can still
+        make a connection the earlier one's layover window has closed on."""
+        fares = {"VS0011": 100.0, "VS0012": 150.0, "VS0013": 900.0, "VS0014": 100.0}
+        monkeypatch.setattr(
+            "app.services.flight_graph.cabin_price",
+            lambda flight: fares[flight["flight_number"]],
+        )
+        graph = FlightGraph(
+            [
+                _flight("0011", "JFK", "LHR", "2025-07-01 06:00", "2025-07-01 08:00"),
+                _flight("0012", "JFK", "LHR", "2025-07-01 05:00", "2025-07-01 20:00"),
+                # Only the early arrival can make this one
+                _flight("0013", "LHR", "TPA", "2025-07-01 09:30", "2025-07-01 11:00"),
+                # Only the late arrival can make this one
+                _flight("0014", "LHR", "TPA", "2025-07-02 10:00", "2025-07-02 12:00"),
+            ],
+            min_connection_minutes=60,
+            max_connection_hours=24,
+        )
+
+        found = graph.itineraries({"JFK"}, {"TPA"}, k=1)
+
+        assert [i["flights"] for i in found] == [["VS0012", "VS0014"]]
+        assert found[0]["price"] == 250.0
+
+    def test_builds_from_catalogue_rows(self):
+        """Test seed flights parse, hour-only UTC offsets included."""
+        assert parse_schedule_time("2023-05-25 03:27:00+00") == datetime(
+            2023, 5, 25, 3, 27, tzinfo=timezone.utc
+        )
+        graph = FlightGraph(flights)
+
+        inverted = sum(
+            parse_schedule_time(f["arrive"]) <= parse_schedule_time(f["depart"])
+            for f in flights
+        )
+        # Only flights landing before they depart are left out
+        assert graph.skipped == (
+            {"arrives_before_departure": inverted} if inverted else {}
+        )
+        assert graph.edges == len(flights) - inverted > 0
+        route = (flights[0]["airport_depart"], flights[0]["airport_arrive"])
+        assert graph.itineraries({route[0]}, {route[1]}, k=1)
+
+    def test_results_are_ranked(self):
+        """Test itineraries come back cheapest or fastest first."""
+        graph = FlightGraph(list(CatalogueGenerator(seed=3).flights(2000)))
+
+        for sort_by, key in (("price", "price"), ("duration", "elapsed")):
+            found = graph.itineraries({"JFK"}, {"MIA"}, sort_by=sort_by, k=5)
+            values = [
+                (
+                    i["price"]
+                    if key == "price"
+                    else parse_schedule_time(i["arrive"])
+                    - parse_schedule_time(i["depart"])
+                )
+                for i in found
+            ]
+            assert len(found) == 5
+            assert values == sorted(values)
+
+    def test_range_min(self):
+        """Test the sparse table finds the minimum of any range."""
+        values = [5.0, 3.0, 8.0, 1.0, 9.0, 2.0, 7.0]
+        table = RangeMin(values)
+
+        for lo in range(len(values)):
+            for hi in range(lo, len(values)):
+                best = table.argmin(lo, hi)
+                assert values[best] == min(values[lo : hi + 1])
+
+
+class TestStreamingRecords:
+    """Test incremental catalogue parsing."""
+
+    def test_json_array_matches_json_load(self, monkeypatch):
+        """Test streamed records equal the loaded catalogue, across chunk sizes."""
+        for chunk_size in (7, 4096):
+            monkeypatch.setattr(app.data, "STREAM_CHUNK_SIZE", chunk_size)
+            assert list(iter_records("hotel_catalogue.json")) == hotels
+
+    def test_json_lines(self, tmp_path):
+        """Test JSON Lines files are read one record per line."""
+        path = tmp_path / "flights.jsonl"
+        path.write_text('{"id": 1}\n\n{"id": 2}\n')
+
+        assert list(iter_records(str(path))) == [{"id": 1}, {"id": 2}]
+
+    def test_truncated_array(self, tmp_path):
+        """Test a truncated array raises after yielding the complete records."""
+        path = tmp_path / "hotels.json"
+        path.write_text('[{"id": 1}, {"id": 2}, {"id"')
+        records = iter_records(str(path))
+
+        assert next(records) == {"id": 1}
+        assert next(records) == {"id": 2}
+        with pytest.raises(ValueError):
+            next(records)
+
+
+class TestIngestPipeline:
+    """Test staged ingestion with bounded queues."""
+
+    def batches(self, count, produced):
+        for i in range(count):
+            produced.append(i)
+            yield [Document(page_content=f"doc {i}")]
+
+    def test_all_batches_are_upserted(self):
+        """Test every batch is embedded and upserted exactly once."""
+        upserted = []
+        pipeline = IngestPipeline(
+            embed=lambda texts: [[1.0] for _ in texts],
+            upsert=lambda docs, vectors: upserted.extend(d.page_content for d in docs),
+            embed_workers=3,
+        )
+
+        assert pipeline.run(self.batches(50, [])) == 50
+        assert sorted(upserted) == sorted(f"doc {i}" for i in range(50))
+
+    def test_slow_upserts_hold_back_parsing(self):
+        """Test a blocked upsert stage stops the source from running ahead."""
+        produced, release = [], threading.Event()
+
+        def upsert(docs, vectors):
+            release.wait(5)
+
+        pipeline = IngestPipeline(
+            embed=lambda texts: [[1.0] for _ in texts],
+            upsert=upsert,
+            embed_workers=1,
+            queue_size=2,
+        )
+        runner = threading.Thread(
+            target=pipeline.run, args=(self.batches(100, produced),)
+        )
+        runner.start()
+        time.sleep(0.3)
+        in_flight = len(produced)
+        release.set()
+        runner.join(5)
+
+        # One batch upserting, two queued per queue, one held by each stage
+        assert in_flight <= 8
+        assert len(produced) == 100
+
+    def test_errors_stop_the_pipeline(self):
+        """Test a failing stage stops the others and re-raises."""
+        produced = []
+
+        def embed(texts):
+            raise RuntimeError("rate limited")
+
+        pipeline = IngestPipeline(embed=embed, upsert=lambda d, v: None)
+
+        with pytest.raises(RuntimeError, match="rate limited"):
+            pipeline.run(self.batches(1000, produced))
+        assert len(produced) < 1000
+
+
+class OutOfOrderPipeline:
+    """Pipeline stand-in that lands batches in a given order, then fails."""
+
+    def __init__(self, order):
+        self.order = order
+
+    def run(self, batches, on_upserted):
+        batches = list(batches)
+        for position in self.order:
+            on_upserted(position, batches[position])
+        raise RuntimeError("embedding worker died")
+
+
+class TestIngestJob:
+    """Test ingestion checkpoints."""
+
+    def test_checkpoint_only_advances_over_contiguous_batches(self, tmp_path):
+        """Test batches landing out of order do not skip a missing one."""
+        checkpoint = IngestCheckpoint(str(tmp_path / "checkpoint.json"))
+        job = IngestJob(
+            "hotels",
+            checkpoint,
+            OutOfOrderPipeline([1, 0, 3]),
+            count=lambda: 0,
+            reset=lambda: None,
+        )
+        batches = [
+            [Document(page_content=f"{b}.{i}") for i in range(10)] for b in range(5)
+        ]
+
+        with pytest.raises(RuntimeError):
+            job.run(lambda skip: batches)
+
+        state = checkpoint.get("hotels")
+        assert state["status"] == "failed"
+        assert state["records_done"] == 20
+        assert state["batches_done"] == 2
+        assert batches[3][0].id == "hotels-30"
+
+    def test_other_source_starts_over(self, tmp_path):
+        """Test a failed job is only resumed from the catalogue it was reading."""
+        checkpoint = IngestCheckpoint(str(tmp_path / "checkpoint.json"))
+        catalogue = tmp_path / "hotels.json"
+        catalogue.write_text("[]")
+        checkpoint.update(
+            "hotels",
+            status="failed",
+            source=source_fingerprint(str(catalogue)),
+            records_done=20,
+        )
+        skipped = []
+
+        def run(source):
+            job = IngestJob(
+                "hotels",
+                checkpoint,
+                OutOfOrderPipeline([]),
+                count=lambda: 20,
+                reset=lambda: None,
+                source=source,
+            )
+            with pytest.raises(RuntimeError):
+                job.run(lambda skip: skipped.append(skip) or [])
+
+        run(source_fingerprint(str(catalogue)))
+        catalogue.write_text('[{"hotel_id": 1}]')
+        run(source_fingerprint(str(catalogue)))
+
+        assert skipped == [20, 0]
+        assert checkpoint.get("hotels")["source"]["size"] == 17
+
+    def test_status(self, tmp_path, capsys):
+        """Test the status report lists each collection and its error."""
+        checkpoint = IngestCheckpoint(str(tmp_path / "checkpoint.json"))
+        checkpoint.update("flights", status="failed", records_done=3000, error="boom")
+        checkpoint.update("hotels", status="complete", records_done=562)
+
+        print_status(checkpoint.load())
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[1].split()[:3] == ["flights", "failed", "3000"]
+        assert lines[2].strip() == "boom"
+        assert lines[3].split()[:3] == ["hotels", "complete", "562"]
+
+
+class TestCollectionAlias:
+    """Test the alias pointing a catalogue at its live collection version."""
+
+    def test_versions_and_garbage(self, tmp_path):
+        """Test builds get the next version and only the newest two are kept."""
+        alias = CollectionAlias(str(tmp_path / "alias.json"))
+        assert alias.version == 0
+        assert versioned_name("va_hotels_collection", 0) == "va_hotels_collection"
+
+        for _ in range(3):
+            alias.point_to(alias.start_build())
+
+        assert alias.version == 3
+        assert versioned_name("va_hotels_collection", 3) == "va_hotels_collection_v3"
+        assert alias.superseded(keep=2) == [0, 1]
+        alias.forget([0, 1])
+        assert alias.versions() == [2, 3]
+
+    def test_unfinished_build_is_resumed(self, tmp_path):
+        """Test a build that never swapped keeps its version number."""
+        alias = CollectionAlias(str(tmp_path / "alias.json"))
+
+        assert alias.start_build() == 1
+        assert alias.start_build() == 1
+        assert alias.versions() == [0, 1]
+        assert alias.superseded() == []
+
+    def test_other_processes_see_swaps(self, tmp_path):
+        """Test a reader polls its way onto a version swapped in elsewhere."""
+        writer = CollectionAlias(str(tmp_path / "alias.json"))
+        reader = CollectionAlias(str(tmp_path / "alias.json"), refresh_seconds=0)
+
+        writer.point_to(writer.start_build())
+
+        assert reader.poll()
+        assert reader.version == 1
+        assert not reader.poll()
+
+
+class TestSharedCache:
+    """Test the SQLite cache tier shared by server workers."""
+
+    def test_workers_share_entries_and_counters(self, tmp_path):
+        """Test an entry set by one process is a hit in another."""
+        path = str(tmp_path / "cache.sqlite3")
+        SQLiteCache(path, "search_results").set(("hotels", "spa", 5), [("doc", 0.9)])
+
+        pid = os.fork()
+        if pid == 0:
+            # A forked worker reopens its own connection and sees the entry
+            value = SQLiteCache(path, "search_results").get(("hotels", "spa", 5))
+            os._exit(0 if value == [("doc", 0.9)] else 1)
+        _, status = os.waitpid(pid, 0)
+
+        assert os.WEXITSTATUS(status) == 0
+        assert SQLiteCache(path, "search_results").stats() == {
+            "hits": 1,
+            "misses": 0,
+            "size": 1,
+        }
+
+    def test_expiry_and_eviction(self, tmp_path):
+        """Test expired entries miss and pruning keeps the most recently used."""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), "embeddings", max_size=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get("a")
+
+        cache.prune()
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "a" and cache.get("c") == "c"
+        expired = SQLiteCache(cache.path, "expired", ttl_seconds=-1)
+        expired.set("a", 1)
+        assert expired.get("a") is None
+
+    def test_tiered_cache_fills_local_tier(self, tmp_path):
+        """Test shared hits are kept locally for later lookups."""
+        shared = SQLiteCache(str(tmp_path / "cache.sqlite3"), "embeddings")
+        shared.set("query", [0.1, 0.2])
+        cache = TieredCache(TTLCache(), shared)
+
+        assert cache.get("query") == [0.1, 0.2]
+        assert cache.get("query") == [0.1, 0.2]
+        assert shared.stats()["hits"] == 1
+        assert cache.stats()["hits"] == 2
+
+
+WORKER_APP = """
+import os, sys
+from app.services.server import PreforkServer
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+PreforkServer(app, "127.0.0.1", int(sys.argv[1]), 2, log_level="warning").run()
+"""
+
+
+class TestPreforkServer:
+    """Test the multi-worker server entry point."""
+
+    def test_workers_share_the_socket(self):
+        """Test requests are served by several worker processes."""
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        server = subprocess.Popen([sys.executable, "-c", WORKER_APP, str(port)])
+        try:
+            pids = set()
+            deadline = time.monotonic() + 20
+            while len(pids) < 2 and time.monotonic() < deadline:
+                try:
+                    # A new connection per request lets either worker accept it
+                    pids.add(httpx.get(f"http://127.0.0.1:{port}/").text)
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            assert len(pids) == 2
+        finally:
+            server.terminate()
+            assert server.wait(20) == 0
+
+
+class TestRetryingTransport:
+    """Test retries for idempotent service calls."""
+
+    def test_unavailable_responses_are_retried(self):
+        """Test a 503 is retried and the next response returned."""
+        statuses = iter([503, 200])
+        transport = RetryingTransport(
+            httpx.MockTransport(lambda request: httpx.Response(next(statuses))),
+            retries=3,
+            backoff_seconds=0,
+        )
+
+        with httpx.Client(transport=transport) as client:
+            assert client.post("http://chroma/api/query").status_code == 200
+        assert transport.retried == 1
+
+    def test_connection_errors_give_up_after_retries(self):
+        """Test connection failures raise once the retries are used up."""
+        attempts = []
+
+        def refuse(request):
+            attempts.append(request)
+            raise httpx.ConnectError("connection refused")
+
+        transport = RetryingTransport(
+            httpx.MockTransport(refuse), retries=2, backoff_seconds=0
+        )
+
+        with httpx.Client(transport=transport) as client:
+            with pytest.raises(httpx.ConnectError):
+                client.get("http://chroma/api/heartbeat")
+        assert len(attempts) == 3
+
+
+def _advice(destination):
+    return TravelAdvice(
+        destination=destination,
+        reason="Popular",
+        budget="Midrange",
+        tips=["Book early"],
+    )
+
+
+class TestAdviceWarmer:
+    """Test precomputation of popular travel advice."""
+
+    def test_tracker_ranks_recent_demand(self):
+        """Test counts decay so recent queries outrank older popular ones."""
+        tracker = QueryTracker(half_life_seconds=60)
+        for _ in range(4):
+            tracker.record("Trip to Orlando", now=0)
+        for _ in range(2):
+            tracker.record("trip to  NEW YORK", now=300)
+        tracker.record("Trip to New York", now=300)
+
+        (first, score), (second, _) = tracker.top(2, now=300)
+        assert first == "Trip to New York"
+        assert score == pytest.approx(3)
+        assert second == "Trip to Orlando"
+
+    def test_off_peak_hours_wrap_past_midnight(self):
+        """Test an hour window crossing midnight."""
+        assert parse_hours("22-3") == {22, 23, 0, 1, 2}
+        assert parse_hours("") == set(range(24))
+
+    @pytest.mark.asyncio
+    async def test_popular_queries_are_cached_until_half_stale(self, monkeypatch):
+        """Test warming fills the cache, skips fresh entries and drops failures."""
+        monkeypatch.setattr(
+            "app.services.advice_warmer.seed_queries",
+            lambda n: ["Plan a trip to Miami", "Plan a trip to Nowhere"],
+        )
+        computed = []
+
+        async def advise(query):
+            computed.append(query)
+            if "Nowhere" in query:
+                raise ValueError("no recommendations")
+            return _advice(query.split()[-1])
+
+        tracker = QueryTracker()
+        tracker.record("Family holiday in Orlando")
+        cache = AdviceCache(ttl_seconds=3600, cache=TTLCache())
+        warmer = AdviceWarmer(advise, tracker, cache, top_n=3)
+
+        assert await warmer.warm_once() == {"due": 3, "warmed": 2, "failed": 1}
+        assert cache.get("family holiday in  orlando").advice.destination == "Orlando"
+        assert cache.get("Plan a trip to Nowhere") is None
+
+        computed.clear()
+        assert (await warmer.warm_once())["warmed"] == 0
+        assert computed == ["Plan a trip to Nowhere"]
+
+        cache.ttl_seconds = 0.02
+        time.sleep(0.01)
+        assert cache.needs_refresh("Plan a trip to Miami")
+
+    def test_reindexed_catalogue_drops_cached_advice(self):
+        """Test advice is not served once a collection version is swapped in."""
+        versions = [(0, 0, 0)]
+        cache = AdviceCache(cache=TTLCache(), version=lambda: versions[-1])
+        cache.put("Trip to Orlando", _advice("Orlando").model_dump())
+
+        assert cache.get("Trip to Orlando") is not None
+        versions.append((1, 0, 0))
+        assert cache.get("Trip to Orlando") is None
+
+
+def _trip():
+    return {
+        "destination": "Orlando",
+        "reason": "Theme parks",
+        "budget": "Expensive",
+        "tips": ["Book early"],
+        "hotel": {
+            "name": "Grand Hotel",
+            "city": "Orlando",
+            "price_per_night": 1500.0,
+            "rating": 5.0,
+        },
+        "flight": {
+            "airline": "Virgin Atlantic",
+            "from_airport": "LHR",
+            "to_airport": "MCO",
+            "price": 900.0,
+            "duration": "9h 40m",
+            "date": "2023-07-01",
+        },
+        "experience": None,
+    }
+
+
+class TestConversationSession:
+    """Test follow-up routing and session storage."""
+
+    @pytest.fixture
+    def session(self):
+        session = ConversationSession("abc")
+        session.record_trip(
+            "Family holiday in Orlando from London",
+            _trip(),
+            {"hotel": "family hotel in Orlando"},
+        )
+        return session
+
+    def test_follow_ups_name_one_specialist(self, session):
+        """Test only single-kind follow-ups about the same trip skip the manager."""
+        assert session.affected_specialist("Cheaper hotel instead") == "hotel"
+        assert session.affected_specialist("any earlier flights?") == "flight"
+        assert session.affected_specialist("a hotel and a flight") is None
+        assert session.affected_specialist("hotel in Miami instead") is None
+        assert session.affected_specialist("flight from London") == "flight"
+        assert session.affected_specialist("any tourist tips?") is None
+        assert ConversationSession("new").affected_specialist("cheaper hotel") is None
+
+    def test_follow_up_reuses_the_specialist_query(self, session):
+        """Test the re-run builds on the previous query and replaces the advice."""
+        query = session.specialist_query("hotel", "cheaper hotel instead")
+        assert query.startswith("family hotel in Orlando\n")
+        assert "Grand Hotel" in query
+
+        cheaper = {**_trip()["hotel"], "name": "Budget Inn", "price_per_night": 80.0}
+        advice = session.patched_advice("hotel", cheaper)
+        session.record_follow_up("cheaper hotel instead", "hotel", advice, query)
+
+        assert session.advice["hotel"]["name"] == "Budget Inn"
+        assert session.advice["flight"] == _trip()["flight"]
+        assert session.advice["budget"] == "Budget"
+        assert session.specialist_queries["hotel"] == query
+        assert session.turns[-1] == "cheaper hotel instead"
+
+    def test_follow_up_without_specialist_query_uses_the_current_trip(self, session):
+        """Test a trip planned without recorded queries falls back to its own query."""
+        session.record_trip("Beach trip to Miami", _trip(), {})
+        query = session.specialist_query("flight", "an earlier flight")
+        assert query.startswith("Beach trip to Miami\n")
+
+    def test_store_is_bounded_and_expires(self):
+        """Test unknown or evicted ids open a fresh session."""
+        store = SessionStore(cache=TTLCache(max_size=1))
+        first, second = store.open(), store.open()
+        store.save(first)
+
+        assert store.open(first.id) is first
+        store.save(second)
+        assert store.open(first.id).id != first.id
+        assert SessionStore(cache=TTLCache(ttl_seconds=-1)).open(second.id).turns == []
+
+    def test_shared_sessions_skip_the_local_tier(self, tmp_path, monkeypatch, session):
+        """Test a worker reads another worker's latest turn, not its own stale copy."""
+        monkeypatch.setattr(app.services.cache, "CACHE_BACKEND", "sqlite")
+        monkeypatch.setattr(
+            app.services.cache, "SHARED_CACHE_PATH", str(tmp_path / "cache.sqlite3")
+        )
+        worker, other = SessionStore(), SessionStore()
+        worker.save(session)
+        assert worker.open(session.id).turns == session.turns
+
+        latest = other.open(session.id)
+        latest.record_follow_up("cheaper hotel", "hotel", session.advice, "query")
+        other.save(latest)
+        assert worker.open(session.id).turns[-1] == "cheaper hotel"
@@ -2,7 +2,7 @@
 Tests for utility functions.
 """
 
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
@@ -95,7 +95,7 @@ class TestValidateUserQuery:
         assert result["is_safe"] is False
 
     @pytest.mark.asyncio
-    @patch("openai.OpenAI")
+    @patch("app.validators.user_query.user_query_validator.get_openai_client")
     async def test_validate_appropriate_query(self, mock_openai):
         """Test validation with appropriate travel query."""
         mock_client = Mock()
@@ -105,14 +105,14 @@ class TestValidateUserQuery:
         mock_result = Mock()
         mock_result.flagged = False
         mock_response.results = [mock_result]
-        mock_client.moderations.create.return_value = mock_response
+        mock_client.moderations.create = AsyncMock(return_value=mock_response)
 
         result = await validate_user_query("I want to visit Paris for vacation")
         assert result["is_safe"] is True
         assert result["message"] == "Valid user query"
 
     @pytest.mark.asyncio
-    @patch("openai.OpenAI")
+    @patch("app.validators.user_query.user_query_validator.get_openai_client")
     async def test_validate_flagged_content(self, mock_openai):
         """Test validation with flagged content."""
         mock_client = Mock()
@@ -122,7 +122,7 @@ class TestValidateUserQuery:
         mock_result = Mock()
         mock_result.flagged = True
         mock_response.results = [mock_result]
-        mock_client.moderations.create.return_value = mock_response
+        mock_client.moderations.create = AsyncMock(return_value=mock_response)
 
         result = await validate_user_query("inappropriate content")
         assert result["is_safe"] is False